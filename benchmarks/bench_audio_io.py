@@ -0,0 +1,83 @@
+"""
+Load time and peak RSS of the old torchaudio monkeypatch loader
+(sf.read float64 -> torch.tensor -> float -> t) vs. audio_io.load_audio,
+for 5- and 60-minute files as 16-bit PCM and 32-bit float WAV.
+
+Each measurement runs in a fresh child process.
+
+Usage (from the repo root):
+    python benchmarks/bench_audio_io.py --minutes 5,60
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import soundfile as sf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_streaming_memory import peak_rss_mb
+from create_dummy_audio import write_mix
+
+
+def old_load(filepath):
+    import torch
+    wav, sr = sf.read(filepath)
+    wav = torch.tensor(wav).float()
+    if wav.ndim == 1:
+        wav = wav.unsqueeze(0)
+    else:
+        wav = wav.t()
+    return wav, sr
+
+
+def new_load(filepath):
+    from src.core.audio_io import load_audio
+    return load_audio(filepath)
+
+
+def run_child(args):
+    import torch
+    baseline = peak_rss_mb()
+    loader = old_load if args.loader == "old" else new_load
+    start = time.perf_counter()
+    wav, sr = loader(args.input)
+    # Touch every sample so memory-mapped pages are actually read
+    total = float(wav.sum())
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb() - baseline, "checksum": total}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", default="5,60")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--loader", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    print(f"{'minutes':>8} {'format':>7} {'loader':>7} {'seconds':>9} {'RSS +MB':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            for subtype in ("PCM_16", "FLOAT"):
+                path = os.path.join(folder, f"io_{minutes:g}_{subtype}.wav")
+                write_mix(path, minutes * 60, kind="noise", block_seconds=60, subtype=subtype)
+                for loader in ("old", "new"):
+                    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--loader", loader, "--input", path]
+                    out = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+                    result = json.loads(out.strip().splitlines()[-1])
+                    print(f"{minutes:>8g} {subtype:>7} {loader:>7} {result['seconds']:>9.2f} {result['peak_rss_mb']:>9.0f}")
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Peak memory and throughput of Demucs segment/overlap/worker settings,
+next to what the auto-tuner picks for a few memory budgets.
+
+Every case runs in a fresh child process so the peak RSS reported is for
+that run alone. Fixed cases bypass the tuner by setting the engine
+directly; "auto" cases go through separate_audio(max_memory_mb=...).
+
+Usage (from the repo root):
+    python benchmarks/bench_autotune.py --minutes 4 --budgets 1000,2000,4000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_streaming_memory import make_long_input, peak_rss_mb
+
+# (segment, overlap, workers); segment None is the model's own
+FIXED_CASES = [(None, 0.25, 1), (4.0, 0.25, 1), (4.0, 0.5, 1), (None, 0.25, 2), (None, 0.25, 4)]
+
+
+def run_child(args):
+    from src.core.splitter import separate_audio
+    from src.core import splitter
+    output_dir = tempfile.mkdtemp()
+    streaming = None
+    if args.case != "auto":
+        segment, overlap, workers = json.loads(args.case)
+        autotune = splitter.autotune
+
+        def fixed(engine, duration, base_overlap, max_memory_mb=None):
+            settings = autotune(engine, duration, base_overlap, max_memory_mb)
+            settings.segment = segment or settings.segment
+            settings.overlap, settings.workers, settings.window = overlap, workers, None
+            return settings
+        splitter.autotune = fixed
+        streaming = False
+    start = time.perf_counter()
+    separate_audio(args.input, output_dir, 4, 1, False, False, cache=False, streaming=streaming,
+                   max_memory_mb=args.budget)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_case(path, case, budget=None):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--case", case, "--input", path]
+    if budget:
+        cmd += ["--budget", str(budget)]
+    out = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=4)
+    parser.add_argument("--budgets", default="1000,2000,4000", help="MB budgets for the auto-tuned runs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--budget", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    audio_seconds = args.minutes * 60
+    print(f"{'case':>24} {'seconds':>9} {'audio s/s':>10} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "input.wav")
+        make_long_input(path, args.minutes)
+        cases = [(f"seg {s or 'model'} ov {o} x{w}", json.dumps([s, o, w]), None) for s, o, w in FIXED_CASES]
+        cases += [(f"auto {b} MB", "auto", int(b)) for b in args.budgets.split(",")]
+        for label, case, budget in cases:
+            result = run_case(path, case, budget)
+            print(f"{label:>24} {result['seconds']:>9.1f} {audio_seconds / result['seconds']:>10.2f} "
+                  f"{result['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
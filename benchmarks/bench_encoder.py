@@ -0,0 +1,59 @@
+"""
+Output encoding throughput (seconds of audio per second) per format: one
+stem after another on the calling thread vs. all stems at once on the
+encoder pool.
+
+Usage (from the repo root):
+    python benchmarks/bench_encoder.py --minutes 4 --stems 4
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.encoder import FORMATS, EncoderPool, encode_audio
+
+SR = 44100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=4)
+    parser.add_argument("--stems", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = int(args.minutes * 60 * SR)
+    stems = [(rng.standard_normal((2, frames)) * 0.1).astype(np.float32) for _ in range(args.stems)]
+    audio_seconds = args.minutes * 60 * args.stems
+    pool = EncoderPool(args.workers)
+
+    print(f"{args.stems} stems of {args.minutes:g} min, {args.workers} encoder threads")
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt in args.formats:
+            paths = [os.path.join(folder, f"stem_{i}.{fmt}") for i in range(args.stems)]
+
+            start = time.perf_counter()
+            for stem, path in zip(stems, paths):
+                encode_audio(stem, path, SR)
+            serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pool.wait_all([pool.encode(stem, path, SR) for stem, path in zip(stems, paths)])
+            pooled = time.perf_counter() - start
+
+            size = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+            print(f"{fmt:>5}: serial {audio_seconds / serial:7.1f} s/s, pool {audio_seconds / pooled:7.1f} s/s, "
+                  f"{size:6.1f} MB")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Ensemble blend throughput (seconds of audio per second) and peak memory on
+long files: the old read-everything-as-float64 average vs. the streaming
+blender in each mode.
+
+Usage (from the repo root):
+    python benchmarks/bench_ensemble_blend.py --minutes 10 --inputs 2
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_dummy_audio import write_mix
+from src.core.ensemble import blend, MODES
+
+SR = 44100
+
+
+def make_stems(folder, count, minutes):
+    # Unrelated noise per stem, the blend's cost doesn't depend on the content
+    return [write_mix(os.path.join(folder, f"stem_{i}.wav"), minutes * 60, SR, kind="noise", block_seconds=60, seed=i)
+            for i in range(count)]
+
+
+def old_blend(paths, output_path):
+    # What AdvancedAudioProcessor.ensemble_blend used to do (two inputs)
+    data1, sr1 = sf.read(paths[0])
+    data2, sr2 = sf.read(paths[1])
+    min_len = min(len(data1), len(data2))
+    blended = (data1[:min_len] + data2[:min_len]) / 2
+    sf.write(output_path, blended, sr1)
+
+
+def measure(run):
+    tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--inputs", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_stems(folder, max(2, args.inputs), args.minutes)
+        output = os.path.join(folder, "out.wav")
+        audio_seconds = args.minutes * 60
+
+        runs = [("old average", lambda: old_blend(paths, output))]
+        for mode in MODES:
+            runs.append((mode, lambda mode=mode: blend(paths, output, mode=mode)))
+
+        print(f"{len(paths)} inputs of {args.minutes} min")
+        for name, run in runs:
+            elapsed, peak = measure(run)
+            print(f"{name:>12}: {audio_seconds / elapsed:8.1f} s/s, peak {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
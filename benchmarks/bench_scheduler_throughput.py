@@ -0,0 +1,55 @@
+"""
+Batch throughput (tracks/hour) with one worker vs. the scheduler's full
+set of concurrent workers.
+
+Usage (from the repo root):
+    python benchmarks/bench_scheduler_throughput.py --files 16 --seconds 30
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_worker_daemon import make_inputs, make_config
+from src.core.scheduler import JobScheduler, build_slots, run_batch
+
+
+def measure(paths, slots, quality):
+    scheduler = JobScheduler(slots)
+    try:
+        # Warm every daemon first so both runs measure steady-state throughput
+        warmup = [make_config(paths[0], quality) for _ in range(scheduler.capacity)]
+        run_batch(warmup, scheduler)
+
+        start = time.perf_counter()
+        run_batch([make_config(p, quality) for p in paths], scheduler)
+        elapsed = time.perf_counter() - start
+    finally:
+        scheduler.stop()
+    return elapsed, len(paths) / elapsed * 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--quality", type=int, default=0)
+    parser.add_argument("--threads-per-job", type=int, default=None)
+    args = parser.parse_args()
+
+    all_slots = build_slots(threads_per_job=args.threads_per_job)
+    single = [dict(all_slots[0], threads=sum(s["threads"] for s in all_slots) if all_slots[0]["gpu"] is None else all_slots[0]["threads"])]
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_inputs(folder, args.files, args.seconds)
+        for name, slots in (("1 worker", single), (f"{len(all_slots)} workers", all_slots)):
+            elapsed, per_hour = measure(paths, slots, args.quality)
+            print(f"{name:>12}: {elapsed:7.1f}s for {len(paths)} tracks -> {per_hour:7.0f} tracks/hour")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cold start: time from launching the GUI process to its first visible
+window, plus the slowest imports on the way there (from -X importtime).
+Heavy modules (torch, demucs, audio_separator) should not show up; they
+load in the background after the window is up.
+
+Usage (from the repo root):
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --offscreen   # no display needed
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("torch", "torchaudio", "demucs", "audio_separator", "numpy")
+
+# Runs in the child: build the window the way main.py does, report, quit hard
+# (the background probe may still be starting a daemon)
+CHILD = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+sys.argv = ["main.py"]
+import main
+app, window = main.start_gui()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+app.processEvents()
+# The window redirects sys.stdout into its log buffer
+sys.__stdout__.write("FIRST_WINDOW " + ",".join(heavy) + "\\n")
+sys.__stdout__.flush()
+os._exit(0)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    {module: cumulative microseconds} for top-level imports.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue # header
+        if not name.startswith(" ") or not name[1:2].strip():
+            continue
+        if name.startswith("  "):
+            continue # nested
+        imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def run_once(env):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(root=ROOT, heavy=HEAVY)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, cwd=ROOT
+    )
+    heavy = None
+    for line in process.stdout:
+        if line.startswith("FIRST_WINDOW"):
+            elapsed = time.perf_counter() - start
+            heavy = line[len("FIRST_WINDOW"):].strip()
+            break
+    else:
+        raise RuntimeError(process.stderr.read()[-2000:])
+    stderr = process.stderr.read()
+    process.wait()
+    return elapsed, heavy, parse_importtime(stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--offscreen", action="store_true", help="Use Qt's offscreen platform")
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    times = []
+    for _ in range(args.runs):
+        elapsed, heavy, imports = run_once(env)
+        times.append(elapsed)
+
+    print(f"time to first window: median {statistics.median(times) * 1000:.0f} ms, "
+          f"min {min(times) * 1000:.0f} ms over {args.runs} run(s)")
+    print(f"heavy modules loaded before the window: {heavy or 'none'}")
+    print(f"imports: {sum(imports.values()) / 1000:.0f} ms total, slowest:")
+    for name, micros in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
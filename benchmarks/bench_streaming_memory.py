@@ -0,0 +1,79 @@
+"""
+Peak memory of in-memory vs. streaming separation as the input gets longer.
+
+Every (mode, duration) pair runs in a fresh child process so the peak RSS
+reported is for that run alone. The synthetic input is noise like
+create_dummy_audio.py, written block by block so generating a multi-hour
+file doesn't need the whole track in memory either.
+
+Usage (from the repo root):
+    python benchmarks/bench_streaming_memory.py --minutes 10,60,180
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from create_dummy_audio import write_mix
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        # ru_maxrss is KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def run_child(args):
+    from src.core.splitter import separate_audio
+    output_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    separate_audio(args.input, output_dir, 4, 0, False, False, streaming=args.mode == "streaming")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_case(path, mode):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode, "--input", path]
+    out = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", default="10,60,180")
+    parser.add_argument("--memory-limit-minutes", type=float, default=30,
+                        help="skip the in-memory mode above this duration (it would swap or OOM)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    print(f"{'minutes':>8} {'mode':>10} {'seconds':>9} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as folder:
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            path = os.path.join(folder, f"long_{minutes:g}min.wav")
+            write_mix(path, minutes * 60, kind="noise", block_seconds=60)
+            for mode in ("memory", "streaming"):
+                if mode == "memory" and minutes > args.memory_limit_minutes:
+                    continue
+                result = run_case(path, mode)
+                print(f"{minutes:>8g} {mode:>10} {result['seconds']:>9.1f} {result['peak_rss_mb']:>12.0f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark suite: every pipeline mode of separate_audio on synthetic mixes,
+with the mock model backend (default, no downloads, milliseconds of model
+time so the pipeline itself is measured) or the real models on the CPU.
+
+Every case runs in a fresh child process with CUDA hidden and empty
+result and decode caches: each run is a cache miss that also stores its
+result, as a first run would. The silent_gaps cases add 30 s of
+silence before and after the music, with and without silence skipping.
+Latency, throughput (audio seconds per second), peak RSS and the
+per-stage times from the job's trace (see src/core/trace.py) are the
+median of --repeat runs. Results can be saved as a baseline and later runs
+compared against it; --check fails on a regression beyond --tolerance.
+
+Usage (from the repo root):
+    python benchmarks/bench_suite.py                          # mock backend, compare to its baseline
+    python benchmarks/bench_suite.py --save-baseline          # record a new baseline
+    python benchmarks/bench_suite.py --backend real --cases standard_4,streaming
+    python benchmarks/bench_suite.py --check --tolerance 0.3  # exit 1 on regressions (CI)
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import subprocess
+from statistics import median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_streaming_memory import peak_rss_mb
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+
+# name: (stem_count, quality, separate_audio options)
+CASES = {
+    "standard_4": (4, 1, {}),
+    "standard_6": (6, 1, {}),
+    "fast_4": (4, 0, {}),
+    "instrumental": (2, 1, {"mode": "instrumental"}),
+    "rhythm": (4, 1, {"mode": "rhythm"}),
+    "vocals_only": (2, 1, {"mode": "vocals_only"}),
+    "vocals_only_full": (2, 1, {"mode": "vocals_only", "dereverb": True, "invert": True}),
+    "streaming": (4, 1, {"streaming": True}),
+    "flac_zip": (4, 1, {"export_format": "flac", "zip": True, "keep_original": True}),
+    "silent_gaps": (4, 1, {}),
+    "silent_gaps_kept": (4, 1, {"skip_silence": False}),
+}
+
+# Cases run on another input than the plain mix: write_mix options
+INPUTS = {
+    "silent_gaps": {"silence": 30},
+    "silent_gaps_kept": {"silence": 30},
+}
+
+# Stages shown in the table; the JSON output and baselines keep all of them
+SHOWN_STAGES = ("model_load", "decode", "load", "inference", "mdx_vocal", "ensemble", "encode", "zip")
+
+
+def run_child(args):
+    if args.backend == "mock":
+        from benchmarks import mock_backend
+        mock_backend.install()
+    from src.core import splitter
+    from src.core.encoder import encoder_pool
+    from src.core.trace import TRACE_FILE, read_trace
+
+    stem_count, quality, options = CASES[args.case]
+    options = dict(options)
+    if options.get("mode") == "vocals_only" and splitter.AdvancedAudioProcessor is None:
+        print(json.dumps({"skipped": "audio-separator is not installed"}))
+        return
+    try:
+        splitter.separate_audio(args.input, args.output, stem_count, quality, options.pop("zip", False),
+                                options.pop("keep_original", False), **options)
+    except Exception as e:
+        if args.backend == "real":
+            # Typically the weights can't be downloaded (no network)
+            print(json.dumps({"skipped": f"{type(e).__name__}: {e}"}))
+            return
+        raise
+    # The result is cached in the background after the job returned; let
+    # it finish (and log) before the figures go out
+    encoder_pool.shutdown()
+    trace = read_trace(os.path.join(args.output, TRACE_FILE))
+    print(json.dumps({
+        "wall": trace["wall"],
+        "audio_seconds": trace["audio_seconds"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": {name: stage["wall"] for name, stage in trace["stages"].items()},
+        "stats": trace.get("stats", {}),
+    }))
+
+
+def run_case(backend, case, path, folder):
+    output = tempfile.mkdtemp(dir=folder)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--backend", backend, "--case", case,
+           "--input", path, "--output", output]
+    # Fresh caches, so every run pays for its decode and for storing its result
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="", STEMLAB_DECODE_DIR=tempfile.mkdtemp(dir=folder),
+               STEMLAB_CACHE_DIR=tempfile.mkdtemp(dir=folder))
+    out = subprocess.run(cmd, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    """
+    Median of each figure over repeated runs of one case.
+    """
+    stages = {}
+    for run in runs:
+        for name, seconds in run["stages"].items():
+            stages.setdefault(name, []).append(seconds)
+    wall = median(run["wall"] for run in runs)
+    audio = runs[0]["audio_seconds"]
+    return {
+        "latency": round(wall, 4),
+        "throughput": round(audio / wall, 2) if audio else None,
+        "peak_rss_mb": round(median(run["peak_rss_mb"] for run in runs), 1),
+        "stages": {name: round(median(times), 4) for name, times in stages.items()},
+        "stats": runs[0].get("stats", {}),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions against `baseline`: [(case, metric, baseline, current)] for
+    latency, peak RSS and every stage that got slower by more than
+    `tolerance` (a fraction). Stages under 10 ms are too noisy to judge.
+    """
+    regressions = []
+    for case, result in results.items():
+        before = baseline.get("cases", {}).get(case)
+        if not before or "skipped" in result or "skipped" in before:
+            continue
+        checks = [("latency", before["latency"], result["latency"]),
+                  ("peak_rss_mb", before["peak_rss_mb"], result["peak_rss_mb"])]
+        checks += [(f"stage {name}", seconds, result["stages"].get(name, 0.0))
+                   for name, seconds in before["stages"].items() if seconds >= 0.01]
+        for metric, old, new in checks:
+            if old and new > old * (1 + tolerance):
+                regressions.append((case, metric, old, new))
+    return regressions
+
+
+def baseline_path(backend):
+    return os.path.join(BASELINE_DIR, f"{backend}.json")
+
+
+def print_table(results, baseline):
+    header = f"{'case':>18} {'latency s':>10} {'vs base':>8} {'audio s/s':>10} {'peak MB':>8}  stages"
+    print(header)
+    for case, result in results.items():
+        if "skipped" in result:
+            print(f"{case:>18}  skipped: {result['skipped']}")
+            continue
+        before = baseline.get("cases", {}).get(case, {}).get("latency")
+        delta = f"{(result['latency'] / before - 1) * 100:+.0f}%" if before else "-"
+        stages = ", ".join(f"{name} {result['stages'][name]:.2f}" for name in SHOWN_STAGES
+                           if name in result["stages"])
+        if result.get("stats", {}).get("silence_skipped"):
+            stages += f" (silence skipped {result['stats']['silence_skipped']:.0%})"
+        print(f"{case:>18} {result['latency']:>10.2f} {delta:>8} {result['throughput'] or 0:>10.1f} "
+              f"{result['peak_rss_mb']:>8.0f}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("mock", "real"), default="mock")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma separated, from: " + ", ".join(CASES))
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic mix")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the full results here")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the backend's baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if anything regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    from create_dummy_audio import write_mix
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    baseline = {}
+    if os.path.exists(baseline_path(args.backend)):
+        with open(baseline_path(args.backend), encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        inputs = {}
+        for case in cases:
+            options = INPUTS.get(case, {})
+            key = json.dumps(options, sort_keys=True)
+            if key not in inputs:
+                inputs[key] = write_mix(os.path.join(folder, f"mix{len(inputs)}.wav"), args.seconds, **options)
+            path = inputs[key]
+            runs = []
+            for _ in range(args.repeat):
+                run = run_case(args.backend, case, path, folder)
+                if "skipped" in run:
+                    results[case] = run
+                    break
+                runs.append(run)
+            else:
+                results[case] = summarize(runs)
+
+    print_table(results, baseline)
+    report = {
+        "backend": args.backend,
+        "seconds": args.seconds,
+        "repeat": args.repeat,
+        "machine": f"{platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}",
+        "cases": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.backend), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {os.path.relpath(baseline_path(args.backend), ROOT)}")
+        return 0
+
+    if baseline:
+        if baseline.get("seconds") != args.seconds:
+            print(f"Note: the baseline used {baseline.get('seconds')}s of audio, this run {args.seconds}s")
+        regressions = compare(results, baseline, args.tolerance)
+        for case, metric, old, new in regressions:
+            print(f"REGRESSION {case}: {metric} {old:.2f} -> {new:.2f}")
+        if not regressions:
+            print(f"No regressions against {os.path.relpath(baseline_path(args.backend), ROOT)} "
+                  f"(tolerance {args.tolerance:.0%})")
+        if regressions and args.check:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+End-to-end latency of the vocals-only (ultra clean) mode with Demucs and
+Kim_Vocal_2 run one after the other vs. concurrently.
+
+Needs audio-separator and the models (downloaded on first use).
+
+Usage (from the repo root):
+    python benchmarks/bench_vocals_pipeline.py --files 3 --seconds 30
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_worker_daemon import make_inputs
+from src.core import splitter
+
+
+def run(path, quality, parallel):
+    output_dir = os.path.join(os.path.dirname(path), f"{os.path.basename(path)}-{'par' if parallel else 'seq'}")
+    start = time.perf_counter()
+    splitter.separate_audio(path, output_dir, 2, quality, False, False,
+                            mode="vocals_only", cache=False, parallel_mdx=parallel)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--quality", type=int, default=1)
+    args = parser.parse_args()
+
+    if splitter.AdvancedAudioProcessor is None:
+        sys.exit("audio-separator is not installed, the vocals-only pipeline can't run")
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_inputs(folder, args.files, args.seconds)
+        # Load every model once so both modes are measured warm
+        run(paths[0], args.quality, parallel=False)
+
+        results = {}
+        for parallel in (False, True):
+            results[parallel] = [run(path, args.quality, parallel) for path in paths]
+
+    for parallel, timings in results.items():
+        name = "concurrent" if parallel else "sequential"
+        print(f"{name:>11}: mean {sum(timings) / len(timings):6.1f}s, "
+              f"min {min(timings):6.1f}s, max {max(timings):6.1f}s per track")
+    before, after = (sum(results[p]) for p in (False, True))
+    print(f"Speed-up: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
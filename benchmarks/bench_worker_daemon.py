@@ -0,0 +1,91 @@
+"""
+Per-job overhead of the old one-subprocess-per-file worker vs. the warm
+worker daemon.
+
+Usage (from the repo root):
+    python benchmarks/bench_worker_daemon.py --files 5 --seconds 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_dummy_audio import write_mix
+from src.core.daemon import DaemonClient
+
+
+def make_inputs(folder, count, seconds):
+    return [write_mix(os.path.join(folder, f"bench_{i}.wav"), seconds, kind="noise", seed=i) for i in range(count)]
+
+
+def make_config(path, quality):
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return {
+        "input_file": path,
+        "output_dir": os.path.join(os.path.dirname(path), f"{base_name} - Stems"),
+        "stem_count": 4,
+        "quality": quality,
+        "export_zip": False,
+        "keep_original": False,
+        # Every run has to separate, not reuse an earlier result
+        "cache": False,
+    }
+
+
+def run_subprocess_mode(paths, quality):
+    timings = []
+    for path in paths:
+        cmd = [sys.executable, "-u", "main.py", "--worker", json.dumps(make_config(path, quality))]
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_daemon_mode(paths, quality):
+    client = DaemonClient()
+    timings = []
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            client.run_job(make_config(path, quality))
+            timings.append(time.perf_counter() - start)
+    finally:
+        client.stop()
+    return timings
+
+
+def report(name, timings):
+    total = sum(timings)
+    print(f"{name:>10}: total {total:7.2f}s | first {timings[0]:6.2f}s | "
+          f"mean of rest {np.mean(timings[1:]) if len(timings) > 1 else float('nan'):6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--seconds", type=int, default=5)
+    parser.add_argument("--quality", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_inputs(folder, args.files, args.seconds)
+
+        old = run_subprocess_mode(paths, args.quality)
+        new = run_daemon_mode(paths, args.quality)
+
+    report("subprocess", old)
+    report("daemon", new)
+    overhead = (sum(old) - sum(new)) / len(paths)
+    print(f"Per-job overhead saved by the daemon: {overhead:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+ZIP export of 6-stem WAV outputs: shutil.make_archive over the finished
+folder (everything deflated, after every encode is done) vs. the streaming
+ZipSink fed as each stem finishes encoding (STORED unless deflate pays off).
+
+Reports the time from the first encode to a finished ZIP, the part of it
+left after the last encode (what the job actually waits for), and the ZIP
+size.
+
+Usage (from the repo root):
+    python benchmarks/bench_zip_export.py --seconds 240 --repeat 3
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from statistics import median
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from create_dummy_audio import synth_sources
+from src.core.archive import ZipSink
+from src.core.encoder import encoder_pool
+
+STEMS = ("drums", "bass", "other", "vocals", "guitar", "piano")
+
+
+def make_stems(seconds, sr=44100):
+    sources = synth_sources(0, int(seconds * sr), sr)
+    # Two more made-up sources for a 6-stem layout
+    sources["guitar"] = np.roll(sources["other"], sr // 3, axis=0) * 0.8
+    sources["piano"] = np.roll(sources["vocals"], sr // 2, axis=0) * 0.5
+    return {name: sources[name].T.copy() for name in STEMS}
+
+
+def export(stems, folder, streaming, sr=44100):
+    output_dir = os.path.join(folder, "streaming" if streaming else "make_archive")
+    os.makedirs(output_dir)
+    start = time.perf_counter()
+    archive = ZipSink(f"{output_dir}.zip") if streaming else None
+    futures = []
+    for name, audio in stems.items():
+        path = os.path.join(output_dir, f"{name}.wav")
+        future = encoder_pool.encode(audio, path, sr)
+        if archive:
+            archive.add_when_done(future, path)
+        futures.append(future)
+    encoder_pool.wait_all(futures)
+    encoded = time.perf_counter()
+    if archive:
+        archive.close()
+    else:
+        shutil.make_archive(output_dir, "zip", output_dir)
+    done = time.perf_counter()
+    size = os.path.getsize(f"{output_dir}.zip")
+    shutil.rmtree(output_dir)
+    os.remove(f"{output_dir}.zip")
+    return done - start, done - encoded, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=240)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    stems = make_stems(args.seconds)
+    print(f"{'export':>13} {'total s':>8} {'after encode s':>15} {'zip MB':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for streaming in (False, True):
+            runs = [export(stems, folder, streaming) for _ in range(args.repeat)]
+            total, tail = median(r[0] for r in runs), median(r[1] for r in runs)
+            name = "ZipSink" if streaming else "make_archive"
+            print(f"{name:>13} {total:>8.2f} {tail:>15.2f} {runs[0][2] / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Lightweight stand-ins for the separation models, so every pipeline mode
+can be benchmarked (and exercised) on a CPU-only machine with no network.
+
+MockDemucs has the interface separate_audio needs from a Demucs model and
+splits the spectrum into complementary bands, one per source (vocals take
+the centre channel's mid band), so the stems always sum back to the mix.
+MockSeparator mimics audio-separator's Separator for the MDX stages of the
+vocals-only pipeline: it writes "(Vocals)" (the centre) and the other stem
+named after the model.
+
+install() must run before src.core.splitter is imported, so the vocals-only
+pipeline sees an AdvancedAudioProcessor even without audio-separator.
+"""
+import os
+import sys
+import types
+
+import numpy as np
+import soundfile as sf
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Model names separate_audio may ask for, with their sources
+DEMUCS_MODELS = {
+    "htdemucs": ("drums", "bass", "other", "vocals"),
+    "htdemucs_ft": ("drums", "bass", "other", "vocals"),
+    "htdemucs_6s": ("drums", "bass", "other", "vocals", "guitar", "piano"),
+}
+
+# Band edges in Hz for each source; the last band runs to Nyquist
+BANDS = {"bass": (0, 150), "drums": (150, 400), "vocals": (400, 2000), "guitar": (2000, 4000),
+         "piano": (4000, 6000), "other": (6000, None)}
+
+
+class MockDemucs(torch.nn.Module):
+    def __init__(self, sources, samplerate=44100, segment=7.8):
+        super().__init__()
+        self.sources = list(sources)
+        self.samplerate = samplerate
+        self.audio_channels = 2
+        self.segment = segment
+        # Something to measure for the model cache
+        self.gain = torch.nn.Parameter(torch.ones(len(self.sources)), requires_grad=False)
+
+    def masks(self, length):
+        freqs = torch.fft.rfftfreq(length, 1 / self.samplerate)
+        masks = torch.zeros(len(self.sources), len(freqs))
+        for index, source in enumerate(self.sources):
+            low, high = BANDS[source]
+            masks[index] = (freqs >= low) & ((freqs < high) if high else True)
+        # Frequencies no band of this model covers go to "other"
+        masks[self.sources.index("other")] += masks.sum(0) == 0
+        return masks
+
+    def forward(self, mix):
+        length = mix.shape[-1]
+        spectrum = torch.fft.rfft(mix, dim=-1)
+        masks = self.masks(length)
+        out = torch.fft.irfft(spectrum[:, None] * masks[None, :, None], n=length, dim=-1)
+        return out * self.gain[None, :, None, None]
+
+
+class MockSeparator:
+    """
+    audio-separator's Separator, as far as AdvancedAudioProcessor uses it.
+    """
+    def __init__(self, log_level=None, output_dir=None, output_format="wav", **kwargs):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.model_instance = None
+        self.model_file_dir = os.path.join(ROOT, "models")
+        self.model_name = None
+
+    def load_model(self, model_filename):
+        self.model_name = model_filename
+
+    def separate(self, path):
+        data, sr = sf.read(path, dtype="float32", always_2d=True)
+        centre = data.mean(axis=1, keepdims=True)
+        kept = np.repeat(centre, data.shape[1], axis=1)
+        base = os.path.splitext(os.path.basename(path))[0]
+        model = os.path.splitext(self.model_name)[0]
+        # Each MDX model of the chain keeps a different stem
+        other = {"Reverb_HQ_By_FoxJoy": "No Reverb", "UVR-De-Echo-Normal": "No Echo"}.get(model, "Instrumental")
+        outputs = {}
+        if other == "Instrumental":
+            outputs["Vocals"] = kept
+            outputs["Instrumental"] = data - kept
+        else:
+            outputs[other] = data
+        names = []
+        for stem, audio in outputs.items():
+            name = f"{base}_({stem})_{model}.{self.output_format}"
+            sf.write(os.path.join(self.output_dir, name), audio, sr)
+            names.append(name)
+        return names
+
+
+def install_separator():
+    """
+    Makes audio_separator.separator.Separator the mock, whether or not the
+    real package is installed.
+    """
+    module = types.ModuleType("audio_separator.separator")
+    module.Separator = MockSeparator
+    package = sys.modules.get("audio_separator") or types.ModuleType("audio_separator")
+    package.separator = module
+    sys.modules["audio_separator"] = package
+    sys.modules["audio_separator.separator"] = module
+    if "src.core.advanced_audio" in sys.modules:
+        sys.modules["src.core.advanced_audio"].Separator = MockSeparator
+
+
+def install(device="cpu", separator=True):
+    """
+    Puts a MockDemucs in the model cache under every name separate_audio
+    uses, and (with separator) the mock audio-separator.
+    """
+    from src.core.model_cache import model_cache
+    if separator:
+        install_separator()
+    for name, sources in DEMUCS_MODELS.items():
+        model_cache.get(name, device, lambda sources=sources: MockDemucs(sources))
+
+
+def uninstall(device="cpu"):
+    from src.core.model_cache import model_cache
+    for name in DEMUCS_MODELS:
+        if (name, device) in model_cache.entries:
+            model_cache.evict((name, device))
@@ -0,0 +1,2 @@
+# Makes the repo root importable (src, benchmarks, create_dummy_audio) when
+# pytest is run as plain `pytest` rather than `python -m pytest`
@@ -1,9 +1,77 @@
+import sys
+
 import numpy as np
 import soundfile as sf
 
-# Generate 5 seconds of silence/noise
-sr = 44100
-duration = 5
-data = np.random.uniform(-0.1, 0.1, size=(sr * duration, 2))
-sf.write("test_audio.wav", data, sr)
-print("Created test_audio.wav")
+# Synthetic test input. A "mix" is four made-up sources (drums, bass, other,
+# vocals) so separation has something to separate; "noise" is the old 5
+# seconds of uniform noise. The tones are functions of the absolute sample
+# index, so long files can be written block by block with no seams.
+
+SAMPLERATE = 44100
+TEMPO = 120 # beats per minute
+SOURCES = ("drums", "bass", "other", "vocals")
+
+
+def synth_sources(start, count, sr=SAMPLERATE, seed=0):
+    """
+    {source: (count, 2) float32} for samples [start, start + count).
+    """
+    t = (start + np.arange(count)) / sr
+    beat = 60.0 / TEMPO
+    rng = np.random.default_rng(seed + start)
+
+    # Drums: a noise burst on every beat, decaying over 100 ms
+    phase = t % beat
+    drums = rng.uniform(-1, 1, count) * np.exp(-phase / 0.1) * 0.5
+    # Bass: root note of a four-bar progression, one octave down
+    roots = np.array([55.0, 73.42, 61.74, 82.41])[(t // (4 * beat)).astype(int) % 4]
+    bass = 0.4 * np.sin(2 * np.pi * roots * t)
+    # Other: a major triad over the same root, two octaves up
+    other = sum(0.12 * np.sin(2 * np.pi * roots * 4 * ratio * t) for ratio in (1.0, 1.26, 1.5))
+    # Vocals: harmonics with vibrato, two beats on, two beats off
+    pitch = roots * 8 * (1 + 0.01 * np.sin(2 * np.pi * 5 * t))
+    voiced = (t % (4 * beat)) < 2 * beat
+    vocals = sum(0.2 / k * np.sin(2 * np.pi * k * pitch * t) for k in (1, 2, 3)) * voiced
+
+    # Spread the instruments across the stereo field, vocals in the centre
+    pans = {"drums": 0.3, "bass": 0.0, "other": -0.4, "vocals": 0.0}
+    out = {}
+    for name, mono in zip(SOURCES, (drums, bass, other, vocals)):
+        left, right = np.sqrt(0.5 - pans[name] / 2), np.sqrt(0.5 + pans[name] / 2)
+        out[name] = np.stack([mono * left, mono * right], axis=1).astype(np.float32)
+    return out
+
+
+def write_mix(path, seconds, sr=SAMPLERATE, kind="mix", silence=0.0, block_seconds=30, subtype="PCM_16", seed=0):
+    """
+    Writes `seconds` of synthetic audio to `path` (any soundfile format),
+    block by block. silence adds that many seconds of digital silence
+    before and after the music.
+    """
+    rng = np.random.default_rng(seed)
+    pad = int(silence * sr)
+    total = int(seconds * sr)
+    block = int(block_seconds * sr)
+    with sf.SoundFile(path, "w", sr, 2, subtype=subtype) as f:
+        if pad:
+            f.write(np.zeros((pad, 2), dtype=np.float32))
+        for start in range(0, total, block):
+            count = min(block, total - start)
+            if kind == "noise":
+                data = rng.uniform(-0.1, 0.1, size=(count, 2)).astype(np.float32)
+            else:
+                # Headroom so the sum never clips
+                data = 0.6 * sum(synth_sources(start, count, sr, seed).values())
+            f.write(data)
+        if pad:
+            f.write(np.zeros((pad, 2), dtype=np.float32))
+    return path
+
+
+if __name__ == "__main__":
+    # python create_dummy_audio.py [seconds] [mix|noise]
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    kind = sys.argv[2] if len(sys.argv) > 2 else "noise"
+    write_mix("test_audio.wav", seconds, kind=kind)
+    print("Created test_audio.wav")
@@ -13,11 +13,6 @@ if sys.stdout is None:
 if sys.stderr is None:
     sys.stderr = StreamRedirector()
 
-from PyQt6.QtWidgets import QApplication
-from src.ui.main_window import MainWindow
-from src.ui.splash import SplashScreen
-import time
-
 def run_worker(args):
     # args is a list of arguments passed after --worker
     # Expected: input_file stem_count quality export_zip keep_original
@@ -27,51 +22,61 @@ def run_worker(args):
         config = json.loads(args[0])
         
         from src.core.splitter import separate_audio
-        separate_audio(
-            config['input_file'],
-            config['output_dir'],
-            config['stem_count'],
-            config['quality'],
-            config['export_zip'],
-            config['keep_original'],
-            export_mp3=config.get('export_mp3', False),
-            mode=config.get('mode', 'standard'),
-            dereverb=config.get('dereverb', False),
-            invert=config.get('invert', False)
-        )
+        from src.core.daemon import run_config
+        run_config(separate_audio, config)
     except Exception as e:
         print(f"WORKER ERROR: {e}", file=sys.stderr)
         sys.exit(1)
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("batch", "cache"):
+        # Headless commands, never touch PyQt6
+        from src.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
     if "--worker" in sys.argv:
         # Worker mode
         idx = sys.argv.index("--worker")
         run_worker(sys.argv[idx+1:])
         return
 
+    if "--daemon" in sys.argv:
+        # Persistent worker mode (spawned by DaemonClient)
+        from src.core.daemon import run_daemon
+        run_daemon()
+        return
+
+    # GUI only from here on; the modes above must not pay for Qt
+    app, window = start_gui()
+    sys.exit(app.exec())
+
+def start_gui():
+    """
+    Shows the splash, builds the main window and returns (app, window)
+    once it is visible. Only PyQt and our UI modules load here; torch and
+    the separation stack load in the background (HardwareProbe, worker
+    daemons), so the splash steps are the real ones.
+    """
+    from PyQt6.QtWidgets import QApplication
+    from src.ui.splash import SplashScreen
+
     app = QApplication(sys.argv)
     app.setApplicationName("StemLab")
     
     splash = SplashScreen()
     splash.show()
-    splash.show_message("Initializing Core Systems...")
+    splash.show_message("Loading interface...", 10)
     app.processEvents()
     
-    # Simulate loading (or actually load things if we had heavy imports)
-    time.sleep(1) 
-    splash.show_message("Loading AI Models...")
-    app.processEvents()
-    time.sleep(1)
-    splash.show_message("Starting UI...")
+    from src.ui.main_window import MainWindow
+    splash.show_message("Starting UI...", 60)
     app.processEvents()
-    time.sleep(0.5)
     
     window = MainWindow()
+    splash.show_message("Ready", 100)
     window.show()
     splash.finish(window)
-    
-    sys.exit(app.exec())
+    return app, window
 
 if __name__ == "__main__":
     main()
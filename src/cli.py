@@ -0,0 +1,423 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+# Headless entry point: `main.py batch ...` (StemLab.exe batch ... when frozen)
+# or `python -m src.cli batch ...`. Nothing on this path may import PyQt6.
+
+from src.utils.logger import logger
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a')
+MANIFEST_EXTENSIONS = ('.json', '.txt')
+
+# Output folders are named like the GUI's: "<track> - Stems"
+STEMS_SUFFIX = " - Stems"
+
+DEFAULT_STATE_FILE = "stemlab_batch_state.jsonl"
+
+# Same as ensemble.MODES, without importing numpy just to parse arguments
+ENSEMBLE_MODES = ("average", "avg_spec", "max_spec", "min_spec")
+
+# Same as encoder.FORMATS
+EXPORT_FORMATS = ("wav", "mp3", "flac", "opus")
+
+MODES = {
+    # --mode: (stem_count override, separate_audio mode)
+    "standard": (None, "standard"),
+    "vocals_only": (2, "vocals_only"),
+    "instrumental": (2, "instrumental"),
+    "rhythm": (None, "rhythm"),
+}
+
+
+def is_audio(path):
+    return path.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def walk_audio(root, recursive=True):
+    """
+    Audio files below `root`, sorted. Existing "<track> - Stems" folders are
+    skipped so re-running a batch never separates its own outputs.
+    """
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.endswith(STEMS_SUFFIX))
+        found += [os.path.join(dirpath, f) for f in sorted(filenames) if is_audio(f)]
+        if not recursive:
+            break
+    return found
+
+
+def read_manifest(path):
+    """
+    A manifest lists one input per line (.txt, '#' starts a comment) or is a
+    JSON list of paths / {"input": path, ...option overrides} objects.
+    Relative paths are relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get("files", [])
+            for item in data:
+                if isinstance(item, str):
+                    item = {"input": item}
+                entries.append(dict(item))
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    entries.append({"input": line})
+    for entry in entries:
+        entry["input"] = os.path.join(base, os.path.expanduser(entry["input"]))
+    return entries
+
+
+def collect_inputs(targets, recursive=True):
+    """
+    Expands directories, glob patterns and manifests into a list of
+    {"input": path, "root": folder outputs are mirrored from, ...overrides}.
+    Duplicates are dropped, first occurrence wins.
+    """
+    entries = []
+    for target in targets:
+        target = os.path.expanduser(target)
+        if os.path.isdir(target):
+            root = os.path.abspath(target)
+            entries += [{"input": path, "root": root} for path in walk_audio(root, recursive)]
+        elif os.path.isfile(target) and target.lower().endswith(MANIFEST_EXTENSIONS):
+            entries += read_manifest(target)
+        elif os.path.isfile(target):
+            entries.append({"input": target})
+        else:
+            matches = sorted(glob.glob(target, recursive=True))
+            if not matches:
+                logger.warning(f"No files match {target}")
+            for match in matches:
+                if os.path.isdir(match):
+                    entries += [{"input": path, "root": os.path.abspath(match)} for path in walk_audio(match, recursive)]
+                elif is_audio(match):
+                    entries.append({"input": match})
+
+    seen = set()
+    unique = []
+    for entry in entries:
+        entry["input"] = os.path.abspath(entry["input"])
+        if entry["input"] in seen:
+            continue
+        seen.add(entry["input"])
+        unique.append(entry)
+
+    # Files named one by one, by a glob or in a manifest mirror their common
+    # parent folder, so equal names from different folders don't collide
+    loose = [entry for entry in unique if "root" not in entry]
+    if loose:
+        try:
+            common = os.path.commonpath([os.path.dirname(entry["input"]) for entry in loose])
+        except ValueError:
+            common = None # Different drives
+        for entry in loose:
+            entry["root"] = common
+    return unique
+
+
+def output_dir_for(input_file, output_root=None, root=None):
+    """
+    "<track> - Stems" next to the input, or under output_root. Inputs keep
+    their folder below `root` (see collect_inputs) so equal names don't
+    collide.
+    """
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    folder = os.path.dirname(input_file)
+    if output_root:
+        relative = os.path.relpath(folder, root) if root else ""
+        folder = os.path.normpath(os.path.join(output_root, relative))
+    return os.path.join(folder, f"{base_name}{STEMS_SUFFIX}")
+
+
+def build_config(entry, args):
+    """
+    Worker config (see daemon.run_config) for one input. Manifest entries
+    may override any of the command line options.
+    """
+    stem_override, mode = MODES[entry.get("mode", args.mode)]
+    config = {
+        "input_file": entry["input"],
+        "output_dir": entry.get("output_dir") or output_dir_for(entry["input"], args.output, entry.get("root")),
+        "stem_count": stem_override or int(entry.get("stem_count", args.stems)),
+        "quality": int(entry.get("quality", args.quality)),
+        "export_zip": bool(entry.get("export_zip", args.zip)),
+        "keep_original": bool(entry.get("keep_original", args.keep_original)),
+        "export_mp3": bool(entry.get("export_mp3", args.mp3)),
+        "mode": mode,
+        "dereverb": bool(entry.get("dereverb", args.dereverb)),
+        "invert": bool(entry.get("invert", args.invert)),
+        "ensemble_mode": entry.get("ensemble_mode", args.ensemble_mode),
+    }
+    export_format = entry.get("export_format", args.format)
+    if export_format:
+        config["export_format"] = export_format
+    max_memory = entry.get("max_memory_mb", args.max_memory)
+    if max_memory:
+        config["max_memory_mb"] = int(max_memory)
+    if args.streaming:
+        config["streaming"] = True
+    if args.no_cache:
+        config["cache"] = False
+    if args.keep_silence:
+        config["skip_silence"] = False
+    return config
+
+
+def job_key(config):
+    # Two runs are the same job if every option matches, not just the input
+    return json.dumps(config, sort_keys=True)
+
+
+class BatchState:
+    """
+    Append-only JSON lines journal of finished jobs. Every line is flushed
+    as soon as a job ends, so an interrupted batch can be resumed with
+    --resume and only the files that didn't complete are run again.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.completed = {}
+        self.lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue # Torn last line from a killed run
+                    if record.get("status") == "ok":
+                        self.completed[record["key"]] = record
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def is_done(self, config):
+        record = self.completed.get(job_key(config))
+        return record is not None and os.path.isdir(config["output_dir"])
+
+    def record(self, config, result):
+        with self.lock:
+            self.file.write(json.dumps(dict(result, key=job_key(config))) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def model_cache_totals(daemons):
+    """
+    Model cache hits, misses and evictions summed over the daemons that are
+    still running (see DaemonClient.stats).
+    """
+    totals = {"hits": 0, "misses": 0, "evictions": 0}
+    for daemon in daemons:
+        stats = daemon.stats()
+        if stats:
+            for name in totals:
+                totals[name] += stats[name]
+    return totals
+
+
+def run_batch_command(args):
+    entries = collect_inputs(args.inputs, recursive=not args.no_recursive)
+    if not entries:
+        logger.error("No audio files found")
+        return 2
+
+    configs = [build_config(entry, args) for entry in entries]
+    shared = Counter(config["output_dir"] for config in configs)
+    for folder, count in shared.items():
+        if count > 1:
+            logger.warning(f"{count} inputs write to {folder}, later ones overwrite its stems")
+    state = BatchState(args.state, resume=args.resume)
+    results = {}
+    pending = []
+    for config in configs:
+        if args.resume and state.is_done(config):
+            previous = state.completed[job_key(config)]
+            results[config["input_file"]] = {
+                "input": config["input_file"],
+                "output_dir": config["output_dir"],
+                "status": "skipped",
+                "seconds": previous.get("seconds"),
+            }
+        else:
+            pending.append(config)
+
+    logger.info(f"Batch: {len(configs)} file(s), {len(configs) - len(pending)} already done, {len(pending)} to run")
+
+    from src.core.scheduler import JobScheduler, build_slots, run_batch
+    from src.core.trace import TRACE_FILE, read_trace, write_chrome_trace
+    traces = []
+
+    def on_done(config, error, seconds):
+        result = {
+            "input": config["input_file"],
+            "output_dir": config["output_dir"],
+            "status": "failed" if error else "ok",
+            "seconds": round(seconds, 3),
+        }
+        if error:
+            result["error"] = str(error)
+        else:
+            trace = read_trace(os.path.join(config["output_dir"], TRACE_FILE))
+            if trace:
+                traces.append(trace)
+                result["rtf"] = trace["rtf"]
+                result["stages"] = {name: stage["wall"] for name, stage in trace["stages"].items()}
+                if "silence_skipped" in trace.get("stats", {}):
+                    result["silence_skipped"] = trace["stats"]["silence_skipped"]
+        results[config["input_file"]] = result
+        state.record(config, result)
+        logger.info(f"[{len(results)}/{len(configs)}] {result['status']}: {config['input_file']} ({seconds:.1f}s)")
+
+    def on_line(config, line):
+        # tqdm bars are noise in a log file
+        if "%|" not in line:
+            logger.info(f"[{os.path.basename(config['input_file'])}] {line}")
+
+    started = timestamp()
+    wall = time.perf_counter()
+    interrupted = False
+    scheduler = None
+    model_cache = None
+    try:
+        if pending:
+            scheduler = JobScheduler(build_slots(threads_per_job=args.threads, max_jobs=args.jobs))
+            run_batch(pending, scheduler, on_done=on_done, on_line=on_line if args.verbose else None)
+    except KeyboardInterrupt:
+        interrupted = True
+        logger.warning("Interrupted, run again with --resume to continue")
+    finally:
+        if scheduler:
+            if not interrupted:
+                model_cache = model_cache_totals(scheduler.daemons)
+                logger.info(f"Model cache: {model_cache['hits']} hit(s), {model_cache['misses']} miss(es), "
+                            f"{model_cache['evictions']} eviction(s)")
+            scheduler.stop()
+        state.close()
+
+    files = []
+    for config in configs:
+        files.append(results.get(config["input_file"], {
+            "input": config["input_file"],
+            "output_dir": config["output_dir"],
+            "status": "pending",
+            "seconds": None,
+        }))
+    counts = {}
+    for result in files:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    summary = {
+        "started": started,
+        "finished": timestamp(),
+        "wall_seconds": round(time.perf_counter() - wall, 3),
+        "jobs": scheduler.capacity if scheduler else 0,
+        "interrupted": interrupted,
+        "counts": counts,
+        "files": files,
+    }
+    if model_cache:
+        summary["model_cache"] = model_cache
+    if args.chrome_trace and traces:
+        write_chrome_trace(args.chrome_trace, traces)
+        logger.info(f"Chrome trace written to {args.chrome_trace}")
+
+    text = json.dumps(summary, indent=2)
+    if args.summary and args.summary != "-":
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.info(f"Summary written to {args.summary}")
+    else:
+        print(text)
+
+    if interrupted:
+        return 130
+    return 1 if counts.get("failed") else 0
+
+
+def run_cache_command(args):
+    from src.core.result_cache import result_cache, MB
+
+    if args.action == "clear":
+        logger.info(f"Removed {result_cache.clear()} cached result(s)")
+    elif args.action == "trim":
+        budget = args.max_mb * MB if args.max_mb is not None else None
+        logger.info(f"Removed {result_cache.trim(budget)} cached result(s)")
+    print(json.dumps(result_cache.stats(), indent=2))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="stemlab", description="StemLab headless stem separation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="Separate many files without the GUI")
+    batch.add_argument("inputs", nargs="+", help="Folders, glob patterns, audio files or manifests (.txt/.json)")
+    batch.add_argument("-o", "--output", help="Write stem folders under this folder instead of next to each input")
+    batch.add_argument("--no-recursive", action="store_true", help="Don't descend into sub-folders")
+    batch.add_argument("--stems", type=int, choices=(2, 4, 6), default=4)
+    batch.add_argument("--mode", choices=sorted(MODES), default="standard")
+    batch.add_argument("--quality", type=int, choices=(0, 1, 2), default=1, help="0 fast, 1 balanced, 2 best")
+    batch.add_argument("--mp3", action="store_true", help="Export MP3 (320k) instead of WAV")
+    batch.add_argument("--format", choices=EXPORT_FORMATS, help="Output format (wav, mp3 320k, flac, opus)")
+    batch.add_argument("--zip", action="store_true", help="Also write a ZIP of each stem folder")
+    batch.add_argument("--keep-original", action="store_true")
+    batch.add_argument("--dereverb", action="store_true")
+    batch.add_argument("--invert", action="store_true")
+    batch.add_argument("--ensemble-mode", choices=ENSEMBLE_MODES, default="average",
+                       help="How vocals-only mode blends Demucs and MDX vocals")
+    batch.add_argument("--streaming", action="store_true", help="Force windowed separation for every file")
+    batch.add_argument("--no-cache", action="store_true", help="Always separate, ignoring the result cache")
+    batch.add_argument("--max-memory", type=int, metavar="MB",
+                       help="Memory one job may use; segment size, overlap and streaming are tuned to fit")
+    batch.add_argument("--keep-silence", action="store_true",
+                       help="Run the models over silent stretches too instead of skipping them")
+    batch.add_argument("-j", "--jobs", type=int, help="Concurrent jobs (default: one per GPU or per CPU slot)")
+    batch.add_argument("--threads", type=int, help="CPU threads per job")
+    batch.add_argument("--state", default=DEFAULT_STATE_FILE, help="Journal of finished jobs used by --resume")
+    batch.add_argument("--resume", action="store_true", help="Skip files the journal lists as done")
+    batch.add_argument("--summary", help="Write the JSON summary here instead of stdout")
+    batch.add_argument("--chrome-trace", metavar="PATH",
+                       help="Write the stage timings of every job as one Chrome trace (chrome://tracing, Perfetto)")
+    batch.add_argument("-v", "--verbose", action="store_true", help="Log worker output")
+    batch.set_defaults(handler=run_batch_command)
+
+    cache = commands.add_parser("cache", help="Inspect or empty the result cache")
+    cache.add_argument("action", choices=("stats", "clear", "trim"))
+    cache.add_argument("--max-mb", type=int, help="Budget for trim (default: STEMLAB_CACHE_MB)")
+    cache.set_defaults(handler=run_cache_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Keep stdout clean for the JSON output
+    for handler in logger.handlers:
+        if hasattr(handler, "setStream"):
+            handler.setStream(sys.stderr)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
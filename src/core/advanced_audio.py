@@ -1,122 +1,211 @@
 import os
+import time
 import shutil
 import logging
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 import torch
-import soundfile as sf
-import numpy as np
 from audio_separator.separator import Separator
+from src.core.model_cache import model_cache
+from src.core.stage_graph import Stage, StageGraph
+from src.core.ensemble import blend
+from src.core.inversion import invert
 
 logger = logging.getLogger(__name__)
 
+# Models of the ultra-clean vocal chain, with the output stem each one keeps
+VOCAL_MODEL = ("Kim_Vocal_2.onnx", "Vocals")
+DEREVERB_MODEL = ("Reverb_HQ_By_FoxJoy.onnx", "No Reverb")
+DEECHO_MODEL = ("UVR-De-Echo-Normal.pth", "No Echo")
+
+def pick_output(files, stem):
+    """
+    The file audio-separator wrote for `stem`, e.g. "song_(Vocals)_Kim_Vocal_2.wav".
+    """
+    for f in files:
+        if f"({stem})" in os.path.basename(f):
+            return f
+    return None
+
+def describe(source):
+    return "in-memory audio" if isinstance(source, tuple) else os.path.basename(source)
+
 class AdvancedAudioProcessor:
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, ensemble_mode="average", ensemble_weights=None, input_name=None):
         self.output_dir = output_dir
-        self.separator = Separator(
-            log_level=logging.INFO,
-            output_dir=output_dir,
-            output_format="wav"
-        )
+        # Intermediates (MDX outputs, the ensemble, de-reverb/de-echo) go
+        # here; the caller moves the final vocals out and close() removes it
+        self.work_dir = tempfile.mkdtemp(prefix=".vocals-", dir=output_dir)
+        # Name for the outputs of the models run on the input itself; the
+        # input is the decoded copy (see decode.py), named by content hash
+        self.input_name = input_name
+        # How the Demucs and MDX vocals are combined, see ensemble.blend
+        self.ensemble_mode = ensemble_mode
+        self.ensemble_weights = ensemble_weights
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    def get_separator(self, model_name):
+        """
+        Returns an audio-separator instance with `model_name` loaded.
+        Instances are cached per (model, device) so the ONNX session is
+        only built once per process.
+        """
+        def loader():
+            logger.info(f"Loading MDX Model: {model_name}")
+            separator = Separator(
+                log_level=logging.INFO,
+                output_dir=self.work_dir,
+                output_format="wav"
+            )
+            separator.load_model(model_filename=model_name)
+            return separator
+
+        def model_size(separator):
+            model_path = os.path.join(separator.model_file_dir, model_name)
+            return os.path.getsize(model_path) if os.path.exists(model_path) else 0
+
+        separator = model_cache.get(model_name, self.device, loader, size_fn=model_size)
+
+        # A cached separator may have been created for another job's folder
+        separator.output_dir = self.work_dir
+        if separator.model_instance is not None:
+            separator.model_instance.output_dir = self.work_dir
+        return separator
 
-    def run_mdx(self, input_file, model_name):
+    def run_mdx(self, input_file, model_name, name=None):
         """
         Runs a specific MDX model using audio-separator.
-        Returns the path to the output file.
+        Returns the path to the output file. With `name`, the outputs are
+        named after it instead of input_file.
         """
-        logger.info(f"Loading MDX Model: {model_name}")
-        self.separator.load_model(model_filename=model_name)
+        separator = self.get_separator(model_name)
         
         logger.info(f"Separating with {model_name}...")
         # audio-separator returns a list of output filenames
-        output_files = self.separator.separate(input_file)
+        output_files = separator.separate(input_file)
         
         # We assume the model produces specific stems. 
         # For vocal models, we usually get a vocals file and an instrumental file.
         # We need to identify which is which.
         # Usually audio-separator names them like "{filename}_(Vocals)_{model}.wav"
         
-        return [os.path.join(self.output_dir, f) for f in output_files]
+        paths = [os.path.join(self.work_dir, f) for f in output_files]
+        base = os.path.splitext(os.path.basename(input_file))[0]
+        if name and name != base:
+            renamed = []
+            for path in paths:
+                filename = os.path.basename(path)
+                if filename.startswith(base):
+                    target = os.path.join(os.path.dirname(path), name + filename[len(base):])
+                    os.replace(path, target)
+                    path = target
+                renamed.append(path)
+            paths = renamed
+        return paths
 
-    def ensemble_blend(self, file1, file2, output_path):
+    def ensemble_blend(self, file1, file2, output_path=None):
         """
-        Blends two audio files by averaging them.
+        Blends two separations of the same stem with the processor's
+        ensemble mode and weights, streaming block by block.
+        Either input may also be a (data, samplerate) tuple; without
+        output_path the blend is returned as one too.
         """
-        logger.info(f"Blending {os.path.basename(file1)} and {os.path.basename(file2)}")
-        
-        data1, sr1 = sf.read(file1)
-        data2, sr2 = sf.read(file2)
-        
-        # Ensure same length
-        min_len = min(len(data1), len(data2))
-        data1 = data1[:min_len]
-        data2 = data2[:min_len]
-        
-        # Average
-        blended = (data1 + data2) / 2
-        
-        sf.write(output_path, blended, sr1)
-        return output_path
+        logger.info(f"Blending {describe(file1)} and {describe(file2)} ({self.ensemble_mode})")
+        return blend([file1, file2], output_path, weights=self.ensemble_weights, mode=self.ensemble_mode)
 
     def invert_audio(self, original_file, stem_file, output_path):
         """
         Creates instrumental by subtracting stem from original.
         Instrumental = Original - Stem
+        stem_file may be a path or a (data, samplerate) tuple.
+        Streams both files; a stem at another sample rate is resampled and
+        its latency is compensated (see inversion.invert).
         """
         logger.info("Performing Audio Inversion...")
-        
-        orig, sr_orig = sf.read(original_file)
-        stem, sr_stem = sf.read(stem_file)
-        
-        # Ensure match
-        if sr_orig != sr_stem:
-            # Resample would be needed here, but for now assume matching SR
-            pass
-            
-        min_len = min(len(orig), len(stem))
-        orig = orig[:min_len]
-        stem = stem[:min_len]
-        
-        # Invert
-        inverted = orig - stem
-        
-        sf.write(output_path, inverted, sr_orig)
+        invert(original_file, stem_file, output_path)
         return output_path
 
-    def process_vocals_ultra_clean(self, input_file, demucs_vocals):
+    def run_model_stage(self, model, label, name=None):
         """
-        Full pipeline:
-        1. Kim_Vocal_2 (MDX)
-        2. Blend with Demucs Vocals
-        3. De-Reverb (HP2)
-        4. De-Echo (Reverb_HQ)
+        Stage body: runs `model` on a file and returns the `label` stem.
+        name is passed on to run_mdx.
         """
-        # 1. Run Kim_Vocal_2
-        mdx_outputs = self.run_mdx(input_file, "Kim_Vocal_2.onnx")
-        
-        # Find the vocals stem from MDX output
-        mdx_vocals = None
-        for f in mdx_outputs:
-            if "Vocals" in f or "Kim_Vocal_2" in f: 
-                mdx_vocals = f
-                break
-        
-        if not mdx_vocals:
-            logger.warning("Could not find MDX vocals, skipping ensemble.")
-            return demucs_vocals
+        model_name, stem = model
+        def run(input_file):
+            output = pick_output(self.run_mdx(input_file, model_name, name), stem)
+            if output is None:
+                logger.warning(f"{model_name} produced no {stem} stem, skipping {label}.")
+            return output
+        return run
 
-        # 2. Ensemble
-        ensemble_vocals = os.path.join(self.output_dir, "vocals_ensemble.wav")
-        self.ensemble_blend(demucs_vocals, mdx_vocals, ensemble_vocals)
-        
-        # 3. De-Reverb (HP2-all-vocals)
-        # HP2-all-vocals-32000-1.band (UVR-MDX-Net)
-        # Note: audio-separator might need the exact filename if it's not in its default list.
-        # We'll try the common name.
-        hp2_outputs = self.run_mdx(ensemble_vocals, "UVR-MDX-NET-Inst_HQ_3.onnx") # Fallback if HP2 not found by default name
-        # Ideally we'd use "HP2-all-vocals-32000-1.band.onnx" but let's stick to a known working one for now or try the user's name
-        # If the user has the file, they can put it in the models dir. 
-        # For now, let's use the ensemble output as the input for the next stage if we skip de-reverb due to missing model.
-        
-        # 4. De-Echo (Reverb_HQ_By_FoxJoy)
-        # reverb_outputs = self.run_mdx(ensemble_vocals, "Reverb_HQ_By_FoxJoy.onnx")
-        
-        return ensemble_vocals
+    def start_vocal_model(self, input_file, trace=None):
+        """
+        Starts the MDX vocal stage on a background thread; it only needs the
+        original file, so it can overlap with Demucs. Pass the returned
+        future to process_vocals_ultra_clean as mdx_vocals.
+        """
+        run = self.run_model_stage(VOCAL_MODEL, "ensemble", self.input_name)
+        if trace:
+            run = trace.wrap("mdx_vocal", run)
+        def timed():
+            start = time.perf_counter()
+            return run(input_file), time.perf_counter() - start
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mdx-vocal")
+        future = executor.submit(timed)
+        executor.shutdown(wait=False)
+        return future
+
+    def ultra_clean_graph(self, dereverb=False):
+        """
+        MDX vocal -> ensemble with Demucs -> de-reverb -> de-echo.
+        The ensemble stays in memory unless de-reverb (audio-separator,
+        which only reads files) runs on it.
+        """
+        def ensemble(demucs_vocals, mdx_vocals):
+            path = os.path.join(self.work_dir, "vocals_ensemble.wav") if dereverb else None
+            return self.ensemble_blend(demucs_vocals, mdx_vocals, path)
+
+        return StageGraph([
+            Stage("mdx_vocal", self.run_model_stage(VOCAL_MODEL, "ensemble", self.input_name), ["input"], ["mdx_vocals"]),
+            Stage("ensemble", ensemble, ["demucs_vocals", "mdx_vocals"], ["ensemble_vocals"]),
+            Stage("dereverb", self.run_model_stage(DEREVERB_MODEL, "de-reverb"), ["ensemble_vocals"], ["dry_vocals"]),
+            Stage("deecho", self.run_model_stage(DEECHO_MODEL, "de-echo"), ["dry_vocals"], ["clean_vocals"]),
+        ])
+
+    def process_vocals_ultra_clean(self, input_file, demucs_vocals, dereverb=False, mdx_vocals=None, trace=None):
+        """
+        Runs the ultra-clean vocal graph (see ultra_clean_graph) up to the
+        ensemble, or through de-reverb and de-echo when `dereverb` is set;
+        stages past the requested output are never run.
+        demucs_vocals is a path or a (data, samplerate) tuple.
+        mdx_vocals is an optional future from start_vocal_model(); the
+        graph then joins it at the ensemble instead of running MDX itself.
+        Returns the final vocals: a (data, samplerate) tuple for the
+        ensemble, a path in work_dir (encode it before close()) for the
+        de-reverb stages, or None if the MDX stage failed (the plain Demucs
+        vocals are already in the output folder).
+        Per-stage wall times end up in self.stage_times, and in `trace`
+        (a JobTrace) when given.
+        """
+        target = "clean_vocals" if dereverb else "ensemble_vocals"
+        available = {"input": input_file, "demucs_vocals": demucs_vocals}
+        overlapped = {}
+        if mdx_vocals is not None:
+            start = time.perf_counter()
+            with trace.span("mdx_vocal_wait") if trace else nullcontext():
+                available["mdx_vocals"], seconds = mdx_vocals.result()
+            overlapped = {"mdx_vocal": seconds, "mdx_vocal_wait": time.perf_counter() - start}
+        artifacts, self.stage_times = self.ultra_clean_graph(dereverb).run([target], available, trace)
+        self.stage_times = dict(overlapped, **self.stage_times)
+        if dereverb and artifacts["clean_vocals"] is None:
+            # Keep the best result we got rather than none
+            return artifacts["dry_vocals"] or artifacts["ensemble_vocals"]
+        return artifacts[target]
+
+    def close(self):
+        """
+        Removes the intermediates. A vocal model still running after a
+        failed job may be writing there, so errors are ignored.
+        """
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -0,0 +1,123 @@
+import os
+import zlib
+import queue
+import zipfile
+import threading
+from contextlib import nullcontext
+
+from src.utils.logger import logger
+
+# ZIP export written while the job runs. Each output is added as soon as it
+# is finished (from the encoder pool's done callbacks), on one background
+# thread, so zipping overlaps the remaining encodes and pipeline stages and
+# reads every file while it is still in the page cache. Entries are STORED
+# unless deflating them actually pays off.
+
+# Already compressed formats, never worth deflating
+STORED_EXTENSIONS = ("mp3", "flac", "opus", "ogg", "m4a", "aac", "zip")
+
+# Deflate an entry only if a sample of it shrinks below this ratio (saves 20%+)
+DEFLATE_RATIO = 0.8
+SAMPLE_BYTES = 1024 * 1024
+DEFLATE_LEVEL = 1
+
+
+def choose_compression(path):
+    """
+    (compress_type, compresslevel) for one entry: STORED for compressed
+    formats; otherwise a sample from the middle of the file is deflated
+    and the entry is only deflated if that sample got smaller by at least
+    1 - DEFLATE_RATIO.
+    """
+    if os.path.splitext(path)[1].lower().lstrip(".") in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED, None
+    size = os.path.getsize(path)
+    if size == 0:
+        return zipfile.ZIP_STORED, None
+    with open(path, "rb") as f:
+        f.seek(max(0, size // 2 - SAMPLE_BYTES // 2))
+        sample = f.read(SAMPLE_BYTES)
+    if len(zlib.compress(sample, DEFLATE_LEVEL)) < DEFLATE_RATIO * len(sample):
+        return zipfile.ZIP_DEFLATED, DEFLATE_LEVEL
+    return zipfile.ZIP_STORED, None
+
+
+class ZipSink:
+    """
+    Builds `path` from files handed to it while other work goes on. Files
+    are written by a single thread in the order they arrive; close() waits
+    for the queue to drain and moves the finished archive into place (a
+    failed job leaves no half-written ZIP behind). With a JobTrace, every
+    entry is recorded as a zip_entry span.
+    """
+    def __init__(self, path, trace=None):
+        self.path = path
+        self.trace = trace
+        self.partial = path + ".part"
+        self.queue = queue.Queue()
+        self.names = set()
+        # (future, path, arcname) of every add_when_done, checked by close()
+        self.pending = []
+        self.error = None
+        self.zip = zipfile.ZipFile(self.partial, "w", allowZip64=True)
+        self.thread = threading.Thread(target=self.run, name="zip", daemon=True)
+        self.thread.start()
+
+    def add(self, path, arcname=None):
+        """
+        Queues a finished file; arcname defaults to its file name.
+        """
+        self.queue.put((path, arcname or os.path.basename(path)))
+
+    def add_when_done(self, future, path, arcname=None):
+        """
+        Queues `path` once `future` (the encode writing it) has succeeded.
+        """
+        self.pending.append((future, path, arcname))
+        def done(future):
+            if future.exception() is None:
+                self.add(path, arcname)
+        future.add_done_callback(done)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, arcname = item
+            if self.error or arcname in self.names:
+                continue
+            try:
+                with self.trace.span("zip_entry", file=arcname) if self.trace else nullcontext():
+                    compress_type, level = choose_compression(path)
+                    self.zip.write(path, arcname, compress_type=compress_type, compresslevel=level)
+                self.names.add(arcname)
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """
+        Finishes the archive. Raises the first error the writer hit.
+        """
+        # Waiters on a future wake up before its done callbacks run, so a
+        # caller that just waited for the encodes may get here first; queue
+        # those entries again (the writer skips what it already has)
+        for future, path, arcname in self.pending:
+            if future.exception() is None:
+                self.add(path, arcname)
+        self.queue.put(None)
+        self.thread.join()
+        self.zip.close()
+        if self.error:
+            os.remove(self.partial)
+            raise self.error
+        os.replace(self.partial, self.path)
+        logger.info(f"Created {os.path.basename(self.path)} ({len(self.names)} files)")
+        return self.path
+
+    def abort(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.zip.close()
+        if os.path.exists(self.partial):
+            os.remove(self.partial)
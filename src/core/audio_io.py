@@ -0,0 +1,78 @@
+import struct
+
+import numpy as np
+import torch
+import soundfile as sf
+
+# Frames per chunk when writing (channels, time) tensors
+WRITE_BLOCK = 65536
+
+
+def wav_data_offset(path):
+    """
+    Byte offset of the sample data in a plain RIFF/WAVE file, or None if
+    the file isn't one we can map (RF64, truncated header, ...).
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"data":
+                return f.tell()
+            # Chunks are word aligned
+            f.seek(size + (size & 1), 1)
+
+
+def mmap_float_wav(path, info):
+    """
+    Maps a 32-bit float WAV straight from disk. Copy-on-write, so torch gets
+    a writable array but pages are only read when touched.
+    """
+    if info.format != "WAV" or info.subtype != "FLOAT" or info.endian not in ("FILE", "LITTLE"):
+        return None
+    offset = wav_data_offset(path)
+    if offset is None:
+        return None
+    return np.memmap(path, dtype="<f4", mode="c", offset=offset, shape=(info.frames, info.channels))
+
+
+def load_audio(filepath, mmap=True):
+    """
+    Loads a file as a float32 (channels, time) tensor plus sample rate.
+
+    soundfile decodes straight into one preallocated float32 buffer (float
+    WAVs are memory-mapped instead) and the tensor is a transposed view of
+    it via torch.from_numpy, so the track is held in memory exactly once.
+    """
+    info = sf.info(filepath)
+    data = mmap_float_wav(filepath, info) if mmap else None
+    if data is None:
+        data = np.empty((info.frames, info.channels), dtype=np.float32)
+        with sf.SoundFile(filepath) as f:
+            data = f.read(out=data)
+    return torch.from_numpy(data).t(), info.samplerate
+
+
+def save_audio(filepath, src, sample_rate, subtype=None):
+    """
+    Writes a (channels, time) tensor. Interleaving happens one block at a
+    time through a small reusable buffer instead of materialising a full
+    transposed copy of the track.
+    """
+    src = src.detach().cpu()
+    if src.ndim == 1:
+        src = src.unsqueeze(0)
+    channels, length = src.shape
+    data = src.numpy()
+    buffer = np.empty((min(WRITE_BLOCK, max(length, 1)), channels), dtype=data.dtype)
+    with sf.SoundFile(filepath, "w", sample_rate, channels, subtype=subtype) as f:
+        for start in range(0, length, WRITE_BLOCK):
+            chunk = data[:, start:start + WRITE_BLOCK]
+            out = buffer[:chunk.shape[1]]
+            np.copyto(out, chunk.T)
+            f.write(out)
@@ -0,0 +1,525 @@
+import os
+import sys
+import json
+import queue
+import secrets
+import logging
+import threading
+import subprocess
+import traceback
+from multiprocessing.connection import Listener, Client
+
+from src.utils.logger import logger
+from src.core.progress import JobCancelled
+
+# Environment variables used to hand the connection details to the child
+ADDRESS_ENV = "STEMLAB_DAEMON_ADDRESS"
+AUTHKEY_ENV = "STEMLAB_DAEMON_KEY"
+THREADS_ENV = "STEMLAB_TORCH_THREADS"
+# Number of jobs (scheduler slots) sharing this daemon's device memory
+MEMORY_SHARE_ENV = "STEMLAB_MEMORY_SHARE"
+
+# Spawned by absolute path so daemons start from any working directory (CLI)
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "main.py")
+
+# How long we wait for a freshly spawned daemon to connect back
+CONNECT_TIMEOUT = 60
+
+
+def encode_message(message):
+    return json.dumps(message).encode("utf-8")
+
+
+def decode_message(data):
+    return json.loads(data.decode("utf-8"))
+
+
+class JobOutput:
+    """
+    File-like object installed as sys.stdout/sys.stderr while a job runs.
+    Splits the text on \\r and \\n (tqdm uses \\r) and forwards every line
+    to the client as a "log" event.
+    """
+    def __init__(self, daemon, job_id):
+        self.daemon = daemon
+        self.job_id = job_id
+        self.buffer = ""
+        # Encoder threads print for the job too
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            self._write(text)
+        return len(text)
+
+    def _write(self, text):
+        self.buffer += text
+        while True:
+            cut = min((i for i in (self.buffer.find("\n"), self.buffer.find("\r")) if i >= 0), default=-1)
+            if cut < 0:
+                break
+            line = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut + 1:]
+            if line:
+                self.daemon.send({"event": "log", "id": self.job_id, "line": line})
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            line = self.buffer.strip()
+            self.buffer = ""
+        if line:
+            self.daemon.send({"event": "log", "id": self.job_id, "line": line})
+
+
+class OutputRouter:
+    """
+    Installed once as sys.stdout/sys.stderr (and our logger's stream).
+    Two jobs can overlap (one encoding, the next separating), so text goes
+    to the JobOutput of the job running on the writing thread; threads a
+    job started itself (encoder pool, MDX) fall back to the newest job.
+    """
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+        self.current = None
+
+    def write(self, text):
+        output = getattr(self.local, "output", None) or self.current
+        if output is None:
+            return self.fallback.write(text)
+        return output.write(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+
+class WorkerDaemon:
+    """
+    Long-lived worker process. Heavy modules (torch, demucs, audio-separator)
+    are imported once and models stay resident between jobs, so every job
+    after the first only pays for the actual separation.
+
+    Each job runs on its own thread, which waits until the job before it
+    reports "separated" (all model work done): the next job's separation
+    overlaps this one's encoding, and messages (cancel, stats) are read
+    while jobs run.
+
+    Protocol (JSON messages over a multiprocessing connection):
+      client -> daemon: {"cmd": "job", "id": n, "config": {...}}
+                        {"cmd": "cancel", "id": n}
+                        {"cmd": "ping"}
+                        {"cmd": "stats"}
+                        {"cmd": "shutdown"}
+      daemon -> client: {"event": "log", "id": n, "line": "..."}
+                        {"event": "progress", "id": n, "stage": "...", "fraction": f, ...}
+                        {"event": "separated", "id": n}
+                        {"event": "done", "id": n}
+                        {"event": "error", "id": n, "message": "..."}
+                        {"event": "pong"}
+                        {"event": "stats", "model_cache": {...}}
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.threads = []
+        # Set once the newest job is done with the models
+        self.separated = threading.Event()
+        self.separated.set()
+        # Job id -> its cancel event, while it runs
+        self.cancels = {}
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send_bytes(encode_message(message))
+
+    def serve_forever(self):
+        # Pay the import cost once, up front
+        from src.core.splitter import separate_audio
+        self.separate_audio = separate_audio
+
+        # Keep concurrent daemons from oversubscribing the CPU
+        threads = os.environ.get(THREADS_ENV)
+        if threads:
+            import torch
+            torch.set_num_threads(int(threads))
+
+        # Our logger's handlers hold a reference to the original stdout,
+        # point them at the router too
+        self.router = OutputRouter(sys.__stderr__)
+        sys.stdout = self.router
+        sys.stderr = self.router
+        for handler in logger.handlers:
+            if isinstance(handler, logging.StreamHandler):
+                handler.setStream(self.router)
+
+        try:
+            self.receive()
+        finally:
+            for thread in self.threads:
+                thread.join()
+
+    def receive(self):
+        while True:
+            try:
+                message = decode_message(self.conn.recv_bytes())
+            except EOFError:
+                break
+
+            cmd = message.get("cmd")
+            if cmd == "shutdown":
+                break
+            elif cmd == "ping":
+                self.send({"event": "pong"})
+            elif cmd == "stats":
+                from src.core.model_cache import model_cache
+                self.send({"event": "stats", "model_cache": model_cache.stats()})
+            elif cmd == "job":
+                separated = threading.Event()
+                cancel = self.cancels[message["id"]] = threading.Event()
+                thread = threading.Thread(target=self.run_job,
+                                          args=(message["id"], message["config"], self.separated, separated, cancel))
+                self.separated = separated
+                thread.start()
+                self.threads = [t for t in self.threads if t.is_alive()] + [thread]
+            elif cmd == "cancel":
+                # Stops at the job's next progress update (see ProgressTracker)
+                cancel = self.cancels.get(message["id"])
+                if cancel:
+                    cancel.set()
+            else:
+                logger.warning(f"Daemon received unknown command: {cmd}")
+
+    def run_job(self, job_id, config, previous, separated, cancel):
+        # One separation at a time: start once the job before us is separated
+        previous.wait()
+        output = JobOutput(self, job_id)
+        self.router.local.output = output
+        self.router.current = output
+
+        def on_separated():
+            self.send({"event": "separated", "id": job_id})
+            separated.set()
+
+        def on_progress(event):
+            self.send(dict(event, event="progress", id=job_id))
+
+        try:
+            if cancel.is_set():
+                raise JobCancelled()
+            run_config(self.separate_audio, self.with_slot_budget(config), on_separated, on_progress, cancel)
+        except Exception as e:
+            output.close()
+            if not isinstance(e, JobCancelled):
+                traceback.print_exc(file=self.router.fallback)
+            self.send({"event": "error", "id": job_id, "message": str(e)})
+            return
+        finally:
+            self.cancels.pop(job_id, None)
+            separated.set()
+            self.router.local.output = None
+            if self.router.current is output:
+                self.router.current = None
+        output.close()
+        self.send({"event": "done", "id": job_id})
+
+
+    def with_slot_budget(self, config):
+        """
+        config with max_memory_mb capped at this slot's share of the free
+        memory, so concurrent slots don't each plan with most of it.
+        """
+        share = int(os.environ.get(MEMORY_SHARE_ENV) or 1)
+        if share <= 1:
+            return config
+        from src.core.engine import default_device
+        from src.core.tuning import slot_budget_mb
+        budget = slot_budget_mb(default_device(), share)
+        if budget is None:
+            return config
+        if config.get("max_memory_mb"):
+            budget = min(budget, config["max_memory_mb"])
+        return dict(config, max_memory_mb=int(budget))
+
+
+def run_config(separate_audio, config, on_separated=None, on_progress=None, cancel=None):
+    """
+    Calls separate_audio with a worker config dict (same layout as the
+    JSON passed to main.py --worker). on_separated() is called once the
+    models are done and only encoding is left, on_progress(event) with
+    progress events (see progress.ProgressTracker). Setting the `cancel`
+    event stops the job with JobCancelled.
+    """
+    separate_audio(
+        config['input_file'],
+        config['output_dir'],
+        config['stem_count'],
+        config['quality'],
+        config['export_zip'],
+        config['keep_original'],
+        export_mp3=config.get('export_mp3', False),
+        export_format=config.get('export_format'),
+        mode=config.get('mode', 'standard'),
+        dereverb=config.get('dereverb', False),
+        invert=config.get('invert', False),
+        streaming=config.get('streaming'),
+        max_memory_mb=config.get('max_memory_mb'),
+        skip_silence=config.get('skip_silence', True),
+        cache=config.get('cache', True),
+        trace=config.get('trace', True),
+        parallel_mdx=config.get('parallel_mdx', True),
+        ensemble_mode=config.get('ensemble_mode', 'average'),
+        on_separated=on_separated,
+        on_progress=on_progress,
+        cancel=cancel
+    )
+
+
+def run_daemon():
+    """
+    Entry point for main.py --daemon. Connects back to the client that
+    spawned us and serves jobs until told to shut down.
+    """
+    host, port = os.environ[ADDRESS_ENV].rsplit(":", 1)
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+    conn = Client((host, int(port)), authkey=authkey)
+    try:
+        WorkerDaemon(conn).serve_forever()
+    finally:
+        conn.close()
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient:
+    """
+    Owns one worker daemon process. The process is started lazily on the
+    first job and restarted if it died (e.g. after a cancel).
+
+    threads limits torch's intra-op threads in the daemon, gpu pins it to
+    one CUDA device (via CUDA_VISIBLE_DEVICES), cpu_only hides every GPU.
+    memory_share is how many slots share the device's memory; each job
+    then tunes itself to that part of the free memory.
+
+    A reader thread hands incoming messages to the job they belong to, so
+    a second job can be sent while the first is still encoding.
+    """
+    def __init__(self, threads=None, gpu=None, cpu_only=False, memory_share=1):
+        self.threads = threads
+        self.memory_share = memory_share
+        self.gpu = gpu
+        self.cpu_only = cpu_only
+        self.process = None
+        self.conn = None
+        self.next_id = 0
+        self.lock = threading.Lock()
+        # Per connection: job id -> queue of its messages
+        self.jobs = {}
+        self.replies = queue.Queue()
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if self.is_alive():
+            return
+
+        authkey = secrets.token_bytes(16)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        host, port = listener.address
+
+        cmd = [sys.executable, "-u", MAIN_SCRIPT, "--daemon"]
+        if getattr(sys, 'frozen', False):
+            cmd = [sys.executable, "--daemon"]
+
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        env = os.environ.copy()
+        env["PYTHONUNBUFFERED"] = "1"
+        env[ADDRESS_ENV] = f"{host}:{port}"
+        env[AUTHKEY_ENV] = authkey.hex()
+        if self.threads:
+            env[THREADS_ENV] = str(self.threads)
+            env["OMP_NUM_THREADS"] = str(self.threads)
+            env["MKL_NUM_THREADS"] = str(self.threads)
+        if self.memory_share > 1:
+            env[MEMORY_SHARE_ENV] = str(self.memory_share)
+        if self.cpu_only:
+            env["CUDA_VISIBLE_DEVICES"] = ""
+        elif self.gpu is not None:
+            env["CUDA_VISIBLE_DEVICES"] = str(self.gpu)
+
+        logger.info("Starting worker daemon...")
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            startupinfo=startupinfo,
+            env=env
+        )
+        threading.Thread(target=self._pump_output, args=(self.process,), daemon=True).start()
+
+        # Listener.accept() has no timeout, so wait for it on a helper thread
+        accepted = {}
+        def accept():
+            try:
+                accepted["conn"] = listener.accept()
+            except Exception as e:
+                accepted["error"] = e
+        thread = threading.Thread(target=accept, daemon=True)
+        thread.start()
+        thread.join(CONNECT_TIMEOUT)
+        listener.close()
+
+        if "conn" not in accepted:
+            self.kill()
+            raise DaemonError("Worker daemon did not start")
+        self.conn = accepted["conn"]
+        self.jobs = {}
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read_messages, args=(self.conn, self.jobs, self.replies), daemon=True).start()
+
+    def _read_messages(self, conn, jobs, replies):
+        try:
+            while True:
+                message = decode_message(conn.recv_bytes())
+                job = jobs.get(message.get("id"))
+                if job:
+                    job.put(message)
+                elif "id" not in message:
+                    replies.put(message)
+        except (EOFError, OSError):
+            pass
+        # Wake up everyone still waiting on this connection
+        for job in list(jobs.values()):
+            job.put(None)
+        replies.put(None)
+
+    def warm_up(self):
+        """
+        Starts the daemon ahead of the first job, so its heavy imports
+        happen in the background rather than when the user hits Start.
+        """
+        with self.lock:
+            self.start()
+
+    def _pump_output(self, process):
+        # Anything the daemon prints outside of a job (startup, crashes)
+        for line in iter(process.stdout.readline, b""):
+            line = line.decode("utf-8", errors="replace").strip()
+            if line:
+                logger.info(f"[Daemon] {line}")
+
+    def run_job(self, config, on_line=None, on_separated=None, on_progress=None, on_started=None):
+        """
+        Runs one job on the daemon and blocks until it is done.
+        on_line(line) is called for every line of worker output,
+        on_progress(event) for progress events and on_separated() once the
+        daemon is ready for another job. on_started(job_id) gets the id to
+        cancel() the job with.
+        """
+        with self.lock:
+            self.start()
+            self.next_id += 1
+            job_id = self.next_id
+            messages = queue.Queue()
+            jobs = self.jobs
+            jobs[job_id] = messages
+            try:
+                self.conn.send_bytes(encode_message({"cmd": "job", "id": job_id, "config": config}))
+            except OSError:
+                messages.put(None)
+        if on_started:
+            on_started(job_id)
+        try:
+            while True:
+                message = messages.get()
+                if message is None:
+                    self.kill()
+                    raise DaemonError(f"Worker daemon exited with code {self.process.poll()}")
+                event = message.get("event")
+                if event == "log":
+                    if on_line:
+                        on_line(message["line"])
+                elif event == "progress":
+                    if on_progress:
+                        on_progress(message)
+                elif event == "separated":
+                    if on_separated:
+                        on_separated()
+                elif event == "done":
+                    return
+                elif event == "error":
+                    raise DaemonError(message["message"])
+        finally:
+            jobs.pop(job_id, None)
+
+    def stats(self):
+        """
+        Model cache counters (hits/misses/evictions) of the running daemon,
+        or None if it isn't running.
+        """
+        with self.lock:
+            if not self.is_alive() or self.conn is None:
+                return None
+            self.conn.send_bytes(encode_message({"cmd": "stats"}))
+            while True:
+                message = self.replies.get()
+                if message is None:
+                    return None
+                if message.get("event") == "stats":
+                    return message["model_cache"]
+
+    def cancel(self, job_id):
+        """
+        Cancels one job. A daemon running nothing else is killed, the
+        quickest way to stop; otherwise only this job is told to stop, at
+        its next progress update, so the job sharing the daemon carries on.
+        run_job() returns (with DaemonError) right away either way.
+        """
+        with self.lock:
+            messages = self.jobs.get(job_id)
+            if messages is None:
+                return
+            if len(self.jobs) == 1:
+                self.kill()
+                return
+            try:
+                self.conn.send_bytes(encode_message({"cmd": "cancel", "id": job_id}))
+            except OSError:
+                pass
+            messages.put({"event": "error", "message": "Cancelled"})
+
+    def kill(self):
+        """
+        Hard stop, used to cancel the only running job. Resident models are
+        lost; the next job starts a fresh daemon.
+        """
+        if self.process:
+            try:
+                self.process.kill()
+                self.process.wait()
+            except Exception:
+                pass
+        if self.conn:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+    def stop(self):
+        if self.is_alive() and self.conn:
+            try:
+                self.conn.send_bytes(encode_message({"cmd": "shutdown"}))
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+        self.kill()
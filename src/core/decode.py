@@ -0,0 +1,268 @@
+import os
+import json
+import shutil
+import secrets
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+import numpy as np
+import soundfile as sf
+
+from src.utils.logger import logger
+from src.core.result_cache import content_hash
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# One decode per input. Any supported input (what soundfile reads natively,
+# anything else through an ffmpeg pipe) is decoded once into a 32-bit float
+# WAV in the decode cache; every later stage (Demucs, the MDX models,
+# inversion, streaming) reads that file, and Demucs memory-maps it (see
+# audio_io.load_audio). Entries are named by content hash, so a track split
+# again with other options skips the decode too.
+
+MB = 1024 * 1024
+
+DEFAULT_DECODE_DIR = os.environ.get("STEMLAB_DECODE_DIR",
+                                    os.path.join(os.path.expanduser("~"), ".stemlab", "decoded"))
+DEFAULT_DECODE_BUDGET_MB = int(os.environ.get("STEMLAB_DECODE_MB", 4096))
+
+# Frames per block when decoding
+BLOCK = 65536
+
+# Plain WAV sizes are 32-bit; bigger decodes are written as RF64
+WAV_LIMIT = 4 * 1024 * MB - MB
+
+# What ffmpeg decodes to when ffprobe isn't around to tell us the layout
+FALLBACK_RATE = 44100
+FALLBACK_CHANNELS = 2
+
+
+def native_info(path):
+    """
+    soundfile's info for `path`, or None if libsndfile can't read it.
+    """
+    try:
+        return sf.info(path)
+    except RuntimeError:
+        return None
+
+
+def is_mappable(info):
+    return info is not None and info.format == "WAV" and info.subtype == "FLOAT" and info.endian in ("FILE", "LITTLE")
+
+
+def ffprobe(path):
+    """
+    (samplerate, channels, duration or None) of the first audio stream, or
+    None without ffprobe.
+    """
+    exe = shutil.which("ffprobe")
+    if exe is None:
+        return None
+    cmd = [exe, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate,channels:format=duration",
+           "-of", "json", path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    probe = json.loads(result.stdout)
+    if not probe.get("streams"):
+        raise RuntimeError(f"{path} has no audio stream")
+    stream = probe["streams"][0]
+    duration = probe.get("format", {}).get("duration")
+    return int(stream["sample_rate"]), int(stream["channels"]), float(duration) if duration else None
+
+
+def open_output(path, samplerate, channels, frames=None):
+    wav_format = "RF64" if frames and frames * channels * 4 > WAV_LIMIT else "WAV"
+    return sf.SoundFile(path, "w", samplerate, channels, format=wav_format, subtype="FLOAT")
+
+
+def decode_native(path, target, info):
+    with sf.SoundFile(path) as f, open_output(target, info.samplerate, info.channels, info.frames) as out:
+        for block in f.blocks(blocksize=BLOCK, dtype="float32", always_2d=True):
+            out.write(block)
+
+
+def decode_ffmpeg(path, target):
+    """
+    Pipes raw float32 PCM out of ffmpeg into `target`, a block at a time.
+    """
+    exe = shutil.which("ffmpeg")
+    if exe is None:
+        raise RuntimeError(f"Can't decode {os.path.basename(path)}: soundfile can't read it and ffmpeg isn't installed")
+    layout = ffprobe(path)
+    samplerate, channels, duration = layout or (FALLBACK_RATE, FALLBACK_CHANNELS, None)
+    cmd = [exe, "-v", "error", "-nostdin", "-i", path, "-map", "0:a:0", "-f", "f32le", "-acodec", "pcm_f32le",
+           "-ar", str(samplerate), "-ac", str(channels), "-"]
+    frame_bytes = 4 * channels
+    frames = int(duration * samplerate) if duration else None
+    # stderr to a file: a pipe we don't read could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            with open_output(target, samplerate, channels, frames) as out:
+                leftover = b""
+                while True:
+                    chunk = process.stdout.read(BLOCK * frame_bytes)
+                    if not chunk:
+                        break
+                    data = leftover + chunk
+                    usable = len(data) - len(data) % frame_bytes
+                    out.write(np.frombuffer(data[:usable], dtype="<f4").reshape(-1, channels))
+                    leftover = data[usable:]
+        finally:
+            process.stdout.close()
+            code = process.wait()
+        if code != 0:
+            errors.seek(0)
+            message = errors.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"ffmpeg failed on {os.path.basename(path)}: {message}")
+
+
+class DecodeCache:
+    """
+    Decoded float32 copies of inputs, keyed by content hash. Files are
+    written under a temporary name and renamed into place, so concurrent
+    workers never read a half-written decode; the least recently used are
+    removed once the folder grows past its budget.
+
+    A job holds a lease (see lease()) on its decode while it runs. Leases
+    are files next to the decode named after the owning process, so the
+    daemons of other slots see them too, and trim() never removes a
+    leased decode. Leases of processes that died (a cancelled job's
+    daemon is killed) are ignored and cleaned up.
+    """
+    def __init__(self, root=DEFAULT_DECODE_DIR, budget_mb=DEFAULT_DECODE_BUDGET_MB):
+        self.root = root
+        self.budget = int(budget_mb * MB)
+
+    def get(self, path, audio_hash=None):
+        """
+        A float32 WAV with the audio of `path`. Inputs that already are
+        one are used as they are.
+        """
+        info = native_info(path)
+        if is_mappable(info):
+            return path
+        target = os.path.join(self.root, f"{audio_hash or content_hash(path)}.wav")
+        if os.path.exists(target):
+            os.utime(target)
+            return target
+
+        os.makedirs(self.root, exist_ok=True)
+        partial = f"{target}.{secrets.token_hex(4)}.part"
+        logger.info(f"Decoding {os.path.basename(path)}" + ("" if info else " with ffmpeg"))
+        try:
+            if info:
+                decode_native(path, partial, info)
+            else:
+                decode_ffmpeg(path, partial)
+            os.replace(partial, target)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        self.trim(keep=target)
+        return target
+
+    @contextmanager
+    def lease(self, path, audio_hash=None):
+        """
+        get(), with the decode protected from trim() (here and in other
+        processes) until the block ends.
+        """
+        if is_mappable(native_info(path)):
+            yield path
+            return
+        audio_hash = audio_hash or content_hash(path)
+        os.makedirs(self.root, exist_ok=True)
+        token = os.path.join(self.root, f"{audio_hash}.{os.getpid()}-{secrets.token_hex(4)}.lease")
+        open(token, "w").close()
+        try:
+            yield self.get(path, audio_hash)
+        finally:
+            try:
+                os.remove(token)
+            except OSError:
+                pass
+
+    def leased(self):
+        """
+        Paths of the decodes some live process holds a lease on.
+        """
+        if not os.path.isdir(self.root):
+            return set()
+        leased = set()
+        for name in os.listdir(self.root):
+            if not name.endswith(".lease"):
+                continue
+            audio_hash, owner = name[:-len(".lease")].split(".", 1)
+            if pid_alive(int(owner.split("-")[0])):
+                leased.add(os.path.join(self.root, f"{audio_hash}.wav"))
+                continue
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+        return leased
+
+    def files(self):
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".wav"):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return sorted(found)
+
+    def trim(self, budget=None, keep=None):
+        """
+        Removes least recently used decodes until the folder fits `budget`
+        bytes (default: the configured budget), leaving `keep` and every
+        leased decode alone. Returns how many went.
+        """
+        budget = self.budget if budget is None else budget
+        leased = self.leased()
+        files = self.files()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= budget:
+                break
+            if path == keep or path in leased:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Still open somewhere (Windows); try again next time
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def pid_alive(pid):
+    if psutil:
+        return psutil.pid_exists(pid)
+    if os.name == "nt":
+        # os.kill would terminate the process there; assume it still runs
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+decode_cache = DecodeCache()
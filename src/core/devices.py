@@ -0,0 +1,142 @@
+import os
+import threading
+
+MB = 1024 * 1024
+
+# Torch intra-op threads per CPU job; Demucs stops scaling well beyond ~4
+DEFAULT_CPU_THREADS_PER_JOB = int(os.environ.get("STEMLAB_THREADS_PER_JOB", 4))
+
+# Concurrent jobs per GPU, as far as its memory allows (see GPU_JOB_MB)
+DEFAULT_JOBS_PER_GPU = int(os.environ.get("STEMLAB_JOBS_PER_GPU", 1))
+
+# Rough VRAM one Demucs job needs, used to decide whether another job fits
+GPU_JOB_MB = int(os.environ.get("STEMLAB_GPU_JOB_MB", 3000))
+
+# CPU jobs next to GPU jobs; by default the CPU only feeds the GPUs
+CPU_JOBS_ENV = "STEMLAB_CPU_JOBS"
+
+
+class Device:
+    """
+    One compute device and its job accounting. kind is "cuda" or "cpu";
+    total_mb of None means unknown (no memory check).
+    """
+    def __init__(self, kind, index=None, name=None, total_mb=None, slots=1, threads=1, job_mb=0):
+        self.kind = kind
+        self.index = index
+        self.name = name or self.id
+        self.total_mb = total_mb
+        self.slots = slots
+        self.threads = threads
+        self.job_mb = job_mb
+        self.running = 0
+        self.reserved_mb = 0
+
+    @property
+    def id(self):
+        return f"{self.kind}:{self.index}" if self.kind == "cuda" else "cpu"
+
+    @property
+    def free_mb(self):
+        return None if self.total_mb is None else self.total_mb - self.reserved_mb
+
+    @property
+    def load(self):
+        return self.running / self.slots if self.slots else 1.0
+
+    def fits(self):
+        """
+        Whether one more job fits. An idle device always takes a job, even
+        if its memory looks too small; the job falls back to the CPU on OOM.
+        """
+        if self.running >= self.slots:
+            return False
+        if self.running == 0 or self.free_mb is None:
+            return True
+        return self.free_mb >= self.job_mb
+
+    def __repr__(self):
+        return f"Device({self.id}, {self.running}/{self.slots} jobs)"
+
+
+def cuda_inventory():
+    """
+    [{"name", "total_mb"}] for every visible CUDA device. Reads device
+    properties only, which doesn't create a CUDA context on each GPU.
+    """
+    try:
+        import torch
+    except ImportError:
+        return []
+    if not torch.cuda.is_available():
+        return []
+    inventory = []
+    for index in range(torch.cuda.device_count()):
+        props = torch.cuda.get_device_properties(index)
+        inventory.append({"name": props.name, "total_mb": props.total_memory // MB})
+    return inventory
+
+
+def detect_devices(inventory=None, cores=None, threads_per_job=None, jobs_per_gpu=None, cpu_jobs=None):
+    """
+    Devices jobs can run on. inventory lists the GPUs as
+    [{"name": ..., "total_mb": ...}] and defaults to the real ones; pass a
+    made-up list to simulate a machine.
+
+    With GPUs: jobs_per_gpu slots per GPU, CPU threads split between them,
+    and cpu_jobs CPU slots (STEMLAB_CPU_JOBS, default none).
+    CPU only: cores // threads_per_job slots (at least one).
+    """
+    inventory = cuda_inventory() if inventory is None else inventory
+    cores = cores or os.cpu_count() or 1
+    jobs_per_gpu = jobs_per_gpu or DEFAULT_JOBS_PER_GPU
+    cpu_threads = max(1, min(threads_per_job or DEFAULT_CPU_THREADS_PER_JOB, cores))
+    if cpu_jobs is None and os.environ.get(CPU_JOBS_ENV):
+        cpu_jobs = int(os.environ[CPU_JOBS_ENV])
+
+    devices = []
+    for index, gpu in enumerate(inventory):
+        devices.append(Device("cuda", index, gpu.get("name"), gpu.get("total_mb"), slots=jobs_per_gpu,
+                              threads=max(1, cores // (len(inventory) * jobs_per_gpu)), job_mb=GPU_JOB_MB))
+
+    if cpu_jobs is None:
+        cpu_jobs = 0 if devices else max(1, cores // cpu_threads)
+    if cpu_jobs:
+        devices.append(Device("cpu", name="CPU", slots=cpu_jobs, threads=cpu_threads))
+    return devices
+
+
+class DeviceManager:
+    """
+    Tracks running jobs and reserved memory per device and picks where the
+    next job goes: the least loaded device it fits on, GPUs before the CPU
+    on a tie, then the one with the most free memory.
+    """
+    def __init__(self, devices):
+        self.devices = list(devices)
+        self.lock = threading.Lock()
+
+    def pick(self, candidates=None):
+        """
+        Best device among `candidates` (default: all) for one more job, or
+        None if none can take it.
+        """
+        candidates = self.devices if candidates is None else candidates
+        with self.lock:
+            fitting = [device for device in candidates if device.fits()]
+            if not fitting:
+                return None
+            return min(fitting, key=lambda d: (d.load, d.kind == "cpu", -(d.free_mb or 0)))
+
+    def start(self, device):
+        with self.lock:
+            device.running += 1
+            device.reserved_mb += device.job_mb
+
+    def finish(self, device):
+        with self.lock:
+            device.running = max(0, device.running - 1)
+            device.reserved_mb = max(0, device.reserved_mb - device.job_mb)
+
+    def describe(self):
+        return ", ".join(f"{d.name} ({d.slots} job{'s' if d.slots > 1 else ''})" for d in self.devices)
@@ -0,0 +1,171 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import soundfile as sf
+
+from src.utils.logger import logger
+
+# Output encoding straight from in-memory audio through libsndfile: no
+# intermediate WAV files and no ffmpeg subprocesses. libsndfile releases the
+# GIL while encoding, so a thread pool encodes several stems at once.
+
+# Extension -> SoundFile options. MP3 at compression level 0 is 320k CBR.
+FORMATS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16"},
+    "mp3": {"format": "MP3", "compression_level": 0.0, "bitrate_mode": "CONSTANT"},
+    "flac": {"format": "FLAC", "subtype": "PCM_24"},
+    "opus": {"format": "OGG", "subtype": "OPUS"},
+}
+
+# libopus only runs at these rates; anything else is resampled to 48 kHz
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Frames per write
+WRITE_BLOCK = 65536
+
+DEFAULT_WORKERS = int(os.environ.get("STEMLAB_ENCODE_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def extension(path):
+    return os.path.splitext(path)[1].lower().lstrip(".")
+
+
+def format_for(export_format=None, export_mp3=False):
+    """
+    Output extension for a job's options; export_mp3 is the older flag.
+    """
+    if export_format:
+        if export_format not in FORMATS:
+            raise ValueError(f"Unknown export format {export_format}, expected one of {', '.join(FORMATS)}")
+        return export_format
+    return "mp3" if export_mp3 else "wav"
+
+
+class AudioWriter:
+    """
+    Incremental writer for (time, channels) float blocks; the extension
+    picks the format (see FORMATS). Opus output at an unsupported rate is
+    resampled to 48 kHz on the fly.
+    """
+    def __init__(self, path, samplerate, channels):
+        options = dict(FORMATS.get(extension(path), FORMATS["wav"]))
+        self.resampler = None
+        if options["format"] == "OGG" and samplerate not in OPUS_RATES:
+            from src.core.inversion import PolyphaseResampler
+            self.resampler = PolyphaseResampler(samplerate, 48000, channels)
+            samplerate = 48000
+        self.file = sf.SoundFile(path, "w", samplerate, channels, **options)
+
+    def write(self, block):
+        if self.resampler:
+            block = self.resampler.process(block)
+        self.file.write(block)
+
+    def close(self):
+        if self.resampler:
+            self.file.write(self.resampler.process(np.zeros((0, self.file.channels), dtype=np.float32), final=True))
+            self.resampler = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(path, samplerate, channels):
+    return AudioWriter(path, samplerate, channels)
+
+
+def clip_scale(peak):
+    """
+    What prevent_clip divides a stem peaking at `peak` by (1.0: untouched).
+    """
+    return max(1.01 * peak, 1.0)
+
+
+def prevent_clip(data):
+    """
+    Same rule as Demucs' default (clip="rescale"): scale the whole stem down
+    if it peaks above full scale.
+    """
+    scale = clip_scale(float(np.abs(data).max()) if data.size else 0.0)
+    return data / scale if scale > 1 else data
+
+
+def encode_audio(source, path, samplerate):
+    """
+    Writes one stem from memory. source is a (channels, time) tensor or
+    array. Interleaving happens a block at a time.
+    """
+    if hasattr(source, "detach"):
+        source = source.detach().cpu().numpy()
+    data = prevent_clip(np.asarray(source, dtype=np.float32))
+    if data.ndim == 1:
+        data = data[None]
+    channels, length = data.shape
+    with open_writer(path, samplerate, channels) as writer:
+        for start in range(0, length, WRITE_BLOCK):
+            writer.write(np.ascontiguousarray(data[:, start:start + WRITE_BLOCK].T))
+    return path
+
+
+def transcode(source_path, path, remove_source=False):
+    """
+    Re-encodes a file block by block (e.g. a WAV stage output to MP3).
+    """
+    with sf.SoundFile(source_path) as f, open_writer(path, f.samplerate, f.channels) as writer:
+        for block in f.blocks(blocksize=WRITE_BLOCK, dtype="float32", always_2d=True):
+            writer.write(block)
+    if remove_source:
+        os.remove(source_path)
+    return path
+
+
+class EncoderPool:
+    """
+    Thread pool for output encoding. Jobs submit their stems and keep going
+    (or start the next separation); wait_all() blocks until a batch of
+    futures is written.
+    """
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="encode")
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def encode(self, source, path, samplerate):
+        return self.submit(encode_audio, source, path, samplerate)
+
+    @staticmethod
+    def wait_all(futures, progress=None):
+        """
+        Waits for every future and re-raises the first error. progress
+        (a ProgressTracker) is advanced as encodes finish.
+        """
+        for done, _ in enumerate(as_completed(futures), 1):
+            if progress:
+                progress.update(done / len(futures))
+        for future in futures:
+            error = future.exception()
+            if error:
+                logger.error(f"Encoding failed: {error}")
+                raise error
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
+# Sized by STEMLAB_ENCODE_WORKERS (see DEFAULT_WORKERS)
+encoder_pool = EncoderPool()
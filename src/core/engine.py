@@ -0,0 +1,196 @@
+import inspect
+
+import torch
+import demucs.pretrained
+from demucs.apply import apply_model
+from demucs.audio import AudioFile, convert_audio
+
+from src.utils.logger import logger
+from src.core.model_cache import model_cache
+from src.core.audio_io import load_audio
+from src.core.progress import demucs_callback
+from src.core.tuning import model_segment, pads_segments
+from src.core.silence import active_regions, skipped_samples
+
+# Demucs 4.1 reports per-segment progress through a callback
+APPLY_CALLBACK = "callback" in inspect.signature(apply_model).parameters
+
+# Segment length (seconds) after running out of memory; htdemucs trains on 7.8s
+FALLBACK_SEGMENT = 4.0
+
+
+def default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_demucs_model(name, device):
+    """
+    Returns the Demucs model `name` on `device`, loading it only on the
+    first call (see model_cache).
+    """
+    def loader():
+        model = demucs.pretrained.get_model(name)
+        model.to(device)
+        model.eval()
+        return model
+    return model_cache.get(name, device, loader)
+
+
+def is_out_of_memory(error):
+    oom = getattr(torch.cuda, "OutOfMemoryError", None)
+    if oom and isinstance(error, oom):
+        return True
+    # CPU allocations and older torch versions raise a plain RuntimeError
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
+
+
+class DemucsEngine:
+    """
+    Runs Demucs directly on in-memory tensors. Stems come back as
+    (channels, time) tensors keyed by source name; nothing touches the disk
+    (the outputs we keep are written by the caller, see encoder.py).
+
+    Running out of memory doesn't fail the job: a GPU run is retried on
+    the CPU with shorter segments (and a CPU run with shorter segments,
+    one at a time), and the engine stays there for the rest of the job.
+
+    With skip_silence, long silent stretches of the input are left out of
+    the model pass (see silence.py); frames/skipped count the samples seen
+    and left out over the engine's lifetime.
+    """
+    def __init__(self, model_name, device=None, shifts=1, overlap=0.25, segment=None, progress=True, workers=1,
+                 skip_silence=True):
+        self.model_name = model_name
+        self.device = device or default_device()
+        self.shifts = shifts
+        self.overlap = overlap
+        self.segment = segment
+        self.progress = progress
+        # Segments separated in parallel (CPU only, see tuning.plan_settings)
+        self.workers = workers
+        self.skip_silence = skip_silence
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def model(self):
+        return load_demucs_model(self.model_name, self.device)
+
+    @property
+    def samplerate(self):
+        return self.model.samplerate
+
+    @property
+    def sources(self):
+        return list(self.model.sources)
+
+    def load_track(self, path):
+        """
+        Reads `path` and converts it to the model's sample rate and channel
+        count. soundfile handles wav/flac/mp3; anything else goes via ffmpeg.
+        """
+        model = self.model
+        try:
+            wav, sr = load_audio(path)
+        except RuntimeError: # soundfile.LibsndfileError
+            logger.info(f"soundfile can't read {path}, decoding with ffmpeg")
+            return AudioFile(path).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+        return convert_audio(wav, sr, model.samplerate, model.audio_channels)
+
+    def separate(self, wav, mean=None, std=None, progress=None):
+        """
+        Separates a (channels, time) tensor at the model sample rate.
+        Returns {source name: (channels, time) tensor}.
+        mean/std normalise the input; they default to the statistics of
+        `wav` itself, pass whole-track values when separating a window.
+        progress is a ProgressTracker for the current stage.
+        """
+        model = self.model
+        # Same normalisation as demucs.separate
+        if mean is None or std is None:
+            ref = wav.mean(0)
+            mean = ref.mean()
+            std = ref.std() + 1e-8
+        length = wav.shape[-1]
+        regions = active_regions(wav, model.samplerate) if self.skip_silence else [(0, length)]
+        self.frames += length
+        self.skipped += skipped_samples(regions, length)
+        mix = ((wav - mean) / std)[None]
+        if regions == [(0, length)]:
+            out = self.infer(mix, progress)[0] * std + mean
+            return dict(zip(self.model.sources, out))
+
+        # Silence stays silence; the model only sees the regions around it
+        out = torch.zeros((len(model.sources),) + tuple(wav.shape), dtype=wav.dtype, device=wav.device)
+        done = 0
+        for start, end in regions:
+            part = self.infer(mix[..., start:end], progress, done, length)
+            out[..., start:end] = part[0].to(out.device) * std + mean
+            done += end - start
+        return dict(zip(model.sources, out))
+
+    def infer(self, mix, progress=None, done=0, total=None):
+        """
+        apply() with the out-of-memory fallback. done/total place this run
+        within the whole separation for progress.
+        """
+        out = None
+        try:
+            out = self.apply(self.model, mix, progress, done, total)
+        except Exception as e:
+            if not is_out_of_memory(e) or not self.fall_back():
+                raise
+        if out is None:
+            # Retried outside the except block, whose traceback pins the failed run's tensors
+            out = self.apply(self.model, mix, progress, done, total)
+        return out
+
+    def apply(self, model, mix, progress=None, done=0, total=None):
+        extra = {}
+        if progress and APPLY_CALLBACK:
+            extra["callback"] = demucs_callback(progress, mix.shape[-1], self.shifts, done, total)
+        # Parallel segments split the slot's threads between them instead of
+        # each using all of them
+        threads = torch.get_num_threads()
+        if self.workers > 1:
+            torch.set_num_threads(max(1, threads // self.workers))
+        try:
+            with torch.no_grad():
+                return apply_model(
+                    model,
+                    mix,
+                    shifts=self.shifts,
+                    split=True,
+                    overlap=self.overlap,
+                    segment=self.segment,
+                    progress=self.progress,
+                    device=self.device,
+                    num_workers=self.workers if self.workers > 1 else 0,
+                    **extra
+                )
+        finally:
+            torch.set_num_threads(threads)
+
+    def fall_back(self):
+        """
+        Moves to the CPU with FALLBACK_SEGMENT (and one segment at a time)
+        after an out-of-memory error. Returns False if there is nothing
+        left to fall back to.
+        """
+        segment = min(self.segment or FALLBACK_SEGMENT, FALLBACK_SEGMENT)
+        if pads_segments(self.model):
+            # Shorter segments don't save memory here
+            segment = self.segment or model_segment(self.model)
+        if str(self.device).startswith("cpu") and self.segment == segment and self.workers <= 1:
+            return False
+        self.workers = 1
+        logger.warning(f"Out of memory on {self.device}, retrying on CPU with {segment:g}s segments")
+        if str(self.device).startswith("cuda"):
+            key = (self.model_name, str(self.device))
+            if key in model_cache.entries:
+                model_cache.evict(key)
+            torch.cuda.empty_cache()
+        self.device = "cpu"
+        self.segment = segment
+        return True
@@ -0,0 +1,164 @@
+import numpy as np
+import soundfile as sf
+
+# Ensemble blending of several separations of the same stem (UVR style).
+# Inputs are streamed block by block, so memory stays constant no matter how
+# long the track is; in-memory (data, samplerate) tuples work the same way.
+
+# Frames per block; a multiple of every hop size used below
+BLOCK = 1 << 18
+
+# "average" blends the waveforms; the *_spec modes work on STFT bins
+MODES = ("average", "avg_spec", "max_spec", "min_spec")
+N_FFT = 2048
+HOP = N_FFT // 4
+
+
+class BlockReader:
+    """
+    Random access to a file path or a (data, samplerate) tuple, with data
+    shaped (time, channels). Reads outside the signal come back as zeros.
+    """
+    def __init__(self, source):
+        self.file = None
+        if isinstance(source, tuple):
+            data, self.samplerate = source
+            data = np.asarray(data)
+            self.data = data[:, None] if data.ndim == 1 else data
+            self.frames, self.channels = self.data.shape
+        else:
+            self.file = sf.SoundFile(source)
+            self.samplerate = self.file.samplerate
+            self.frames = self.file.frames
+            self.channels = self.file.channels
+
+    def read(self, start, count):
+        out = np.zeros((count, self.channels), dtype=np.float32)
+        begin = max(start, 0)
+        end = min(start + count, self.frames)
+        if end <= begin:
+            return out
+        if self.file is None:
+            out[begin - start:end - start] = self.data[begin:end]
+        else:
+            self.file.seek(begin)
+            self.file.read(end - begin, dtype="float32", always_2d=True, out=out[begin - start:end - start])
+        return out
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def normalized_weights(weights, count):
+    weights = np.ones(count) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(weights) != count:
+        raise ValueError(f"Got {len(weights)} weights for {count} inputs")
+    if weights.sum() <= 0:
+        raise ValueError("Ensemble weights must sum to more than zero")
+    return (weights / weights.sum()).astype(np.float32)
+
+
+def stft_frames(segment, window, hop):
+    """
+    (frames, channels, bins) spectrum of a (time, channels) segment.
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(segment, len(window), axis=0)[::hop]
+    return np.fft.rfft(frames * window, axis=-1)
+
+
+def overlap_add(spectrum, window, hop):
+    """
+    Inverse of stft_frames, (time, channels). The first and last
+    len(window) - hop samples only have partial overlap.
+    """
+    frames = np.fft.irfft(spectrum, n=len(window), axis=-1) * window
+    count, channels, size = frames.shape
+    ratio = size // hop
+    out = np.zeros((count + ratio - 1, channels, hop), dtype=np.float32)
+    for k in range(ratio):
+        out[k:k + count] += frames[..., k * hop:(k + 1) * hop]
+    return out.transpose(0, 2, 1).reshape(-1, channels)
+
+
+def combine_spectra(spectra, mode, weights):
+    """
+    spectra: (inputs, frames, channels, bins). Per bin, max_spec/min_spec
+    keep the input with the largest/smallest magnitude (with its phase),
+    avg_spec takes the weighted mean magnitude with the phase of the mean
+    (unlike a plain waveform average, out-of-phase bins don't cancel).
+    """
+    magnitude = np.abs(spectra)
+    if mode == "avg_spec":
+        mean = np.tensordot(weights, spectra, axes=1)
+        phase = mean / np.maximum(np.abs(mean), 1e-12)
+        return np.tensordot(weights, magnitude, axes=1) * phase
+    pick = magnitude.argmax(axis=0) if mode == "max_spec" else magnitude.argmin(axis=0)
+    return np.take_along_axis(spectra, pick[None], axis=0)[0]
+
+
+def blend_block(readers, start, count, mode, weights, window=None, hop=HOP):
+    """
+    Blended frames [start, start + count) of all readers. For spectral
+    modes the block is analysed with len(window) - hop frames of context on
+    both sides so frames line up on one global grid and blocks join
+    seamlessly.
+    """
+    if mode == "average":
+        blocks = np.stack([reader.read(start, count) for reader in readers])
+        return np.tensordot(weights, blocks, axes=1)
+
+    context = len(window) - hop
+    # The last block of a track may not be a whole number of hops
+    padded = -(-count // hop) * hop
+    spectra = np.stack([
+        stft_frames(reader.read(start - context, padded + 2 * context), window, hop) for reader in readers
+    ])
+    out = overlap_add(combine_spectra(spectra, mode, weights), window, hop)
+    # Squared Hann windows at 75% overlap sum to a constant
+    return out[context:context + count] / np.sum(window ** 2) * hop
+
+
+def blend(sources, output_path=None, weights=None, mode="average", blocksize=BLOCK, subtype=None):
+    """
+    Blends N separations (paths or (data, samplerate) tuples) of the same
+    stem into one. weights bias the averaging modes towards better models.
+    The result is cut to the shortest input and written to output_path
+    block by block, or returned as (data, samplerate) without a path.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown ensemble mode {mode}, expected one of {', '.join(MODES)}")
+    readers = [BlockReader(source) for source in sources]
+    writer = None
+    try:
+        samplerate = readers[0].samplerate
+        channels = readers[0].channels
+        for reader in readers[1:]:
+            if reader.samplerate != samplerate or reader.channels != channels:
+                raise ValueError(f"Can't blend {reader.samplerate} Hz/{reader.channels} ch with "
+                                 f"{samplerate} Hz/{channels} ch audio")
+
+        weights = normalized_weights(weights, len(readers))
+        window = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+        length = min(reader.frames for reader in readers)
+        blocksize = max(HOP, blocksize // HOP * HOP)
+
+        if output_path:
+            writer = sf.SoundFile(output_path, "w", samplerate, channels, subtype=subtype)
+            result = output_path
+        else:
+            result = (np.empty((length, channels), dtype=np.float32), samplerate)
+
+        for start in range(0, length, blocksize):
+            count = min(blocksize, length - start)
+            block = blend_block(readers, start, count, mode, weights, window)
+            if writer:
+                writer.write(block)
+            else:
+                result[0][start:start + count] = block
+        return result
+    finally:
+        if writer:
+            writer.close()
+        for reader in readers:
+            reader.close()
@@ -1,12 +1,15 @@
-import torch
 from src.utils.logger import logger
 
 def get_gpu_info():
     """
     Returns a tuple (is_available, device_name)
+    Imports torch and initializes CUDA (seconds), keep it off the UI thread.
     """
-    if torch.cuda.is_available():
-        device_name = torch.cuda.get_device_name(0)
+    from src.core.devices import cuda_inventory
+    names = [gpu["name"] for gpu in cuda_inventory()]
+    if names:
+        # "2x RTX 3090" or "RTX 3090, RTX 4090"
+        device_name = f"{len(names)}x {names[0]}" if len(names) > 1 and len(set(names)) == 1 else ", ".join(names)
         logger.info(f"GPU Detected: {device_name}")
         return True, device_name
     else:
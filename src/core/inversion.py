@@ -0,0 +1,267 @@
+import math
+
+import numpy as np
+import soundfile as sf
+
+from src.utils.logger import logger
+from src.core.encoder import open_writer
+
+# Streaming phase inversion (instrumental = original - vocals). Both files
+# are read block by block; a stem at another sample rate is resampled on the
+# fly and shifted by the latency measured with a short cross-correlation.
+
+BLOCK = 65536
+
+# Polyphase filter: taps per phase and Kaiser window shape
+TAPS_PER_PHASE = 32
+KAISER_BETA = 8.6
+
+# Cross-correlation window and the largest latency we look for
+ALIGN_SECONDS = 3.0
+MAX_LAG_SECONDS = 0.1
+# Normalised correlation below this means the stem isn't in the original at all
+MIN_CORRELATION = 0.05
+
+
+def polyphase_filter(up, down, taps=TAPS_PER_PHASE, beta=KAISER_BETA):
+    """
+    Kaiser-windowed sinc low-pass for resampling by up/down, split into its
+    `up` phases: returns (phases (up, taps), delay in upsampled samples).
+    """
+    length = taps * up - 1 # odd, so the centre is a whole sample
+    centre = (length - 1) // 2
+    cutoff = 0.5 / max(up, down) * 0.95 # a little below Nyquist for the transition band
+    n = np.arange(length) - centre
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * up
+    h = np.append(h, 0.0)
+    # phases[p, k] = h[p + k * up]
+    return h.reshape(taps, up).T.astype(np.float32), centre
+
+
+class PolyphaseResampler:
+    """
+    Streaming resampler from in_rate to out_rate for (time, channels)
+    blocks. Only the last few input samples are kept between calls, and the
+    filter delay is compensated, so output n lines up with input time
+    n * in_rate / out_rate no matter how the input is split into blocks.
+    """
+    def __init__(self, in_rate, out_rate, channels):
+        g = math.gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        phases, self.delay = polyphase_filter(self.up, self.down)
+        self.taps = phases.shape[1]
+        # Reversed so a window of past samples in time order lines up with it
+        self.phases = phases[:, ::-1].copy()
+        self.history = np.zeros((self.taps - 1, channels), dtype=np.float32)
+        self.consumed = 0
+        self.produced = 0
+
+    def process(self, block, final=False):
+        """
+        Feeds input frames, returns every output frame that can be computed
+        from what has been fed so far. final=True also drains the filter.
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if final:
+            total = -(-(self.consumed + len(block)) * self.up // self.down)
+            pad = (self.delay // self.up) + self.taps
+            block = np.concatenate([block, np.zeros((pad, block.shape[1]), dtype=np.float32)])
+        else:
+            total = None
+
+        start = self.consumed
+        extended = np.concatenate([self.history, block])
+        self.consumed += len(block)
+
+        # Outputs whose newest input sample is already here
+        last = (self.consumed * self.up - self.delay - 1) // self.down
+        if total is not None:
+            last = min(last, total - 1)
+        out_index = np.arange(self.produced, last + 1)
+        self.history = extended[-(self.taps - 1):]
+        if not len(out_index):
+            return np.zeros((0, block.shape[1]), dtype=np.float32)
+
+        t = out_index * self.down + self.delay
+        base = t // self.up
+        windows = np.lib.stride_tricks.sliding_window_view(extended, self.taps, axis=0)
+        # extended[0] is input sample start - (taps - 1), window i ends at sample start + i
+        picked = windows[base - start]
+        out = np.einsum("nck,nk->nc", picked, self.phases[t % self.up])
+        self.produced = last + 1
+        return out
+
+
+class ArrayFile:
+    """
+    What we read of an sf.SoundFile, over a (data, samplerate) tuple with
+    data shaped (time, channels), so in-memory stems can be inverted too.
+    """
+    def __init__(self, source):
+        data, self.samplerate = source
+        data = np.asarray(data, dtype=np.float32)
+        self.data = data[:, None] if data.ndim == 1 else data
+        self.frames, self.channels = self.data.shape
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def seek(self, frame):
+        self.position = frame
+
+    def read(self, frames, dtype="float32", always_2d=True):
+        out = self.data[self.position:self.position + frames]
+        self.position += len(out)
+        return out
+
+    def close(self):
+        pass
+
+
+def open_audio(source):
+    """
+    sf.SoundFile for a path, ArrayFile for a (data, samplerate) tuple.
+    """
+    return ArrayFile(source) if isinstance(source, tuple) else sf.SoundFile(source)
+
+
+def read_mono(path, start, count, samplerate=None):
+    """
+    Mono mix of `count` frames from `start` at the file's rate, resampled to
+    `samplerate` when given (start and count are then at that rate).
+    """
+    with open_audio(path) as f:
+        if samplerate is None or samplerate == f.samplerate:
+            f.seek(min(start, f.frames))
+            return f.read(count, dtype="float32", always_2d=True).mean(axis=1)
+        in_rate = f.samplerate
+        ratio = in_rate / samplerate
+        # Start on a frame that maps to a whole output frame, or we'd be off by a fraction
+        step = in_rate // math.gcd(in_rate, samplerate)
+        begin = max(0, int(start * ratio) - TAPS_PER_PHASE) // step * step
+        f.seek(min(begin, f.frames))
+        data = f.read(int(count * ratio) + 2 * (TAPS_PER_PHASE + step), dtype="float32", always_2d=True)
+    resampled = PolyphaseResampler(in_rate, samplerate, data.shape[1]).process(data, final=True)
+    skip = start - begin * samplerate // in_rate
+    return resampled[skip:skip + count].mean(axis=1)
+
+
+def estimate_offset(original, stem, samplerate, max_lag):
+    """
+    Lag in samples (at `samplerate`, fractional) that best lines the stem
+    up with the original: stem[n + lag] matches original[n]. Found by FFT
+    cross-correlation of a short window from the intro, refined between
+    samples by fitting a parabola through the peak.
+    """
+    window = int(ALIGN_SECONDS * samplerate)
+    info = sf.info(original)
+    start = max(0, min(info.frames // 4, int(30 * samplerate)) - window // 2)
+
+    a = read_mono(original, start, window)
+    b = read_mono(stem, max(0, start - max_lag), window + 2 * max_lag, samplerate)
+    if len(a) < 2 or len(b) < 2 or not np.any(a) or not np.any(b):
+        return 0.0
+
+    size = 1 << int(len(a) + len(b)).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(b, size) * np.conj(np.fft.rfft(a, size)), size)
+    # corr[j] = sum_n a[n] * b[n + j]; b starts max_lag (or `start`) earlier than a
+    shift = start - max(0, start - max_lag)
+    lags = np.arange(shift - max_lag, shift + max_lag + 1)
+    lags = lags[(lags >= 0) & (lags < len(b))]
+    best = lags[np.argmax(corr[lags])]
+    if corr[best] < MIN_CORRELATION * np.sqrt(np.dot(a, a) * np.dot(b, b)):
+        return 0.0
+    fraction = 0.0
+    if 0 < best < len(corr) - 1:
+        left, centre, right = corr[best - 1], corr[best], corr[best + 1]
+        curve = left - 2 * centre + right
+        if curve < 0:
+            fraction = 0.5 * (left - right) / curve
+    return float(best - shift + fraction)
+
+
+class StemStream:
+    """
+    Reads a stem block by block at the original's rate and channel count,
+    shifted by `lag` (in the stem's own samples, applied before resampling
+    so it stays exact); runs on with silence after the stem ends.
+    """
+    def __init__(self, path, samplerate, channels, lag=0, blocksize=BLOCK):
+        self.file = open_audio(path)
+        self.channels = channels
+        self.blocksize = blocksize
+        self.resampler = None
+        if self.file.samplerate != samplerate:
+            logger.info(f"Resampling stem {self.file.samplerate} Hz -> {samplerate} Hz")
+            self.resampler = PolyphaseResampler(self.file.samplerate, samplerate, self.file.channels)
+        self.pending = np.zeros((0, channels), dtype=np.float32)
+        self.lead = max(0, -lag)
+        self.skip = max(0, lag)
+        self.done = False
+
+    def fit_channels(self, data):
+        if data.shape[1] == self.channels:
+            return data
+        if data.shape[1] == 1:
+            return np.repeat(data, self.channels, axis=1)
+        mono = data.mean(axis=1, keepdims=True)
+        return mono if self.channels == 1 else np.repeat(mono, self.channels, axis=1)
+
+    def fill(self):
+        block = self.file.read(self.blocksize, dtype="float32", always_2d=True)
+        final = len(block) < self.blocksize
+        if self.skip:
+            dropped = min(self.skip, len(block))
+            block = block[dropped:]
+            self.skip -= dropped
+        if self.lead:
+            block = np.concatenate([np.zeros((self.lead, block.shape[1]), dtype=np.float32), block])
+            self.lead = 0
+        if self.resampler:
+            block = self.resampler.process(block, final=final)
+        self.done = final
+        self.pending = np.concatenate([self.pending, self.fit_channels(block)])
+
+    def read(self, count):
+        while len(self.pending) < count and not self.done:
+            self.fill()
+        out = self.pending[:count]
+        self.pending = self.pending[count:]
+        if len(out) < count:
+            out = np.concatenate([out, np.zeros((count - len(out), self.channels), dtype=np.float32)])
+        return out
+
+    def close(self):
+        self.file.close()
+
+
+def invert(original_file, stem_file, output_path, blocksize=BLOCK, align=True):
+    """
+    Writes original - stem, block by block, at the original's sample rate
+    and length. stem_file may also be a (data, samplerate) tuple. Returns
+    the latency that was compensated, in stem samples.
+    """
+    with sf.SoundFile(original_file) as original:
+        samplerate = original.samplerate
+        channels = original.channels
+        stem_rate = stem_file[1] if isinstance(stem_file, tuple) else sf.info(stem_file).samplerate
+        lag = 0
+        if align:
+            offset = estimate_offset(original_file, stem_file, samplerate, int(MAX_LAG_SECONDS * samplerate))
+            lag = round(offset * stem_rate / samplerate)
+        if lag:
+            logger.info(f"Aligning stem by {lag} samples ({lag / stem_rate * 1000:.1f} ms)")
+
+        stem = StemStream(stem_file, samplerate, channels, lag, blocksize)
+        try:
+            with open_writer(output_path, samplerate, channels) as out:
+                for block in original.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+                    out.write(block - stem.read(len(block)))
+        finally:
+            stem.close()
+    return lag
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+
+from src.utils.logger import logger
+
+MB = 1024 * 1024
+
+# Budgets can be overridden per machine, e.g. STEMLAB_RAM_BUDGET_MB=2048
+DEFAULT_RAM_BUDGET_MB = int(os.environ.get("STEMLAB_RAM_BUDGET_MB", 4096))
+DEFAULT_VRAM_BUDGET_MB = int(os.environ.get("STEMLAB_VRAM_BUDGET_MB", 3072))
+
+
+def device_kind(device):
+    """
+    "cuda:1" -> "cuda", "cpu" -> "cpu". Budget sizes are set per kind.
+    """
+    return str(device).split(":")[0]
+
+
+def device_id(device):
+    """
+    "cuda" -> "cuda:0", "cuda:1" -> "cuda:1", "cpu" -> "cpu". Budgets are
+    used up per device, so models on two GPUs never evict each other.
+    """
+    device = str(device)
+    return "cuda:0" if device == "cuda" else device
+
+
+def module_size(model):
+    """
+    Bytes held by a torch module's parameters and buffers.
+    """
+    size = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        size += tensor.numel() * tensor.element_size()
+    return size
+
+
+class ModelCache:
+    """
+    In-process registry of loaded models keyed by (model name, device).
+
+    Models are loaded once and kept resident. When adding a model would push
+    a device over its memory budget, the least recently used models on that
+    device are evicted first. Every GPU gets the VRAM budget of its own.
+    """
+    def __init__(self, ram_budget_mb=DEFAULT_RAM_BUDGET_MB, vram_budget_mb=DEFAULT_VRAM_BUDGET_MB):
+        self.budgets = {}
+        self.configure(ram_budget_mb, vram_budget_mb)
+        self.entries = OrderedDict() # (name, device) -> (model, size)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, ram_budget_mb=None, vram_budget_mb=None):
+        if ram_budget_mb is not None:
+            self.budgets["cpu"] = int(ram_budget_mb * MB)
+        if vram_budget_mb is not None:
+            self.budgets["cuda"] = int(vram_budget_mb * MB)
+
+    def get(self, name, device, loader, size_fn=None):
+        """
+        Returns the cached model for (name, device), calling loader() on a
+        miss. size_fn(model) gives its footprint in bytes; torch modules are
+        measured automatically.
+        """
+        key = (name, str(device))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+
+            self.misses += 1
+            logger.info(f"Loading model {name} on {device}")
+            model = loader()
+
+            if size_fn is not None:
+                size = size_fn(model)
+            elif hasattr(model, "parameters"):
+                size = module_size(model)
+            else:
+                size = 0
+
+            self._make_room(device_id(device), size)
+            self.entries[key] = (model, size)
+            return model
+
+    def _make_room(self, device, size):
+        budget = self.budgets.get(device_kind(device))
+        if budget is None:
+            return
+        for key in list(self.entries):
+            if self.used(device) + size <= budget:
+                break
+            if device_id(key[1]) != device:
+                continue
+            self.evict(key)
+        if self.used(device) + size > budget:
+            logger.warning(f"Model needs {size // MB} MB, more than the {device} budget of {budget // MB} MB")
+
+    def evict(self, key):
+        with self.lock:
+            model, size = self.entries.pop(key)
+            self.evictions += 1
+            logger.info(f"Evicting model {key[0]} from {key[1]} ({size // MB} MB)")
+            del model
+            if device_kind(key[1]) == "cuda":
+                import torch
+                torch.cuda.empty_cache()
+
+    def used(self, device):
+        device = device_id(device)
+        return sum(size for (name, key), (_, size) in self.entries.items() if device_id(key) == device)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self.evict(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": [
+                    {"name": name, "device": device, "mb": round(size / MB, 1)}
+                    for (name, device), (_, size) in self.entries.items()
+                ],
+                "used_mb": {device: round(self.used(device) / MB, 1)
+                            for device in sorted({"cpu"} | {device_id(key[1]) for key in self.entries})},
+                "budget_mb": {kind: budget // MB for kind, budget in self.budgets.items()},
+            }
+
+
+# Shared by everything running in this process (worker daemon, CLI)
+model_cache = ModelCache()
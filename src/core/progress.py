@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+
+from src.utils.logger import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Structured job progress. The worker reports (stage, fraction) as it goes;
+# ProgressTracker turns that into compact events with overall fraction, ETA,
+# throughput and memory, rate limited so a fast inner loop can call it
+# freely. The UI keeps only the newest event per job (LatestValue) and
+# applies it from a timer.
+
+# Overall progress range of each stage; stages a job skips are jumped over
+STAGES = {
+    "loading": (0.0, 0.05),
+    "separating": (0.05, 0.75),
+    "vocals": (0.75, 0.9),
+    "encoding": (0.9, 1.0),
+}
+
+# At most this many events per second per job (stage changes always go out)
+MAX_EVENTS_PER_SECOND = 10
+
+
+class JobCancelled(Exception):
+    """
+    Raised from a progress update once the job's cancel event is set.
+    """
+    def __init__(self):
+        super().__init__("Cancelled")
+
+
+def memory_mb():
+    """
+    Resident memory of this process in MB, or None if we can't tell.
+    """
+    if psutil:
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    try:
+        import resource
+        # Peak rather than current, but better than nothing (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+class ProgressTracker:
+    """
+    Builds progress events for one job and hands them to emit(event).
+    duration (seconds of audio) enables the throughput figure. Setting
+    the `cancel` event makes the next stage() or update() raise
+    JobCancelled, so a job can be stopped between segments.
+
+    Event layout:
+      {"stage": "separating", "fraction": 0.41, "eta": 12.5, "rate": 3.2, "mem_mb": 812}
+    fraction is the overall job fraction, eta the seconds left in the
+    current stage, rate seconds of audio processed per second.
+    """
+    def __init__(self, emit=None, duration=None, max_rate=MAX_EVENTS_PER_SECOND, cancel=None):
+        self.emit = emit
+        self.cancel = cancel
+        self.duration = duration
+        self.interval = 1.0 / max_rate
+        self.lock = threading.Lock()
+        self.current = None
+        self.stage_started = 0.0
+        self.stage_fraction = 0.0
+        self.last_sent = 0.0
+
+    def stage(self, name):
+        """
+        Starts stage `name` (see STAGES) and reports it right away.
+        """
+        self.check_cancelled()
+        with self.lock:
+            self.current = name
+            self.stage_started = time.perf_counter()
+            self.stage_fraction = 0.0
+            if self.emit is None:
+                return
+            event = self.event(self.stage_started)
+        self.send(event)
+
+    def update(self, fraction, force=False):
+        """
+        Progress within the current stage, 0..1. Cheap to call often: events
+        are dropped unless MAX_EVENTS_PER_SECOND allows one or it's the end.
+        """
+        self.check_cancelled()
+        if self.emit is None or self.current is None:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            # Never go backwards (e.g. Demucs' shift passes restart offsets)
+            self.stage_fraction = max(self.stage_fraction, min(1.0, fraction))
+            if not force and self.stage_fraction < 1.0 and now - self.last_sent < self.interval:
+                return
+            event = self.event(now)
+        self.send(event)
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise JobCancelled()
+
+    def event(self, now):
+        start, end = STAGES.get(self.current, (0.0, 1.0))
+        fraction = self.stage_fraction
+        elapsed = now - self.stage_started
+        self.last_sent = now
+        event = {"stage": self.current, "fraction": round(start + (end - start) * fraction, 4)}
+        if 0 < fraction < 1 and elapsed > 0:
+            event["eta"] = round(elapsed * (1 - fraction) / fraction, 1)
+            if self.duration:
+                event["rate"] = round(self.duration * fraction / elapsed, 2)
+        mem = memory_mb()
+        if mem is not None:
+            event["mem_mb"] = round(mem)
+        return event
+
+    def send(self, event):
+        try:
+            self.emit(event)
+        except Exception as e:
+            # Progress must never break a job
+            logger.debug(f"Dropped progress event: {e}")
+
+
+def demucs_callback(tracker, length, shifts, done=0, total=None):
+    """
+    Callback for demucs.apply.apply_model: it is called before and after
+    every segment with the segment offset, shift pass and model index of
+    a bag. Turns that into the fraction of the whole separation. When the
+    run covers only `length` of `total` samples (silence skipped, see
+    silence.py), done is how many were separated before it.
+    """
+    passes = max(1, shifts)
+    total = total or length
+
+    def callback(info):
+        if info.get("state") != "end":
+            return
+        models = info.get("models", 1)
+        within = min(1.0, info.get("segment_offset", 0) / max(1, length))
+        fraction = (info.get("model_idx_in_bag", 0) + (info.get("shift_idx", 0) + within) / passes) / models
+        tracker.update((done + fraction * length) / total)
+    return callback
+
+
+class LatestValue:
+    """
+    Mailbox holding only the newest value. Producers (worker threads) put
+    as often as they like; the UI timer takes whatever is there, so the UI
+    thread handles at most one update per tick no matter the event rate.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+
+    def put(self, value):
+        with self.lock:
+            self.value = value
+
+    def take(self):
+        with self.lock:
+            value, self.value = self.value, None
+        return value
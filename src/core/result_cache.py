@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import secrets
+
+from src.utils.logger import logger
+
+MB = 1024 * 1024
+
+# Location and size can be overridden per machine, e.g. STEMLAB_CACHE_MB=2048
+DEFAULT_CACHE_DIR = os.environ.get("STEMLAB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".stemlab", "cache"))
+DEFAULT_CACHE_BUDGET_MB = int(os.environ.get("STEMLAB_CACHE_MB", 10240))
+
+META_FILE = "meta.json"
+HASH_BLOCK = 1024 * 1024
+
+
+def content_hash(path):
+    """
+    BLAKE2 digest of the file's bytes. The same track dropped from two
+    folders (or renamed) hashes the same; a re-encoded copy does not.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_key(audio_hash, **params):
+    """
+    Cache key for one separation: the audio hash plus every option that
+    changes the output (model, shifts, overlap, stem count, mode, format).
+    """
+    blob = json.dumps(dict(params, audio=audio_hash), sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(src, dst):
+    """
+    Hard link when possible (same volume, instant, no extra space), copy
+    otherwise.
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ResultCache:
+    """
+    On-disk store of finished stems keyed by result_key(). Each entry is a
+    folder with the stem files and a meta.json; the meta file's mtime is
+    the last use, so the least recently used entries are evicted first when
+    the cache grows past its budget.
+
+    Entries are built in a temporary folder and renamed into place, so
+    concurrent workers never see a half-written entry.
+    """
+    def __init__(self, root=DEFAULT_CACHE_DIR, budget_mb=DEFAULT_CACHE_BUDGET_MB):
+        self.root = root
+        self.budget = int(budget_mb * MB)
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def entries(self):
+        """
+        (key, folder, meta) of every complete entry.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for key in os.listdir(folder):
+                meta_path = os.path.join(folder, key, META_FILE)
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    meta["last_used"] = os.path.getmtime(meta_path)
+                except (OSError, ValueError):
+                    continue
+                found.append((key, os.path.join(folder, key), meta))
+        return found
+
+    def meta(self, key):
+        """
+        The meta.json of an entry (whatever was passed to store()), or None.
+        """
+        try:
+            with open(os.path.join(self.entry_dir(key), META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, key):
+        """
+        {stem: cached file} for a hit, None for a miss. A hit counts as a use.
+        """
+        folder = self.entry_dir(key)
+        meta = self.meta(key)
+        if meta is None:
+            return None
+        files = {stem: os.path.join(folder, name) for stem, name in meta["files"].items()}
+        if not all(os.path.exists(path) for path in files.values()):
+            return None
+        os.utime(os.path.join(folder, META_FILE))
+        return files
+
+    def restore(self, key, output_dir):
+        """
+        Links the cached stems for `key` into output_dir.
+        Returns {stem: path in output_dir}, or None on a miss.
+        """
+        files = self.lookup(key)
+        if files is None:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        restored = {}
+        for stem, cached in files.items():
+            target = os.path.join(output_dir, os.path.basename(cached))
+            link_or_copy(cached, target)
+            restored[stem] = target
+        return restored
+
+    def store(self, key, files, **meta):
+        """
+        Adds the stems in `files` ({stem: path}) under `key`, then trims
+        the cache back to its budget.
+        """
+        final = self.entry_dir(key)
+        if os.path.exists(os.path.join(final, META_FILE)):
+            return
+        staging = os.path.join(self.root, f".tmp-{key}-{secrets.token_hex(4)}")
+        os.makedirs(staging)
+        try:
+            size = 0
+            for path in files.values():
+                link_or_copy(path, os.path.join(staging, os.path.basename(path)))
+                size += os.path.getsize(path)
+            meta = dict(meta, key=key, size=size, created=time.time(),
+                        files={stem: os.path.basename(path) for stem, path in files.items()})
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            try:
+                os.rename(staging, final)
+            except OSError:
+                # Another worker stored the same result first
+                return
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Cached result {key[:12]} ({size / MB:.1f} MB)")
+        self.trim()
+
+    def evict(self, key):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def trim(self, budget=None):
+        """
+        Evicts least recently used entries until the cache fits `budget`
+        bytes (default: the configured budget). Returns how many went.
+        """
+        budget = self.budget if budget is None else budget
+        entries = sorted(self.entries(), key=lambda entry: entry[2]["last_used"])
+        total = sum(meta["size"] for _, _, meta in entries)
+        evicted = 0
+        for key, folder, meta in entries:
+            if total <= budget:
+                break
+            logger.info(f"Evicting cached result {key[:12]} ({meta['size'] / MB:.1f} MB)")
+            self.evict(key)
+            total -= meta["size"]
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        return self.trim(0)
+
+    def stats(self):
+        entries = self.entries()
+        used = [meta["last_used"] for _, _, meta in entries]
+        return {
+            "root": self.root,
+            "entries": len(entries),
+            "used_mb": round(sum(meta["size"] for _, _, meta in entries) / MB, 1),
+            "budget_mb": self.budget // MB,
+            "oldest_use": min(used) if used else None,
+            "newest_use": max(used) if used else None,
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,153 @@
+import time
+import queue
+import threading
+
+from src.utils.logger import logger
+from src.core.daemon import DaemonClient
+from src.core.devices import DeviceManager, Device, detect_devices
+
+
+def build_slots(gpus=None, cores=None, threads_per_job=None, max_jobs=None, inventory=None, cpu_jobs=None):
+    """
+    Works out how many jobs may run at once and with which resources.
+    Returns a list of slots: {"gpu": index or None, "threads": n, "device": Device}.
+
+    One slot per job a device can take (see devices.detect_devices).
+    gpus simulates that many GPUs of unknown size, inventory describes
+    them fully; both default to the real hardware.
+    """
+    if inventory is None and gpus is not None:
+        inventory = [{"name": f"GPU {index}"} for index in range(gpus)]
+    devices = detect_devices(inventory, cores, threads_per_job, cpu_jobs=cpu_jobs)
+
+    # Interleave so that max_jobs keeps one slot per device first
+    slots = []
+    for round_index in range(max(device.slots for device in devices)):
+        for device in devices:
+            if round_index < device.slots:
+                slots.append({"gpu": device.index, "threads": device.threads, "device": device})
+
+    if max_jobs:
+        slots = slots[:max_jobs]
+    return slots
+
+
+class JobScheduler:
+    """
+    Hands out worker daemons, one per slot, so up to `capacity` jobs run
+    concurrently without oversubscribing cores or sharing a GPU. Each job
+    goes to the least loaded device with room for it (see DeviceManager).
+    """
+    def __init__(self, slots=None):
+        self.slots = slots or build_slots()
+        self.daemons = []
+        self.device_of = {}
+        for slot in self.slots:
+            device = slot.get("device") or Device("cuda" if slot["gpu"] is not None else "cpu", slot["gpu"])
+            daemon = DaemonClient(threads=slot["threads"], gpu=slot["gpu"], cpu_only=device.kind == "cpu",
+                                  memory_share=self.memory_share(slot))
+            self.daemons.append(daemon)
+            self.device_of[daemon] = device
+        self.devices = DeviceManager(dict.fromkeys(self.device_of.values()))
+        self.idle = list(self.daemons)
+        self.lock = threading.Lock()
+        logger.info(f"Scheduler: {self.capacity} concurrent job(s) on {self.devices.describe()}")
+
+    def memory_share(self, slot):
+        """
+        Jobs that may use `slot`'s memory at once: the slots on the same GPU,
+        or for a CPU slot every slot, since they all share the host's RAM.
+        """
+        if slot["gpu"] is None:
+            return len(self.slots)
+        return sum(1 for other in self.slots if other["gpu"] == slot["gpu"])
+
+    @property
+    def capacity(self):
+        return len(self.daemons)
+
+    def acquire(self):
+        """
+        Returns an idle daemon on the best device, or None if no device can
+        take another job right now.
+        """
+        with self.lock:
+            device = self.devices.pick({self.device_of[daemon] for daemon in self.idle})
+            if device is None:
+                return None
+            daemon = next(daemon for daemon in self.idle if self.device_of[daemon] is device)
+            self.idle.remove(daemon)
+            self.devices.start(device)
+            return daemon
+
+    def release(self, daemon):
+        with self.lock:
+            if daemon not in self.idle:
+                self.idle.append(daemon)
+                self.devices.finish(self.device_of[daemon])
+
+    def has_free_slot(self):
+        with self.lock:
+            return self.devices.pick({self.device_of[daemon] for daemon in self.idle}) is not None
+
+    def stop(self):
+        for daemon in self.daemons:
+            daemon.stop()
+
+
+def run_batch(configs, scheduler, on_done=None, on_line=None):
+    """
+    Runs worker configs on all of the scheduler's slots until the list is
+    drained. on_done(config, error, seconds) is called as each job finishes
+    (error is None on success); on_line(config, line) gets worker output.
+    Blocks until every job is done.
+
+    Each slot sends its next job as soon as the current one is separated,
+    so at most two jobs share a daemon: one encoding, one separating.
+    """
+    jobs = queue.Queue()
+    for config in configs:
+        jobs.put(config)
+
+    def run(daemon, config, separated):
+        error = None
+        started = time.perf_counter()
+        try:
+            daemon.run_job(config, on_line=(lambda line: on_line(config, line)) if on_line else None,
+                           on_separated=separated.set)
+        except Exception as e:
+            error = e
+            logger.error(f"Job failed for {config['input_file']}: {e}")
+        finally:
+            separated.set()
+        if on_done:
+            on_done(config, error, time.perf_counter() - started)
+
+    def work():
+        daemon = scheduler.acquire()
+        if daemon is None:
+            return
+        previous = None
+        try:
+            while True:
+                try:
+                    config = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                separated = threading.Event()
+                thread = threading.Thread(target=run, args=(daemon, config, separated), daemon=True)
+                thread.start()
+                separated.wait()
+                if previous:
+                    previous.join()
+                previous = thread
+        finally:
+            if previous:
+                previous.join()
+            scheduler.release(daemon)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(scheduler.capacity)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
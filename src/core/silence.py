@@ -0,0 +1,70 @@
+import numpy as np
+import torch
+
+# Silence-aware inference. Before a model pass, the frame levels of the mix
+# are measured in one vectorised pass and long silent stretches (intros,
+# outros, gaps, pauses in speech) are cut out; the model only runs on what
+# is left, each region with some context on either side, and the outputs
+# are plain silence in between.
+
+# Length of one analysis frame
+FRAME_SECONDS = 0.05
+
+# Frames whose peak stays below this (dBFS) are silent
+THRESHOLD_DB = -60.0
+
+# Shorter silent stretches aren't skipped: every extra region costs a
+# partly padded segment, which would eat up what the gap saves
+MIN_SILENCE = 4.0
+
+# Audio kept on either side of every region so the model has context
+PADDING = 1.0
+
+
+def frame_levels(wav, samplerate, frame_seconds=FRAME_SECONDS):
+    """
+    Peak level in dBFS of every frame of a (channels, time) tensor, as a
+    numpy array (the last frame may be short).
+    """
+    frame = max(1, int(frame_seconds * samplerate))
+    length = wav.shape[-1]
+    count = -(-length // frame)
+    peaks = wav.abs().amax(dim=0)
+    if count * frame != length:
+        peaks = torch.nn.functional.pad(peaks, (0, count * frame - length))
+    peaks = peaks.reshape(count, frame).amax(dim=1).float().cpu().numpy()
+    return 20 * np.log10(np.maximum(peaks, 1e-10))
+
+
+def active_regions(wav, samplerate, threshold_db=THRESHOLD_DB, min_silence=MIN_SILENCE, padding=PADDING):
+    """
+    [(start, end)] sample ranges of `wav` to run the model on: everything
+    except silent stretches longer than min_silence seconds, each range
+    widened by `padding` seconds. Empty if the whole input is silent.
+    """
+    length = wav.shape[-1]
+    if length == 0:
+        return []
+    frame = max(1, int(FRAME_SECONDS * samplerate))
+    active = frame_levels(wav, samplerate) >= threshold_db
+    # Runs of active frames, as [start, end) frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], active, [False])).astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+    # Join runs separated by less silence than is worth skipping, padding included
+    pad = int(np.ceil(padding * samplerate / frame))
+    gap = int(np.ceil(min_silence * samplerate / frame)) + 2 * pad
+    split = starts[1:] - ends[:-1] >= gap
+    starts = starts[np.concatenate(([True], split))]
+    ends = ends[np.concatenate((split, [True]))]
+    starts = np.maximum(starts - pad, 0) * frame
+    ends = np.minimum((ends + pad) * frame, length)
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+
+def skipped_samples(regions, length):
+    """
+    How many of `length` samples `regions` leave out.
+    """
+    return length - sum(end - start for start, end in regions)
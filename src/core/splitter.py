@@ -1,16 +1,25 @@
 import os
 import shutil
-import sys
-import subprocess
-import json
+import tempfile
+import threading
+from contextlib import ExitStack
 
+import soundfile as sf
 
-from PyQt6.QtCore import QThread, pyqtSignal
 from src.utils.logger import logger
-import demucs.separate
+from src.core.engine import DemucsEngine
+from src.core.encoder import encoder_pool, clip_scale, encode_audio, format_for, transcode
+from src.core.stems import plan_outputs, materialize
+from src.core.streaming import StreamingSeparator, should_stream
+from src.core.result_cache import result_cache, content_hash, result_key
+from src.core.progress import JobCancelled, ProgressTracker
+from src.core.tuning import autotune
+from src.core.trace import JobTrace, TRACE_FILE
+from src.core.archive import ZipSink
+from src.core.decode import decode_cache
 import torch
 import torchaudio
-import soundfile as sf
+from src.core.audio_io import load_audio, save_audio
 try:
     from src.core.advanced_audio import AdvancedAudioProcessor
 except ImportError:
@@ -18,26 +27,208 @@ except ImportError:
     logger.warning("AdvancedAudioProcessor not available (audio-separator missing?)")
 
 # Monkeypatch torchaudio to use soundfile directly (Fix for Python 3.14 / torchaudio 2.9.1)
+# Both sides avoid full-track copies, see audio_io
 def custom_load(filepath, *args, **kwargs):
-    wav, sr = sf.read(filepath)
-    wav = torch.tensor(wav).float()
-    if wav.ndim == 1:
-        wav = wav.unsqueeze(0)
-    else:
-        wav = wav.t()
-    return wav, sr
+    return load_audio(filepath)
 
 def custom_save(filepath, src, sample_rate, **kwargs):
-    src = src.detach().cpu().t().numpy()
-    sf.write(filepath, src, sample_rate)
+    save_audio(filepath, src, sample_rate)
 
 torchaudio.load = custom_load
 torchaudio.save = custom_save
 
-def separate_audio(input_file, output_dir, stem_count, quality, export_zip, keep_original, **kwargs):
+# Raw model sources are cached losslessly so every grouping can be derived later
+SOURCE_FORMAT = "flac"
+# Output formats that can stand in for them when every output is one source
+REUSABLE_FORMATS = ("wav", "flac")
+
+def write_outputs(plan, stems, paths, samplerate, pending, trace=None, archive=None):
+    """
+    Mixes every planned output and queues it on the encoder pool; the
+    futures are added to `pending`. Each finished file goes into `archive`
+    (a ZipSink) if given. Returns {stem: tensor}.
+    """
+    trace = trace or JobTrace()
+    outputs = {}
+    for stem, source in materialize(plan, stems):
+        encode = trace.wrap("encode", encode_audio, source.shape[-1] / samplerate, file=os.path.basename(paths[stem]))
+        future = encoder_pool.submit(encode, source, paths[stem], samplerate)
+        if archive:
+            archive.add_when_done(future, paths[stem])
+        pending.append(future)
+        outputs[stem] = source
+    return outputs
+
+def store_sources(key, stems, samplerate, **meta):
+    """
+    Adds the raw per-source output of a separation to the result cache so
+    other modes of the same track are derived without a model pass.
+    """
+    os.makedirs(result_cache.root, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=result_cache.root)
+    try:
+        files = {}
+        scales = {}
+        for name, source in stems.items():
+            # Sources can peak above full scale, which integer PCM can't hold
+            scales[name] = max(1.0, float(source.abs().max()) / 0.999)
+            files[name] = os.path.join(staging, f"{name}.{SOURCE_FORMAT}")
+            save_audio(files[name], source / scales[name], samplerate, subtype="PCM_24")
+        result_cache.store(key, files, scales=scales, samplerate=samplerate, **meta)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def cache_sources(key, stems, samplerate, **meta):
+    # Runs on the encoder pool after the job has moved on, nobody to raise to
+    try:
+        store_sources(key, stems, samplerate, **meta)
+    except Exception as e:
+        logger.warning(f"Could not cache sources: {e}")
+
+def cache_outputs_as_sources(key, paths, futures, scales, samplerate, **meta):
+    """
+    Caches the outputs in `paths` as the raw sources once `futures` (their
+    encodes) have all succeeded, linking the files instead of encoding a
+    second copy. For plans where every output is exactly one source;
+    scales undo prevent_clip when the sources are loaded.
+    """
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(future):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        if any(future.exception() for future in futures):
+            return
+        try:
+            result_cache.store(key, paths, scales=scales, samplerate=samplerate, **meta)
+        except OSError as e:
+            logger.warning(f"Could not cache sources: {e}")
+
+    for future in futures:
+        future.add_done_callback(done)
+
+def load_sources(key):
+    """
+    Cached raw sources for `key` as ({source: tensor}, samplerate), or
+    (None, None) on a miss.
+    """
+    files = result_cache.lookup(key)
+    if files is None:
+        return None, None
+    scales = result_cache.meta(key).get("scales", {})
+    stems = {}
+    samplerate = None
+    for name, path in files.items():
+        stems[name], samplerate = load_audio(path)
+        if scales.get(name, 1.0) != 1.0:
+            stems[name] *= scales[name]
+    return stems, samplerate
+
+def track_duration(path):
+    # Only for the throughput figure; formats soundfile can't read go without
+    try:
+        return sf.info(path).duration
+    except RuntimeError:
+        return None
+
+def run_separation(engine, input_file, output_dir, plan, ext, pending, streaming=None, sources_key=None,
+                   progress=None, max_memory_mb=None, trace=None, archive=None, source=None):
+    """
+    Runs Demucs and writes the planned outputs as {stem}.{ext}. Returns
+    {stem: audio}: tensors when separated in memory, file paths when
+    streamed. In memory, outputs are encoded in the background (futures in
+    `pending`). With a sources_key the raw sources of an in-memory run are
+    cached in the background, off the job's wait (streamed inputs are too
+    long to be worth keeping). progress is
+    the job's ProgressTracker. Segment, overlap, workers and the streaming
+    window are tuned to the free memory, capped at max_memory_mb. Stages
+    are recorded in trace (a JobTrace), finished outputs go into archive.
+    source is the decoded copy of input_file to read (see decode.py).
+    """
+    progress = progress or ProgressTracker()
+    trace = trace or JobTrace()
     filename = os.path.basename(input_file)
-    base_name = os.path.splitext(filename)[0]
+    source = source or input_file
+    paths = {stem: os.path.join(output_dir, f"{stem}.{ext}") for stem in plan}
+    duration = track_duration(source)
+    
+    with trace.span("model_load", model=engine.model_name, device=str(engine.device)):
+        engine.model # loads it, or takes it from the model cache
+    settings = autotune(engine, duration, engine.overlap, max_memory_mb)
+    engine.segment = settings.segment
+    engine.overlap = settings.overlap
+    engine.workers = settings.workers
+    if streaming is None:
+        streaming = settings.window is not None or should_stream(source)
+    
+    if streaming:
+        # Long input: separate window by window, writing outputs as we go
+        logger.info(f"Separating {filename} with {engine.model_name} (streaming)...")
+        progress.stage("separating")
+        separator = StreamingSeparator(engine, window_seconds=settings.window or 60.0)
+        outputs = separator.separate_file(source, plan, paths, progress, trace)
+        if archive:
+            for path in outputs.values():
+                archive.add(path)
+        return outputs
+    
+    # Run Demucs in-process; stems stay in memory until they are written
+    logger.info(f"Separating {filename} with {engine.model_name}...")
+    with trace.span("load", duration):
+        wav = engine.load_track(source)
+    duration = wav.shape[-1] / engine.samplerate
+    progress.stage("separating")
+    with trace.span("inference", duration, segment=settings.segment, workers=settings.workers):
+        stems = engine.separate(wav, progress=progress)
+    del wav
+    
+    encodes = len(pending)
+    outputs = write_outputs(plan, stems, paths, engine.samplerate, pending, trace, archive)
+    if sources_key:
+        meta = dict(input=filename, model=engine.model_name, shifts=engine.shifts, overlap=engine.overlap)
+        if ext in REUSABLE_FORMATS and plan == {name: [name] for name in stems}:
+            # The outputs are the sources, cache those files once written
+            scales = {name: clip_scale(float(source.abs().max())) for name, source in stems.items()}
+            cache_outputs_as_sources(sources_key, paths, pending[encodes:], scales, engine.samplerate, **meta)
+        else:
+            encoder_pool.submit(cache_sources, sources_key, stems, engine.samplerate, **meta)
+    del stems
+    return outputs
+
+def settle_vocal_model(future):
+    """
+    Exit callback for a job's resources: the MDX vocal model started by
+    start_vocal_model is cancelled if it hasn't begun, otherwise waited
+    for, so it never outlives the job on the device. A failed job never
+    joined it, so its error is logged here.
+    """
+    def settle(exc_type, exc, tb):
+        if future.cancel():
+            return False
+        error = future.exception()
+        if error and exc_type is not None:
+            logger.warning(f"Vocal model failed too: {error}")
+        return False
+    return settle
+
+def separate_audio(input_file, output_dir, stem_count, quality, export_zip, keep_original, **kwargs):
     os.makedirs(output_dir, exist_ok=True)
+    # With export_zip, "{output_dir}.zip" is built while the job runs
+    archive = ZipSink(f"{output_dir}.zip") if export_zip else None
+    try:
+        # Holds what the job uses until it ends (the lease on its decode)
+        with ExitStack() as resources:
+            separate_job(input_file, output_dir, stem_count, quality, archive, keep_original, resources, **kwargs)
+    except BaseException:
+        if archive:
+            archive.abort()
+        raise
+
+def separate_job(input_file, output_dir, stem_count, quality, archive, keep_original, resources, **kwargs):
+    filename = os.path.basename(input_file)
 
     # Determine Model and Args
     model = "htdemucs"
@@ -56,246 +247,194 @@ def separate_audio(input_file, output_dir, stem_count, quality, export_zip, keep
         shifts = 2
         overlap = 0.25
 
-    # Construct Demucs Args
-    args = [
-        "-n", model,
-        "--shifts", str(shifts),
-        "--overlap", str(overlap),
-        "-o", output_dir,
-        "--filename", "{track}/{stem}.{ext}",
-        input_file
-    ]
-    
-    if stem_count == 2:
-        args.append("--two-stems=vocals")
-        
-    if kwargs.get("export_mp3", False):
-        args.append("--mp3")
-        args.append("--mp3-bitrate")
-        args.append("320")
-    
-    if not torch.cuda.is_available():
-        args.append("-d")
-        args.append("cpu")
+    mode = kwargs.get("mode", "standard")
+    ext = format_for(kwargs.get("export_format"), kwargs.get("export_mp3", False))
+    # Encodes run on the encoder pool while we carry on; joined before zipping
+    pending = []
 
-    # Run Demucs
-    demucs.separate.main(args)
+    # Structured progress for the UI/daemon; tqdm's text bars only when nobody listens
+    on_progress = kwargs.get("on_progress")
+    duration = track_duration(input_file)
+    progress = ProgressTracker(on_progress, duration, cancel=kwargs.get("cancel"))
+    # Per-stage timings and memory, written next to the stems
+    trace = JobTrace(input_file, duration)
+    if archive:
+        archive.trace = trace
+    progress.stage("loading")
+    skip_silence = kwargs.get("skip_silence", True)
+    engine = DemucsEngine(model, shifts=shifts, overlap=overlap, progress=on_progress is None,
+                          skip_silence=skip_silence)
     
-    # Organize Files
-    # Organize Files
-    demucs_output_root = os.path.join(output_dir, model, base_name)
+    # Same audio + same options = same stems; checked before the model is even loaded
+    audio_hash = None
+    cache_key = None
+    sources_key = None
+    outputs = None
+    samplerate = None
+    if kwargs.get("cache", True):
+        with trace.span("hash"):
+            audio_hash = content_hash(input_file)
+        cache_key = result_key(audio_hash, model=model, shifts=shifts, overlap=overlap,
+                               stem_count=stem_count, mode=mode, ext=ext, skip_silence=skip_silence)
+        # Raw sources don't depend on the mode, any grouping can be mixed from them
+        sources_key = result_key(audio_hash, model=model, shifts=shifts, overlap=overlap, kind="sources",
+                                 skip_silence=skip_silence)
+        with trace.span("cache_restore"):
+            outputs = result_cache.restore(cache_key, output_dir)
+        if outputs is not None:
+            logger.info(f"Result cache hit for {filename}, reusing {', '.join(outputs)}")
+            if archive:
+                for path in outputs.values():
+                    archive.add(path)
     
-    mode = kwargs.get("mode", "standard")
-    ext = "mp3" if kwargs.get("export_mp3", False) else "wav"
+    # Decode once into the float32 PCM cache; every model and inversion reads
+    # that copy (a cache hit that runs no model doesn't need it). The lease
+    # keeps other jobs from trimming it away before this one is done.
+    source = input_file
+    if outputs is None or (mode == "vocals_only" and AdvancedAudioProcessor):
+        with trace.span("decode", duration):
+            source = resources.enter_context(decode_cache.lease(input_file, audio_hash))
+        if duration is None:
+            duration = track_duration(source)
+            trace.audio_seconds = progress.duration = duration
     
-    if os.path.exists(demucs_output_root):
-        for stem in os.listdir(demucs_output_root):
-            src = os.path.join(demucs_output_root, stem)
-            
-            # Filter based on mode
-            should_keep = True
-            if mode == "vocals_only" and "vocals" not in stem:
-                should_keep = False
-            elif mode == "instrumental" and "no_vocals" not in stem:
-                should_keep = False
-            
-            if should_keep:
-                dst = os.path.join(output_dir, stem)
-                shutil.move(src, dst)
+    # Kim_Vocal_2 only needs the original audio, run it while Demucs works
+    processor = None
+    mdx_vocals = None
+    if mode == "vocals_only" and AdvancedAudioProcessor:
+        processor = AdvancedAudioProcessor(output_dir, ensemble_mode=kwargs.get("ensemble_mode", "average"),
+                                           input_name=os.path.splitext(filename)[0])
+        resources.callback(processor.close)
+        if kwargs.get("parallel_mdx", True):
+            mdx_vocals = processor.start_vocal_model(source, trace)
+            # Runs before processor.close, which removes what it writes
+            resources.push(settle_vocal_model(mdx_vocals))
+    
+    if outputs is None:
+        with trace.span("cache_load"):
+            stems, samplerate = load_sources(sources_key) if sources_key else (None, None)
+        plan = plan_outputs(mode, stem_count, list(stems) if stems else engine.sources)
+        logger.info(f"Planned outputs: {', '.join(plan)}")
+        
+        paths = {stem: os.path.join(output_dir, f"{stem}.{ext}") for stem in plan}
+        # Old outputs may be hard links into the result cache, never write through them
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
         
-        # Clean up empty folders
-        shutil.rmtree(os.path.join(output_dir, model))
+        if stems is not None:
+            logger.info(f"Deriving {mode} outputs for {filename} from cached {model} sources")
+            outputs = write_outputs(plan, stems, paths, samplerate, pending, trace, archive)
+            del stems
+        else:
+            outputs = run_separation(engine, input_file, output_dir, plan, ext, pending,
+                                     kwargs.get("streaming"), sources_key, progress,
+                                     kwargs.get("max_memory_mb"), trace, archive, source)
+            samplerate = engine.samplerate
+    else:
+        # Nothing to store again
+        cache_key = None
     
     # Copy Original if requested
     if keep_original:
-        shutil.copy(input_file, os.path.join(output_dir, f"original.{ext}"))
+        original = os.path.join(output_dir, f"original.{ext}")
+        with trace.span("copy_original"):
+            shutil.copy(input_file, original)
+        if archive:
+            archive.add(original)
         
-    # De-Reverb Logic (Placeholder/Basic Implementation)
-    if kwargs.get("dereverb", False):
-        logger.info("De-Reverb requested (Experimental)")
+    # De-Reverb + De-Echo run as stages of the vocals-only pipeline
+    if kwargs.get("dereverb", False) and mode != "vocals_only":
+        logger.info("De-Reverb is only applied in Vocals Only mode")
 
     # Advanced Pipeline (Vocals Only)
-    if mode == "vocals_only" and AdvancedAudioProcessor:
+    if processor:
         try:
             logger.info("Starting Advanced Audio Pipeline (Ensemble/MDX)...")
-            processor = AdvancedAudioProcessor(output_dir)
             
-            # Demucs output might be mp3 or wav depending on flag
-            demucs_vocals = os.path.join(output_dir, f"vocals.{ext}")
+            # Hand the Demucs vocals over in memory, no need to decode vocals.mp3 again
+            # (streaming jobs and cache hits only have the written file)
+            demucs_vocals = outputs.get("vocals")
             
-            # If MP3, we might need to convert back to WAV for processing, or ensure processor handles it
-            # For simplicity, let's assume processor handles input formats supported by soundfile/ffmpeg
+            if torch.is_tensor(demucs_vocals):
+                demucs_vocals = (demucs_vocals.cpu().t().numpy(), samplerate)
             
-            if os.path.exists(demucs_vocals):
-                final_vocals = processor.process_vocals_ultra_clean(input_file, demucs_vocals)
+            if demucs_vocals is not None:
+                progress.stage("vocals")
+                final_vocals = processor.process_vocals_ultra_clean(source, demucs_vocals,
+                                                                    dereverb=kwargs.get("dereverb", False),
+                                                                    mdx_vocals=mdx_vocals, trace=trace)
+                logger.info("Stage times: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in processor.stage_times.items()))
                 
-                # Rename/Move result
-                if final_vocals and os.path.exists(final_vocals):
-                    target_name = f"vocals_ultra_clean.wav" # Processor outputs WAV
-                    shutil.move(final_vocals, os.path.join(output_dir, target_name))
-                    
-                    # Convert to MP3 if requested
-                    if kwargs.get("export_mp3", False):
-                        mp3_target = f"vocals_ultra_clean.mp3"
-                        # Use pydub or ffmpeg to convert. 
-                        # Since we have ffmpeg in path (checked by debug script), we can use subprocess
-                        subprocess.run(f'ffmpeg -y -i "{os.path.join(output_dir, target_name)}" -b:a 320k "{os.path.join(output_dir, mp3_target)}"', shell=True)
-                        os.remove(os.path.join(output_dir, target_name)) # Remove WAV
-                        target_name = mp3_target
-                        
-                    logger.info(f"Created Ultra Clean Vocals: {target_name}")
+                if final_vocals is not None:
+                    target_name = f"vocals_ultra_clean.{ext}"
+                    target = os.path.join(output_dir, target_name)
                     
-                    # Create Instrumental Inversion if needed
+                    # Create Instrumental Inversion if needed (from the unencoded vocals)
                     if kwargs.get("invert", False):
-                        inst_path = os.path.join(output_dir, f"instrumental_inverted.wav")
-                        processor.invert_audio(input_file, os.path.join(output_dir, target_name), inst_path)
+                        inst_path = os.path.join(output_dir, f"instrumental_inverted.{ext}")
+                        with trace.span("invert", duration):
+                            processor.invert_audio(source, final_vocals, inst_path)
+                        if archive:
+                            archive.add(inst_path)
+                        logger.info(f"Created Inverted Instrumental: {os.path.basename(inst_path)}")
+                    
+                    # Encoded in the background: the ensemble straight from memory, de-reverb
+                    # outputs from audio-separator's file (work_dir outlives the encode wait)
+                    if isinstance(final_vocals, tuple):
+                        data, vocals_rate = final_vocals
+                        encode = trace.wrap("encode", encode_audio, len(data) / vocals_rate, file=target_name)
+                        future = encoder_pool.submit(encode, data.T, target, vocals_rate)
+                    else:
+                        encode = trace.wrap("transcode", transcode, file=target_name)
+                        future = encoder_pool.submit(encode, final_vocals, target)
+                    if archive:
+                        archive.add_when_done(future, target)
+                    pending.append(future)
                         
-                        if kwargs.get("export_mp3", False):
-                             mp3_inst = f"instrumental_inverted.mp3"
-                             subprocess.run(f'ffmpeg -y -i "{inst_path}" -b:a 320k "{os.path.join(output_dir, mp3_inst)}"', shell=True)
-                             os.remove(inst_path)
-                             inst_path = mp3_inst
-                             
-                        logger.info(f"Created Inverted Instrumental: {inst_path}")
+                    logger.info(f"Created Ultra Clean Vocals: {target_name}")
 
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Advanced Pipeline Failed: {e}")
             # Fallback to standard Demucs output is already there, so just log error.
 
-    # Zip if requested
-    if export_zip:
-        shutil.make_archive(output_dir, 'zip', output_dir)
-
-class SplitterWorker(QThread):
-    progress_updated = pyqtSignal(str, int, str) # filename, progress, status
-    finished = pyqtSignal(str) # filename
-    error_occurred = pyqtSignal(str, str) # filename, error message
-
-    def __init__(self, file_path, options):
-        super().__init__()
-        self.file_path = file_path
-        self.options = options
-        self.process = None
-        self.is_cancelled = False
-
-    def run(self):
-        filename = os.path.basename(self.file_path)
-        logger.info(f"Starting processing for {filename} with options: {self.options}")
-        
+    # All model work is done; the caller may start separating the next job
+    # while this one finishes encoding
+    on_separated = kwargs.get("on_separated")
+    if on_separated:
+        on_separated()
+    
+    progress.stage("encoding")
+    with trace.span("encode_wait"):
+        encoder_pool.wait_all(pending, progress)
+    
+    if cache_key:
         try:
-            base_name = os.path.splitext(filename)[0]
-            output_dir = os.path.join(os.path.dirname(self.file_path), f"{base_name} - Stems")
-            
-            config = {
-                "input_file": self.file_path,
-                "output_dir": output_dir,
-                "stem_count": self.options["stem_count"],
-                "quality": self.options["quality"],
-                "export_zip": self.options["export_zip"],
-                "keep_original": self.options["keep_original"],
-                "export_mp3": self.options.get("export_mp3", False),
-                "mode": self.options.get("mode", "standard"),
-                "dereverb": self.options.get("dereverb", False)
-            }
-            
-            config_json = json.dumps(config)
-            
-            # Run subprocess
-            # Use -u for unbuffered output to capture real-time logs
-            cmd = [sys.executable, "-u", "main.py", "--worker", config_json]
-            if getattr(sys, 'frozen', False):
-                cmd = [sys.executable, "--worker", config_json]
-            
-            self.progress_updated.emit(filename, 10, "Starting Worker...")
-            
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            # Force unbuffered output
-            env = os.environ.copy()
-            env["PYTHONUNBUFFERED"] = "1"
-            
-            self.process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT,
-                text=False, # Read bytes to handle \r
-                startupinfo=startupinfo,
-                bufsize=0, # Unbuffered
-                env=env
-            )
-            
-            self.progress_updated.emit(filename, 20, "Separating...")
-            
-            # Read output in real-time
-            buffer = b""
-            while True:
-                if self.is_cancelled:
-                    break
-                
-                # Read one byte at a time to handle \r and \n
-                chunk = self.process.stdout.read(1)
-                if not chunk and self.process.poll() is not None:
-                    break
-                
-                if chunk:
-                    buffer += chunk
-                    
-                    # Check for newline or carriage return
-                    if chunk in (b'\n', b'\r'):
-                        try:
-                            line = buffer.decode('utf-8', errors='replace').strip()
-                        except:
-                            line = ""
-                        
-                        buffer = b""
-                        
-                        if line:
-                            # Parse Progress (e.g. " 15%|...")
-                            if "%" in line and "|" in line:
-                                try:
-                                    # Extract percentage
-                                    parts = line.split('%')[0].split()
-                                    if parts:
-                                        pct = int(parts[-1])
-                                        # Map 0-100% of separation to 20-90% of total progress
-                                        total_progress = 20 + int(pct * 0.7)
-                                        self.progress_updated.emit(filename, total_progress, f"Separating: {pct}%")
-                                except:
-                                    pass
-                            
-                            # User Friendly Logging
-                            # Only log significant messages or errors
-                            is_progress_bar = "%" in line and "|" in line
-                            if not is_progress_bar:
-                                logger.info(f"[Worker] {line}")
-                                if "Separating" in line:
-                                    self.progress_updated.emit(filename, 20, "Separating...")
-                                elif "Loading" in line:
-                                    self.progress_updated.emit(filename, 10, "Loading Models...")
-            
-            if self.is_cancelled:
-                return
+            with trace.span("cache_store"):
+                result_cache.store(cache_key, paths, input=filename, model=model, shifts=shifts,
+                                   overlap=overlap, stem_count=stem_count, mode=mode, ext=ext)
+        except OSError as e:
+            logger.warning(f"Could not cache result: {e}")
 
-            return_code = self.process.poll()
-            if return_code != 0:
-                raise Exception(f"Worker failed with code {return_code}")
-            
-            self.progress_updated.emit(filename, 100, "Done")
-            self.finished.emit(filename)
-            
-        except Exception as e:
-            if not self.is_cancelled:
-                logger.error(f"Error processing {filename}: {e}")
-                self.error_occurred.emit(filename, str(e))
+    # Zip if requested; only what the writer hasn't caught up with yet is left
+    if archive:
+        with trace.span("zip"):
+            archive.close()
+    
+    if engine.frames:
+        trace.stats["silence_skipped"] = round(engine.skipped / engine.frames, 4)
+        logger.info(f"Skipped {engine.skipped / engine.frames:.0%} of {filename} as silence")
+    logger.info(f"Stage times for {filename}: {trace.describe()}")
+    if kwargs.get("trace", True):
+        trace.write(os.path.join(output_dir, TRACE_FILE))
+    progress.update(1.0, force=True)
 
-    def terminate(self):
-        self.is_cancelled = True
-        if self.process:
-            try:
-                self.process.kill()
-            except:
-                pass
-        # Do NOT call super().terminate() - let the thread exit naturally
+# SplitterWorker is a QThread and lives in src.core.worker so that this module
+# (and with it the worker daemon and the batch CLI) never imports PyQt6
+def __getattr__(name):
+    if name == "SplitterWorker":
+        from src.core.worker import SplitterWorker
+        return SplitterWorker
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
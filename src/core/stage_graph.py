@@ -0,0 +1,100 @@
+import time
+from contextlib import nullcontext
+
+from src.utils.logger import logger
+
+
+class Stage:
+    """
+    One step of a pipeline. run(*inputs) gets the named input artifacts and
+    returns the output artifacts (a single value when there is one output,
+    a tuple otherwise).
+    """
+    def __init__(self, name, run, inputs=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+
+class StageGraph:
+    """
+    Stages connected by the artifacts they consume and produce. Only the
+    stages a requested target actually depends on are executed; everything
+    else is pruned before anything runs. Wall time is recorded per stage.
+    """
+    def __init__(self, stages=()):
+        self.stages = []
+        self.producers = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage):
+        for artifact in stage.outputs:
+            if artifact in self.producers:
+                raise ValueError(f"{artifact} is produced by both {self.producers[artifact].name} and {stage.name}")
+            self.producers[artifact] = stage
+        self.stages.append(stage)
+        return stage
+
+    def plan(self, targets, available=()):
+        """
+        Stages needed to produce `targets` from the `available` artifacts,
+        in execution order.
+        """
+        order = []
+        visiting = set()
+
+        def visit(artifact):
+            if artifact in available:
+                return
+            stage = self.producers.get(artifact)
+            if stage is None:
+                raise KeyError(f"No stage produces {artifact}")
+            if stage in order:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Stage cycle through {stage.name}")
+            visiting.add(stage.name)
+            for dependency in stage.inputs:
+                visit(dependency)
+            visiting.discard(stage.name)
+            order.append(stage)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def run(self, targets, artifacts, trace=None):
+        """
+        Runs the stages needed for `targets`. Returns (artifacts, timings)
+        where timings is {stage name: seconds} for the stages that ran.
+        With a JobTrace, every stage that runs is also recorded as a span.
+
+        A stage returning None for an output doesn't fail the graph; stages
+        depending on that output are skipped and their outputs are None too.
+        """
+        artifacts = dict(artifacts)
+        order = self.plan(targets, artifacts)
+        pruned = [stage.name for stage in self.stages if stage not in order]
+        if pruned:
+            logger.info(f"Pruned stages: {', '.join(pruned)}")
+
+        timings = {}
+        for stage in order:
+            args = [artifacts[name] for name in stage.inputs]
+            if any(arg is None for arg in args):
+                logger.warning(f"Skipping stage {stage.name}: missing input")
+                artifacts.update((name, None) for name in stage.outputs)
+                continue
+
+            start = time.perf_counter()
+            with trace.span(stage.name) if trace else nullcontext():
+                result = stage.run(*args)
+            timings[stage.name] = time.perf_counter() - start
+            logger.info(f"Stage {stage.name} took {timings[stage.name]:.2f}s")
+
+            if len(stage.outputs) == 1:
+                result = (result,)
+            artifacts.update(zip(stage.outputs, result))
+        return artifacts, timings
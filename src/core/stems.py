@@ -0,0 +1,49 @@
+# Output planning: which files a job produces and which model sources each
+# one is summed from. Planning happens before anything is materialised, so
+# stems a mode throws away are never mixed, encoded or written.
+#
+# Every mode is a grouping of the same raw model sources, so one separation
+# can serve all of them (see the source cache in splitter.separate_audio).
+
+# Sources summed into the "rhythm" output
+RHYTHM_SOURCES = ("drums", "bass")
+
+
+def plan_outputs(mode, stem_count, sources):
+    """
+    Returns {output name: [source names to sum]} in output order.
+    """
+    sources = list(sources)
+    rest = [s for s in sources if s != "vocals"]
+
+    if mode == "vocals_only":
+        return {"vocals": ["vocals"]}
+    if mode == "instrumental":
+        return {"no_vocals": rest}
+    if mode == "rhythm":
+        rhythm = [s for s in rest if s in RHYTHM_SOURCES]
+        return {"vocals": ["vocals"], "rhythm": rhythm, "melody": [s for s in rest if s not in rhythm]}
+    if stem_count == 2:
+        return {"vocals": ["vocals"], "no_vocals": rest}
+    return {source: [source] for source in sources}
+
+
+def mix_output(stems, parts):
+    """
+    Sums the given sources of `stems` (tensors or arrays).
+    A single source is returned as is, without a copy.
+    """
+    if len(parts) == 1:
+        return stems[parts[0]]
+    mixed = stems[parts[0]] + stems[parts[1]]
+    for part in parts[2:]:
+        mixed += stems[part]
+    return mixed
+
+
+def materialize(plan, stems):
+    """
+    Yields (output name, audio) for every planned output.
+    """
+    for name, parts in plan.items():
+        yield name, mix_output(stems, parts)
@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+import torch
+import soundfile as sf
+from demucs.audio import convert_audio
+
+from src.utils.logger import logger
+from src.core.stems import materialize
+from src.core.encoder import open_writer
+from src.core.trace import JobTrace
+
+# Inputs longer than this are separated window by window
+STREAMING_THRESHOLD_SECONDS = 20 * 60
+
+
+def should_stream(input_file, threshold=STREAMING_THRESHOLD_SECONDS):
+    try:
+        return sf.info(input_file).duration > threshold
+    except RuntimeError:
+        # Not readable by soundfile (e.g. an m4a that wasn't decoded first, see decode.py)
+        return False
+
+
+def track_statistics(input_file, blocksize):
+    """
+    Mean and std of the mono mix, read block by block. Demucs normalises
+    with whole-track statistics, every window has to use the same values.
+    """
+    total = 0.0
+    total_sq = 0.0
+    count = 0
+    with sf.SoundFile(input_file) as f:
+        for block in f.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1, dtype=np.float64)
+            total += mono.sum()
+            total_sq += np.square(mono).sum()
+            count += len(mono)
+    count = max(count, 1)
+    mean = total / count
+    std = math.sqrt(max(total_sq / count - mean * mean, 0.0))
+    return float(mean), std + 1e-8
+
+
+class StreamingSeparator:
+    """
+    Separates a file in overlapping windows read with SoundFile.blocks and
+    writes every planned output incrementally, so peak memory depends on
+    the window size and not on the track length.
+
+    Consecutive windows overlap by `overlap_seconds`; that region is
+    linearly cross-faded between the two windows' outputs before it is
+    written. Clipping is handled per sample (clamp), since the whole-track
+    rescale of the in-memory path needs the full output.
+    """
+    def __init__(self, engine, window_seconds=60.0, overlap_seconds=4.0):
+        self.engine = engine
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+
+    def window_frames(self, in_sr, out_sr):
+        # Window and overlap are multiples of this step so they map to a
+        # whole number of frames after resampling (no drift between windows)
+        step = in_sr // math.gcd(in_sr, out_sr)
+        window = max(2, round(self.window_seconds * in_sr / step)) * step
+        overlap = max(1, round(self.overlap_seconds * in_sr / step)) * step
+        overlap = max(step, min(overlap, window // 2 // step * step))
+        return window, overlap, overlap * out_sr // in_sr
+
+    def separate_file(self, input_file, plan, paths, progress=None, trace=None):
+        """
+        plan: {output name: [sources]} (see stems.plan_outputs)
+        paths: {output name: file path to write}
+        progress: ProgressTracker, advanced once per window
+        trace: JobTrace getting statistics/inference/encode spans
+        """
+        trace = trace or JobTrace()
+        model = self.engine.model
+        out_sr = model.samplerate
+        channels = model.audio_channels
+
+        info = sf.info(input_file)
+        in_sr = info.samplerate
+        window, overlap, overlap_out = self.window_frames(in_sr, out_sr)
+        stride = window - overlap
+        count = 1 + max(0, math.ceil((info.frames - window) / stride))
+
+        logger.info(f"Streaming separation: {count} windows of {window / in_sr:.0f}s")
+        with trace.span("statistics", info.duration):
+            mean, std = track_statistics(input_file, window)
+
+        fade = torch.linspace(0, 1, overlap_out)
+        writers = {name: open_writer(paths[name], out_sr, channels) for name in plan}
+        tails = {}
+        try:
+            with sf.SoundFile(input_file) as f:
+                blocks = f.blocks(blocksize=window, overlap=overlap, dtype="float32", always_2d=True)
+                for index, block in enumerate(blocks):
+                    logger.info(f"Separating window {index + 1}/{count}")
+                    last = index == count - 1
+
+                    with trace.span("inference", len(block) / in_sr, window=index):
+                        wav = convert_audio(torch.from_numpy(block).t(), in_sr, out_sr, channels)
+                        stems = self.engine.separate(wav, mean, std)
+                        del wav
+
+                    with trace.span("encode", len(block) / in_sr, window=index):
+                        for name, audio in materialize(plan, stems):
+                            audio = audio.cpu()
+                            if name in tails:
+                                # Cross-fade the region shared with the previous window
+                                head = audio[:, :overlap_out]
+                                audio = torch.cat([tails[name] * (1 - fade) + head * fade, audio[:, overlap_out:]],
+                                                  dim=1)
+                            if not last:
+                                tails[name] = audio[:, -overlap_out:].clone()
+                                audio = audio[:, :-overlap_out]
+                            writers[name].write(audio.clamp(-0.99, 0.99).t().numpy())
+                    del stems
+                    if progress:
+                        progress.update((index + 1) / count)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return paths
@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from src.utils.logger import logger
+from src.core.progress import memory_mb
+
+# Per-stage instrumentation. A JobTrace collects spans (decode, model load,
+# inference, ensemble, inversion, encoding, zipping, file moves...) from any
+# thread of the job, each with wall and CPU time, peak RSS and VRAM, and the
+# audio seconds it covered. separate_audio writes it as TRACE_FILE next to
+# the stems; chrome_trace() merges job traces into one chrome://tracing /
+# Perfetto file for a whole batch.
+
+TRACE_FILE = "stemlab_trace.json"
+
+# Memory of open spans is sampled this often
+SAMPLE_INTERVAL = 0.05
+
+
+def vram_mb():
+    """
+    CUDA memory allocated by this process in MB, or None without CUDA.
+    Never initializes CUDA (or imports torch) itself.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return None
+    return sum(torch.cuda.memory_allocated(i) for i in range(torch.cuda.device_count())) / (1024 * 1024)
+
+
+class MemorySampler:
+    """
+    Background thread sampling RSS and VRAM while any span is open, so each
+    span gets the peak it saw and not just its start and end values.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.spans = set()
+        self.thread = None
+
+    def watch(self, span):
+        with self.condition:
+            self.spans.add(span)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="trace-sampler", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def unwatch(self, span):
+        with self.condition:
+            self.spans.discard(span)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.spans:
+                    self.condition.wait()
+                spans = list(self.spans)
+            rss, vram = memory_mb(), vram_mb()
+            for span in spans:
+                span.sample(rss, vram)
+            time.sleep(self.interval)
+
+
+sampler = MemorySampler()
+
+
+class Span:
+    """
+    One timed stage. Times are seconds; start is wall-clock (epoch) so spans
+    from different processes line up. cpu is process CPU time, which
+    includes whatever else the process ran meanwhile (other jobs' threads).
+    """
+    def __init__(self, name, audio_seconds=None, args=None):
+        self.name = name
+        self.audio_seconds = audio_seconds
+        self.args = args or {}
+        self.thread = threading.get_ident()
+        self.peak_rss_mb = None
+        self.peak_vram_mb = None
+        self.start = time.time()
+        self.clock = time.perf_counter()
+        self.cpu_clock = time.process_time()
+        self.wall = None
+        self.cpu = None
+        self.sample(memory_mb(), vram_mb())
+
+    def sample(self, rss, vram):
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+        if vram is not None:
+            self.peak_vram_mb = max(self.peak_vram_mb or 0.0, vram)
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.clock
+        self.cpu = time.process_time() - self.cpu_clock
+        self.sample(memory_mb(), vram_mb())
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "wall": round(self.wall, 6),
+            "cpu": round(self.cpu, 6),
+            "thread": self.thread,
+        }
+        if self.peak_rss_mb is not None:
+            record["peak_rss_mb"] = round(self.peak_rss_mb, 1)
+        if self.peak_vram_mb is not None:
+            record["peak_vram_mb"] = round(self.peak_vram_mb, 1)
+        if self.audio_seconds:
+            record["audio_seconds"] = round(self.audio_seconds, 3)
+            record["rtf"] = round(self.wall / self.audio_seconds, 4)
+        if self.args:
+            record["args"] = self.args
+        return record
+
+
+class JobTrace:
+    """
+    Spans of one job. Thread-safe: encoder pool threads and the MDX thread
+    add their spans to the same trace. audio_seconds is the input length,
+    used for the job's real-time factor (wall / audio, below 1 is faster
+    than real time). stats holds job-level figures that aren't a stage
+    (e.g. the share of inference skipped as silence).
+    """
+    def __init__(self, job=None, audio_seconds=None):
+        self.job = job
+        self.audio_seconds = audio_seconds
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.spans = []
+        self.stats = {}
+        self.started = time.time()
+        self.clock = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, audio_seconds=None, **args):
+        span = Span(name, audio_seconds, args)
+        sampler.watch(span)
+        try:
+            yield span
+        finally:
+            sampler.unwatch(span)
+            span.finish()
+            with self.lock:
+                self.spans.append(span)
+
+    def wrap(self, name, fn, audio_seconds=None, **args):
+        """
+        fn wrapped to run inside a span, for work handed to other threads.
+        """
+        def traced(*a, **kw):
+            with self.span(name, audio_seconds, **args):
+                return fn(*a, **kw)
+        return traced
+
+    def stages(self):
+        """
+        Spans aggregated by name: {name: {count, wall, cpu, peak_rss_mb,
+        peak_vram_mb, audio_seconds, rtf}}, in order of first appearance.
+        """
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "wall": 0.0, "cpu": 0.0})
+            stage["count"] += 1
+            stage["wall"] += span.wall
+            stage["cpu"] += span.cpu
+            for key in ("peak_rss_mb", "peak_vram_mb"):
+                value = getattr(span, key)
+                if value is not None:
+                    stage[key] = max(stage.get(key, 0.0), value)
+            if span.audio_seconds:
+                stage["audio_seconds"] = stage.get("audio_seconds", 0.0) + span.audio_seconds
+        for stage in stages.values():
+            if stage.get("audio_seconds"):
+                stage["rtf"] = stage["wall"] / stage["audio_seconds"]
+            for key, value in stage.items():
+                if isinstance(value, float):
+                    stage[key] = round(value, 4)
+        return stages
+
+    def to_dict(self):
+        wall = time.perf_counter() - self.clock
+        with self.lock:
+            spans = [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)]
+        trace = {
+            "job": self.job,
+            "pid": self.pid,
+            "started": round(self.started, 6),
+            "wall": round(wall, 4),
+            "audio_seconds": self.audio_seconds,
+            "rtf": round(wall / self.audio_seconds, 4) if self.audio_seconds else None,
+            "stages": self.stages(),
+            "stats": dict(self.stats),
+            "spans": spans,
+        }
+        return trace
+
+    def describe(self):
+        return ", ".join(f"{name} {stage['wall']:.1f}s" for name, stage in self.stages().items())
+
+    def write(self, path):
+        """
+        Writes the trace as JSON; returns the dict. Failing to write it
+        never fails the job.
+        """
+        trace = self.to_dict()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace, f, indent=1)
+        except OSError as e:
+            logger.warning(f"Could not write trace {path}: {e}")
+        return trace
+
+
+def read_trace(path):
+    """
+    A trace written by JobTrace.write, or None if missing or unreadable.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def chrome_trace(traces):
+    """
+    Chrome trace ("Trace Event Format") for job trace dicts: one complete
+    event per span, grouped by process and thread, with the job name as
+    category and the span's figures as args.
+    """
+    events = []
+    for trace in traces:
+        pid = trace.get("pid", 0)
+        for span in trace.get("spans", []):
+            args = {key: span[key] for key in ("cpu", "peak_rss_mb", "peak_vram_mb", "audio_seconds", "rtf")
+                    if key in span}
+            args.update(span.get("args", {}))
+            args["job"] = trace.get("job")
+            events.append({
+                "name": span["name"],
+                "cat": os.path.basename(trace.get("job") or "job"),
+                "ph": "X",
+                "ts": round(span["start"] * 1e6),
+                "dur": round(span["wall"] * 1e6),
+                "pid": pid,
+                "tid": span.get("thread", 0),
+                "args": args,
+            })
+    for pid in sorted({trace.get("pid", 0) for trace in traces}):
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path, traces):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(traces), f)
@@ -0,0 +1,154 @@
+import os
+
+from src.utils.logger import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+# Rough working memory of one Demucs segment per second of audio it covers
+# (htdemucs: ~2.3 GB for its 7.8s segment). Override per machine if needed.
+ACTIVATION_MB_PER_SECOND = float(os.environ.get("STEMLAB_ACTIVATION_MB_PER_S", 300))
+
+# Never plan with more than this share of the free memory
+HEADROOM = 0.8
+
+# Shortest segment worth running; below this the overlap dominates
+MIN_SEGMENT = 2.0
+
+# Streaming windows: at least this long, and at most this many segments
+MIN_WINDOW = 30.0
+MAX_WINDOW = 600.0
+
+# Segments separated in parallel on the CPU
+MAX_CPU_WORKERS = 4
+
+
+class Settings:
+    """
+    What the tuner decided for one run. window is None for an in-memory
+    run, otherwise the streaming window in seconds.
+    """
+    def __init__(self, segment, overlap, workers, window, budget_mb):
+        self.segment = segment
+        self.overlap = overlap
+        self.workers = workers
+        self.window = window
+        self.budget_mb = budget_mb
+
+    def describe(self):
+        mode = f"streaming {self.window:.0f}s windows" if self.window else "in memory"
+        return (f"segment {self.segment:.1f}s, overlap {self.overlap:.2f}, {self.workers} worker(s), {mode} "
+                f"(budget {self.budget_mb:.0f} MB)")
+
+
+def available_memory_mb(device="cpu"):
+    """
+    Free memory on `device` in MB, or None if we can't tell.
+    """
+    if str(device).startswith("cuda"):
+        import torch
+        free, _ = torch.cuda.mem_get_info(torch.device(device))
+        return free / MB
+    if psutil:
+        return psutil.virtual_memory().available / MB
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / MB
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def track_mb_per_second(samplerate, channels, sources):
+    """
+    Memory an in-memory run holds per second of track: the input, and the
+    output accumulator plus the finished copy for every source (float32).
+    """
+    return samplerate * channels * 4 * (1 + 2 * sources) / MB
+
+
+def model_segment(model):
+    """
+    Longest segment (seconds) every model of a bag accepts.
+    """
+    models = getattr(model, "models", [model])
+    segments = [float(m.segment) for m in models if getattr(m, "segment", None)]
+    return min(segments) if segments else 7.8
+
+
+def pads_segments(model):
+    """
+    HTDemucs pads every segment to its training length, so shorter
+    segments cost more time without saving any memory.
+    """
+    return any(getattr(m, "use_train_segment", False) for m in getattr(model, "models", [model]))
+
+
+def plan_settings(budget_mb, weights_mb, model_segment, base_overlap, duration, samplerate, channels, sources,
+                  device="cpu", threads=1, fixed_segment=False):
+    """
+    Picks Demucs settings that fit `budget_mb`:
+      - segment: the model's own length if an activation of that size
+        takes at most half the budget, shorter otherwise (down to
+        MIN_SEGMENT) unless fixed_segment;
+      - overlap: base_overlap of the model segment, kept the same in
+        seconds when the segment shrinks so the seams don't get shorter;
+      - workers: segments run in parallel on the CPU while memory and
+        threads allow (GPUs run one at a time);
+      - window: streaming window when the whole track's buffers don't fit.
+    duration may be None (unknown length): the track is assumed to fit.
+    """
+    room = max(0.0, budget_mb - weights_mb)
+    segment = model_segment
+    if not fixed_segment and segment * ACTIVATION_MB_PER_SECOND > room / 2:
+        segment = max(MIN_SEGMENT, min(model_segment, room / 2 / ACTIVATION_MB_PER_SECOND))
+    overlap = min(0.5, base_overlap * model_segment / segment)
+    activation = segment * ACTIVATION_MB_PER_SECOND
+
+    per_second = track_mb_per_second(samplerate, channels, sources)
+    workers = 1
+    if not str(device).startswith("cuda"):
+        spare = room - activation - (duration or 0) * per_second
+        workers = int(max(1, min(MAX_CPU_WORKERS, threads // 2, 1 + spare // activation)))
+
+    window = None
+    if duration and duration * per_second > room - activation * workers:
+        window = (room - activation * workers) / per_second
+        window = min(MAX_WINDOW, max(MIN_WINDOW, window))
+        if window >= duration:
+            window = None
+    return Settings(segment, overlap, workers, window, budget_mb)
+
+
+def slot_budget_mb(device="cpu", share=1):
+    """
+    What one of `share` jobs sharing `device`'s memory may plan with: its
+    part of the usable free memory, or None if we can't tell.
+    """
+    free = available_memory_mb(device)
+    if free is None:
+        return None
+    return free * HEADROOM / max(1, share)
+
+
+def autotune(engine, duration, base_overlap, max_memory_mb=None):
+    """
+    Settings for running `engine` on a track of `duration` seconds, from
+    the free memory of its device (or max_memory_mb, whichever is lower)
+    and the loaded model's footprint.
+    """
+    from src.core.model_cache import module_size
+    import torch
+
+    model = engine.model
+    free = available_memory_mb(engine.device)
+    budget = (free or max_memory_mb or 4096) * HEADROOM
+    if max_memory_mb:
+        budget = min(budget, max_memory_mb)
+    settings = plan_settings(budget, module_size(model) / MB, model_segment(model), base_overlap, duration,
+                             model.samplerate, model.audio_channels, len(model.sources),
+                             engine.device, torch.get_num_threads(), pads_segments(model))
+    logger.info(f"Auto-tuned: {settings.describe()}")
+    return settings
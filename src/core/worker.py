@@ -0,0 +1,148 @@
+import os
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from src.utils.logger import logger
+from src.core.daemon import DaemonClient
+from src.core.gpu_utils import get_gpu_info
+from src.core.scheduler import JobScheduler
+from src.core.progress import LatestValue
+
+# Status text for each progress stage
+STAGE_LABELS = {
+    "loading": "Loading Models...",
+    "separating": "Separating",
+    "vocals": "Cleaning Vocals...",
+    "encoding": "Encoding...",
+}
+
+def describe_progress(event):
+    """
+    (percent, status text) for a progress event.
+    """
+    status = STAGE_LABELS.get(event["stage"], event["stage"])
+    if event["stage"] == "separating":
+        status += f": {int(event['fraction'] * 100)}%"
+        if "eta" in event:
+            status += f" ({event['eta']:.0f}s left)"
+    return int(event["fraction"] * 100), status
+
+
+class SplitterWorker(QThread):
+    """
+    Runs one queue item on a worker daemon. Coarse state changes are
+    signals; the stream of progress events only updates `progress`, which
+    the main window polls from a timer (see poll_progress).
+
+    separated is emitted once the models are done and only encoding is
+    left: the daemon can take the next job while this one finishes.
+    """
+    progress_updated = pyqtSignal(str, int, str) # filename, progress, status
+    separated = pyqtSignal(str) # filename
+    finished = pyqtSignal(str) # filename
+    error_occurred = pyqtSignal(str, str) # filename, error message
+
+    def __init__(self, file_path, options, daemon=None):
+        super().__init__()
+        self.file_path = file_path
+        self.options = options
+        # Shared warm worker; if none is given we spin up a private one
+        self.daemon = daemon
+        self.owns_daemon = daemon is None
+        self.is_cancelled = False
+        self.is_separated = False
+        self.job_id = None
+        self.progress = LatestValue()
+
+    def run(self):
+        filename = os.path.basename(self.file_path)
+        logger.info(f"Starting processing for {filename} with options: {self.options}")
+        
+        try:
+            base_name = os.path.splitext(filename)[0]
+            output_dir = os.path.join(os.path.dirname(self.file_path), f"{base_name} - Stems")
+            
+            config = {
+                "input_file": self.file_path,
+                "output_dir": output_dir,
+                "stem_count": self.options["stem_count"],
+                "quality": self.options["quality"],
+                "export_zip": self.options["export_zip"],
+                "keep_original": self.options["keep_original"],
+                "export_mp3": self.options.get("export_mp3", False),
+                "mode": self.options.get("mode", "standard"),
+                "dereverb": self.options.get("dereverb", False)
+            }
+            
+            if self.daemon is None:
+                self.daemon = DaemonClient()
+            
+            if self.daemon.is_alive():
+                self.progress_updated.emit(filename, 0, "Loading Models...")
+            else:
+                self.progress_updated.emit(filename, 0, "Starting Worker...")
+            
+            try:
+                self.daemon.run_job(config, on_line=self.handle_line, on_progress=self.progress.put,
+                                    on_separated=lambda: self.separated.emit(filename),
+                                    on_started=self.job_started)
+            finally:
+                if self.owns_daemon:
+                    self.daemon.stop()
+            
+            if self.is_cancelled:
+                return
+            
+            self.progress_updated.emit(filename, 100, "Done")
+            self.finished.emit(filename)
+            
+        except Exception as e:
+            if not self.is_cancelled:
+                logger.error(f"Error processing {filename}: {e}")
+                self.error_occurred.emit(filename, str(e))
+
+    def job_started(self, job_id):
+        self.job_id = job_id
+        if self.is_cancelled:
+            # terminate() came before there was a job to cancel
+            self.daemon.cancel(job_id)
+
+    def handle_line(self, line):
+        logger.info(f"[Worker] {line}")
+
+    def poll_progress(self):
+        """
+        Newest progress as (percent, status), or None if nothing new
+        arrived since the last poll. Called from the UI thread.
+        """
+        event = self.progress.take()
+        return describe_progress(event) if event else None
+
+    def terminate(self):
+        self.is_cancelled = True
+        if self.daemon and self.job_id is not None:
+            # Another job may be encoding on the same daemon, only stop ours
+            self.daemon.cancel(self.job_id)
+        # Do NOT call super().terminate() - let the thread exit naturally
+
+
+class HardwareProbe(QThread):
+    """
+    Startup work that needs torch: detecting the GPU (initializes CUDA)
+    and sizing the job scheduler. Emits ready(gpu_info, scheduler), then
+    starts the first worker daemon so the first job finds it warm.
+    """
+    ready = pyqtSignal(object, object) # (is_gpu, device_name), JobScheduler
+
+    def run(self):
+        try:
+            gpu_info = get_gpu_info()
+        except Exception as e:
+            logger.error(f"GPU detection failed: {e}")
+            gpu_info = (False, "CPU")
+        scheduler = JobScheduler()
+        self.ready.emit(gpu_info, scheduler)
+        try:
+            scheduler.daemons[0].warm_up()
+        except Exception as e:
+            # The first job will try again
+            logger.warning(f"Could not pre-start worker daemon: {e}")
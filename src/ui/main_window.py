@@ -4,36 +4,49 @@ from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QListWidget, QListWidgetItem, QFileDialog,
     QGroupBox, QRadioButton, QCheckBox, QSlider, QLabel,
-    QDialog, QTextEdit, QStyle
+    QDialog, QPlainTextEdit, QStyle
 )
-from PyQt6.QtCore import Qt, QObject, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer
 from .style import STYLESHEET, COLORS, apply_theme
 from .widgets import DragDropWidget, QueueItemWidget
-from src.core.splitter import SplitterWorker
-from src.core.gpu_utils import get_gpu_info
+from src.core.worker import SplitterWorker, HardwareProbe
+from src.utils.logger import logger
+from src.utils.log_buffer import LogBuffer, MAX_LINES, default_log_file
+
+# Progress bars are refreshed from the workers' latest events at this interval
+PROGRESS_INTERVAL_MS = 100
+
+# New log lines are moved into the log window at this interval
+LOG_FLUSH_INTERVAL_MS = 100
 
 # Log Window
 class LogWindow(QDialog):
-    def __init__(self, parent=None):
+    """
+    Shows the tail of the log buffer. Lines are appended in batches by
+    flush(); while the window is hidden nothing is rendered and the
+    buffer's history is loaded when it is shown.
+    """
+    def __init__(self, buffer, parent=None):
         super().__init__(parent)
+        self.buffer = buffer
         self.setWindowTitle("Process Logs")
         self.resize(600, 400)
         layout = QVBoxLayout(self)
-        self.text_edit = QTextEdit()
+        self.text_edit = QPlainTextEdit()
         self.text_edit.setReadOnly(True)
+        self.text_edit.setMaximumBlockCount(MAX_LINES)
         self.text_edit.setStyleSheet(f"background-color: {COLORS['background']}; color: {COLORS['text']}; font-family: Consolas, monospace;")
         layout.addWidget(self.text_edit)
 
-class LogEmitter(QObject):
-    text_written = pyqtSignal(str)
+    def showEvent(self, event):
+        self.text_edit.setPlainText("\n".join(self.buffer.snapshot()))
+        self.text_edit.moveCursor(self.text_edit.textCursor().MoveOperation.End)
+        super().showEvent(event)
 
-class StreamRedirector:
-    def __init__(self, emitter):
-        self.emitter = emitter
-    def write(self, text):
-        self.emitter.text_written.emit(text)
     def flush(self):
-        pass
+        lines = self.buffer.drain()
+        if lines and self.isVisible():
+            self.text_edit.appendPlainText("\n".join(lines))
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -41,13 +54,34 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("StemLab v1.0")
         self.resize(1000, 700)
         
-        # Setup Logging
-        self.log_emitter = LogEmitter()
-        self.log_emitter.text_written.connect(self.append_log)
-        sys.stdout = StreamRedirector(self.log_emitter)
-        sys.stderr = StreamRedirector(self.log_emitter)
-        
-        self.log_window = LogWindow(self)
+        # Setup Logging: print output and log records go to a bounded
+        # buffer that the log window drains on a timer
+        self.log_buffer = LogBuffer(path=default_log_file())
+        sys.stdout = self.log_buffer
+        sys.stderr = self.log_buffer
+        formatter = logger.handlers[0].formatter if logger.handlers else None
+        self.log_handler = self.log_buffer.handler(formatter)
+        logger.addHandler(self.log_handler)
+        
+        self.log_window = LogWindow(self.log_buffer, self)
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.log_window.flush)
+        self.log_timer.start(LOG_FLUSH_INTERVAL_MS)
+        
+        # Warm worker processes (one per concurrent job slot), reused for the
+        # rest of the session so models stay loaded. Sizing the slots needs
+        # torch, so the scheduler arrives from a background probe; jobs
+        # queued before that start as soon as it does.
+        self.scheduler = None
+        self.start_requested = False
+        self.workers = {} # id(queue item) -> running SplitterWorker
+        self.probe = HardwareProbe(self)
+        self.probe.ready.connect(self.on_hardware_ready)
+        
+        # One batched UI update per tick, however fast the workers report
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        self.progress_timer.start(PROGRESS_INTERVAL_MS)
         
         # Central Widget
         central = QWidget()
@@ -61,6 +95,10 @@ class MainWindow(QMainWindow):
         
         # Initial State
         self.slider_quality.setValue(1)
+        
+        # Once the event loop runs, i.e. after the window is up: importing
+        # torch holds the GIL for long stretches
+        QTimer.singleShot(0, self.probe.start)
 
     def setup_ui(self):
         # Left Panel (Controls)
@@ -85,15 +123,7 @@ class MainWindow(QMainWindow):
         self.gpu_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.gpu_label.setStyleSheet(f"color: {COLORS['text_dim']}; font-size: 12px; margin-bottom: 10px;")
         left_layout.addWidget(self.gpu_label)
-        
-        # Update GPU info
-        is_gpu, device_name = get_gpu_info()
-        if is_gpu:
-            self.gpu_label.setText(f"{device_name} • Ready")
-            self.gpu_label.setStyleSheet(f"color: {COLORS['success']}; font-size: 12px; margin-bottom: 10px; font-weight: bold;")
-        else:
-            self.gpu_label.setText("CPU Mode (Slower)")
-            self.gpu_label.setStyleSheet(f"color: {COLORS['text_dim']}; font-size: 12px; margin-bottom: 10px;")
+        # Filled in by on_hardware_ready
 
         # Stem Options
         stem_group = QGroupBox("STEM OPTIONS")
@@ -104,6 +134,7 @@ class MainWindow(QMainWindow):
         self.radio_6stem = QRadioButton("6-Stem (Full Band)")
         self.radio_vocals = QRadioButton("Vocals Only (Ultra Clean)")
         self.radio_inst = QRadioButton("Instrumental / Karaoke")
+        self.radio_rhythm = QRadioButton("Rhythm Split (Vocals / Drums+Bass / Melody)")
         
         # Set default
         self.radio_2stem.setChecked(True)
@@ -113,6 +144,7 @@ class MainWindow(QMainWindow):
         stem_layout.addWidget(self.radio_6stem)
         stem_layout.addWidget(self.radio_vocals)
         stem_layout.addWidget(self.radio_inst)
+        stem_layout.addWidget(self.radio_rhythm)
         
         # Advanced Toggle
         self.chk_dereverb = QCheckBox("De-Reverb + De-Echo (Experimental)")
@@ -204,10 +236,37 @@ class MainWindow(QMainWindow):
         
         self.main_layout.addWidget(right_panel)
 
-    def append_log(self, text):
-        self.log_window.text_edit.moveCursor(self.log_window.text_edit.textCursor().MoveOperation.End)
-        self.log_window.text_edit.insertPlainText(text)
-        self.log_window.text_edit.moveCursor(self.log_window.text_edit.textCursor().MoveOperation.End)
+    def on_hardware_ready(self, gpu_info, scheduler):
+        is_gpu, device_name = gpu_info
+        if is_gpu:
+            self.gpu_label.setText(f"{device_name} • Ready")
+            self.gpu_label.setStyleSheet(f"color: {COLORS['success']}; font-size: 12px; margin-bottom: 10px; font-weight: bold;")
+        else:
+            self.gpu_label.setText("CPU Mode (Slower)")
+            self.gpu_label.setStyleSheet(f"color: {COLORS['text_dim']}; font-size: 12px; margin-bottom: 10px;")
+        self.scheduler = scheduler
+        if self.start_requested:
+            self.start_processing()
+
+    def closeEvent(self, event):
+        # The probe may still be starting the first daemon
+        self.probe.wait()
+        if self.scheduler:
+            self.scheduler.stop()
+        logger.removeHandler(self.log_handler)
+        self.log_buffer.close()
+        super().closeEvent(event)
+
+    def refresh_progress(self):
+        if not self.workers:
+            return
+        for i in range(self.queue_list.count()):
+            item = self.queue_list.item(i)
+            worker = self.workers.get(id(item))
+            update = worker.poll_progress() if worker else None
+            if update:
+                value, status = update
+                self.queue_list.itemWidget(item).update_progress(None, value, status)
 
     def update_quality_label(self, value):
         labels = ["Fast (CPU)", "Balanced (GPU Auto)", "Best (Ensemble)"]
@@ -244,34 +303,38 @@ class MainWindow(QMainWindow):
 
     def remove_queue_item(self, item):
         # Check if this item is currently being processed
-        if hasattr(self, 'worker') and self.worker.isRunning():
+        worker = self.workers.get(id(item))
+        running = worker is not None and worker.isRunning()
+        if running:
             widget = self.queue_list.itemWidget(item)
-            # Simple check: if status is not Pending/Done/Error, it's likely processing
-            status = widget.status_label.text()
-            if "Pending" not in status and "Done" not in status and "Error" not in status and "Cancelled" not in status:
-                from src.utils.logger import logger
-                logger.info("Terminating active process...")
-                
-                # Terminate worker (kills subprocess)
-                self.worker.terminate()
-                self.worker.wait()
-                widget.update_progress(None, 0, "Cancelled")
-                
-                # Cleanup partially created files
-                file_path = item.data(Qt.ItemDataRole.UserRole)
-                base_name = os.path.splitext(os.path.basename(file_path))[0]
-                output_dir = os.path.join(os.path.dirname(file_path), f"{base_name} - Stems")
-                
-                if os.path.exists(output_dir):
-                    import shutil
-                    try:
-                        shutil.rmtree(output_dir)
-                        logger.info(f"Cleaned up output directory: {output_dir}")
-                    except Exception as e:
-                        logger.error(f"Failed to clean up output directory: {e}")
+            from src.utils.logger import logger
+            logger.info("Terminating active process...")
+            
+            # Cancel the worker's job (a daemon with no other job is killed)
+            worker.terminate()
+            worker.wait()
+            self.release_worker(item)
+            widget.update_progress(None, 0, "Cancelled")
+            
+            # Cleanup partially created files
+            file_path = item.data(Qt.ItemDataRole.UserRole)
+            base_name = os.path.splitext(os.path.basename(file_path))[0]
+            output_dir = os.path.join(os.path.dirname(file_path), f"{base_name} - Stems")
+            
+            if os.path.exists(output_dir):
+                import shutil
+                try:
+                    shutil.rmtree(output_dir)
+                    logger.info(f"Cleaned up output directory: {output_dir}")
+                except Exception as e:
+                    logger.error(f"Failed to clean up output directory: {e}")
         
         row = self.queue_list.row(item)
         self.queue_list.takeItem(row)
+        
+        if running:
+            # The freed slot can take the next pending file
+            self.start_processing()
 
     def open_item_folder(self, item):
         import subprocess
@@ -286,17 +349,40 @@ class MainWindow(QMainWindow):
             os.startfile(os.path.dirname(file_path))
 
     def start_processing(self):
-        if hasattr(self, 'worker') and self.worker.isRunning():
+        if self.scheduler is None:
+            # Still probing the hardware, on_hardware_ready calls us again
+            self.start_requested = True
             return
-
-        # Find first pending item
+        # Fill every free slot with the next pending items
         for i in range(self.queue_list.count()):
+            if not self.scheduler.has_free_slot():
+                return
+            
             item = self.queue_list.item(i)
             widget = self.queue_list.itemWidget(item)
             
-            if widget.status_label.text() == "Pending":
+            if widget.status_label.text() == "Pending" and id(item) not in self.workers:
                 self.process_item(item)
-                return
+
+    def release_worker(self, item):
+        worker = self.workers.pop(id(item), None)
+        if worker:
+            self.release_daemon(worker.daemon)
+
+    def release_daemon(self, daemon):
+        # Like scheduler.run_batch: a daemon takes the next job once its
+        # newest one is separated, but never a third while an older one is
+        # still encoding
+        running = [worker for worker in self.workers.values() if worker.daemon is daemon]
+        if len(running) <= 1 and all(worker.is_separated for worker in running):
+            self.scheduler.release(daemon)
+
+    def on_worker_separated(self, item):
+        worker = self.workers.get(id(item))
+        if worker:
+            worker.is_separated = True
+            self.release_daemon(worker.daemon)
+            self.start_processing()
 
     def process_item(self, item):
         widget = self.queue_list.itemWidget(item)
@@ -304,7 +390,7 @@ class MainWindow(QMainWindow):
         
         # Determine Stem Mode
         stem_count = 4
-        mode = "standard" # standard, vocals_only, instrumental, remix_pack
+        mode = "standard" # standard, vocals_only, instrumental, rhythm, remix_pack
         
         if self.radio_6stem.isChecked():
             stem_count = 6
@@ -316,6 +402,8 @@ class MainWindow(QMainWindow):
         elif self.radio_inst.isChecked():
             stem_count = 2
             mode = "instrumental"
+        elif self.radio_rhythm.isChecked():
+            mode = "rhythm"
 
         options = {
             "stem_count": stem_count,
@@ -327,13 +415,21 @@ class MainWindow(QMainWindow):
             "dereverb": self.chk_dereverb.isChecked()
         }
         
-        self.worker = SplitterWorker(file_path, options)
-        self.worker.progress_updated.connect(widget.update_progress)
-        self.worker.finished.connect(lambda _: self.on_worker_finished(item))
-        self.worker.error_occurred.connect(lambda f, e: self.on_worker_error(item, e))
-        self.worker.start()
+        daemon = self.scheduler.acquire()
+        if daemon is None:
+            return
+        
+        worker = SplitterWorker(file_path, options, daemon=daemon)
+        self.workers[id(item)] = worker
+        worker.progress_updated.connect(widget.update_progress)
+        worker.separated.connect(lambda _: self.on_worker_separated(item))
+        worker.finished.connect(lambda _: self.on_worker_finished(item))
+        worker.error_occurred.connect(lambda f, e: self.on_worker_error(item, e))
+        worker.start()
 
     def on_worker_finished(self, item):
+        self.release_worker(item)
+        
         import winsound
         import glob
         
@@ -364,6 +460,7 @@ class MainWindow(QMainWindow):
         self.start_processing()
 
     def on_worker_error(self, item, error):
+        self.release_worker(item)
         widget = self.queue_list.itemWidget(item)
         widget.status_label.setText(f"Error: {error}")
         widget.status_label.setStyleSheet(f"color: {COLORS['danger']};")
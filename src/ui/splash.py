@@ -37,7 +37,20 @@ class SplashScreen(QSplashScreen):
         # Add Progress Bar (Overlay widget)
         # QSplashScreen doesn't support layouts easily, so we just draw or use a child widget
         # But child widgets on splash screens can be tricky.
-        # Let's just use the showMessage method for text.
+        # Let's just use the showMessage method for text, and paint a thin
+        # progress bar along the bottom edge (see drawContents).
+        self.progress = None
 
-    def show_message(self, message):
+    def show_message(self, message, progress=None):
+        """
+        progress (0-100) is the share of startup that is done.
+        """
+        self.progress = progress
         self.showMessage(message, Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignCenter, QColor(COLORS['secondary']))
+
+    def drawContents(self, painter):
+        super().drawContents(painter)
+        if self.progress is not None:
+            rect = self.rect()
+            width = int(rect.width() * min(100, max(0, self.progress)) / 100)
+            painter.fillRect(0, rect.height() - 4, width, 4, QColor(COLORS['primary']))
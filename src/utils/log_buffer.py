@@ -0,0 +1,102 @@
+import os
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# Lines kept for the log window; older ones are dropped
+MAX_LINES = 5000
+
+# Optional log file (set STEMLAB_LOG_FILE), rotated at this size
+LOG_FILE_ENV = "STEMLAB_LOG_FILE"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+class LogBuffer:
+    """
+    Bounded, thread-safe log sink for the GUI. It is file-like, so it can
+    replace sys.stdout/sys.stderr, and handler() feeds it logging records.
+    Text is split into lines (\\r too, for tqdm) and kept in a ring buffer of
+    max_lines; the view takes new lines with drain() on a timer instead
+    of being signalled for every write. With a path, every line also goes
+    to a rotating log file.
+    """
+    def __init__(self, max_lines=MAX_LINES, path=None, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+        self.lock = threading.Lock()
+        self.lines = deque(maxlen=max_lines)
+        # Not yet shown; bounded too, a hidden view just loses the oldest
+        self.pending = deque(maxlen=max_lines)
+        self.partial = ""
+        self.file = None
+        if path:
+            self.file = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            self.file.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, text):
+        with self.lock:
+            parts = (self.partial + text).replace("\r", "\n").split("\n")
+            self.partial = parts.pop()
+            for line in parts:
+                self.add(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def add(self, line):
+        line = line.rstrip()
+        if not line:
+            return
+        self.lines.append(line)
+        self.pending.append(line)
+        if self.file:
+            self.file.emit(logging.makeLogRecord({"msg": line}))
+
+    def append(self, line):
+        with self.lock:
+            self.add(line)
+
+    def drain(self):
+        """
+        Lines added since the last drain().
+        """
+        with self.lock:
+            lines = list(self.pending)
+            self.pending.clear()
+        return lines
+
+    def snapshot(self):
+        """
+        Everything still in the ring buffer, oldest first.
+        """
+        with self.lock:
+            self.pending.clear()
+            return list(self.lines)
+
+    def handler(self, formatter=None):
+        return LogBufferHandler(self, formatter)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class LogBufferHandler(logging.Handler):
+    def __init__(self, buffer, formatter=None):
+        super().__init__()
+        self.buffer = buffer
+        if formatter:
+            self.setFormatter(formatter)
+
+    def emit(self, record):
+        try:
+            for line in self.format(record).splitlines():
+                self.buffer.append(line)
+        except Exception:
+            self.handleError(record)
+
+
+def default_log_file():
+    return os.environ.get(LOG_FILE_ENV) or None
@@ -0,0 +1,68 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.core.archive import ZipSink, choose_compression
+from src.core.encoder import EncoderPool
+
+
+def write_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_compression_per_entry(tmp_path):
+    noise = np.random.default_rng(0).integers(0, 256, 2 * 1024 * 1024, dtype=np.uint8).tobytes()
+    assert choose_compression(write_bytes(tmp_path / "noise.wav", noise))[0] == zipfile.ZIP_STORED
+    assert choose_compression(write_bytes(tmp_path / "quiet.wav", bytes(2 * 1024 * 1024)))[0] == zipfile.ZIP_DEFLATED
+    # Compressed formats aren't even sampled
+    assert choose_compression(write_bytes(tmp_path / "quiet.mp3", bytes(1024)))[0] == zipfile.ZIP_STORED
+
+
+def test_files_are_added_as_they_finish(tmp_path):
+    sink = ZipSink(str(tmp_path / "stems.zip"))
+    with ThreadPoolExecutor(2) as pool:
+        for name in ("vocals.wav", "drums.wav"):
+            path = str(tmp_path / name)
+            sink.add_when_done(pool.submit(write_bytes, path, name.encode() * 1000), path)
+        failed = pool.submit(lambda: 1 / 0)
+        sink.add_when_done(failed, str(tmp_path / "missing.wav"))
+    sink.add(str(tmp_path / "vocals.wav")) # duplicates are skipped
+    sink.close()
+
+    with zipfile.ZipFile(tmp_path / "stems.zip") as archive:
+        assert sorted(archive.namelist()) == ["drums.wav", "vocals.wav"]
+        assert archive.read("vocals.wav") == b"vocals.wav" * 1000
+    assert not os.path.exists(tmp_path / "stems.zip.part")
+
+
+def test_abort_leaves_no_archive(tmp_path):
+    sink = ZipSink(str(tmp_path / "stems.zip"))
+    sink.add(write_bytes(tmp_path / "vocals.wav", b"x" * 100))
+    sink.abort()
+    assert os.listdir(tmp_path) == ["vocals.wav"]
+
+
+def test_close_after_wait_all_has_every_entry(tmp_path):
+    # Done callbacks run after wait_all() has returned: hold them back with a
+    # slow callback registered first
+    sink = ZipSink(str(tmp_path / "stems.zip"))
+    names = ("vocals.wav", "drums.wav", "bass.wav", "other.wav")
+    futures = []
+    with ThreadPoolExecutor(2) as pool:
+        for name in names:
+            path = str(tmp_path / name)
+            future = pool.submit(write_bytes, path, name.encode() * 1000)
+            future.add_done_callback(lambda future: time.sleep(0.3))
+            sink.add_when_done(future, path)
+            futures.append(future)
+        EncoderPool.wait_all(futures)
+        sink.close()
+
+    with zipfile.ZipFile(tmp_path / "stems.zip") as archive:
+        assert sorted(archive.namelist()) == sorted(names)
+
@@ -0,0 +1,86 @@
+import os
+import json
+
+from src.cli import BatchState, build_parser, build_config, collect_inputs, model_cache_totals, output_dir_for
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_collect_inputs_walks_folders_and_manifests(tmp_path):
+    touch(tmp_path / "in" / "a.wav")
+    touch(tmp_path / "in" / "sub" / "b.mp3")
+    touch(tmp_path / "in" / "notes.txt")
+    touch(tmp_path / "in" / "a - Stems" / "vocals.wav")
+    manifest = tmp_path / "list.json"
+    manifest.write_text(json.dumps(["in/a.wav", {"input": "in/sub/b.mp3", "quality": 2}]))
+
+    found = [os.path.relpath(e["input"], tmp_path) for e in collect_inputs([str(tmp_path / "in")])]
+    assert found == [os.path.join("in", "a.wav"), os.path.join("in", "sub", "b.mp3")]
+
+    flat = collect_inputs([str(tmp_path / "in")], recursive=False)
+    assert [os.path.basename(e["input"]) for e in flat] == ["a.wav"]
+
+    # Duplicates across targets are dropped, manifest overrides are kept
+    entries = collect_inputs([str(manifest), str(tmp_path / "in" / "*.wav")])
+    assert len(entries) == 2
+    assert entries[1]["quality"] == 2
+
+
+def test_output_dir_mirrors_sub_folders(tmp_path):
+    root = str(tmp_path / "in")
+    track = os.path.join(root, "sub", "b.mp3")
+    assert output_dir_for(track) == os.path.join(root, "sub", "b - Stems")
+    assert output_dir_for(track, "/out", root) == os.path.join(os.path.normpath("/out/sub"), "b - Stems")
+
+
+def test_globbed_files_with_equal_names_get_their_own_folders(tmp_path):
+    touch(tmp_path / "in" / "live" / "song.wav")
+    touch(tmp_path / "in" / "studio" / "song.wav")
+    args = build_parser().parse_args(["batch", str(tmp_path / "in" / "*" / "song.wav"), "-o", str(tmp_path / "out")])
+    folders = [build_config(entry, args)["output_dir"] for entry in collect_inputs(args.inputs)]
+    assert folders == [str(tmp_path / "out" / "live" / "song - Stems"),
+                       str(tmp_path / "out" / "studio" / "song - Stems")]
+
+    # A single file goes straight under -o
+    args = build_parser().parse_args(["batch", str(tmp_path / "in" / "live" / "song.wav"), "-o", str(tmp_path / "out")])
+    [entry] = collect_inputs(args.inputs)
+    assert build_config(entry, args)["output_dir"] == str(tmp_path / "out" / "song - Stems")
+
+
+def test_resume_skips_only_matching_finished_jobs(tmp_path):
+    touch(tmp_path / "a.wav")
+    state_file = str(tmp_path / "state.jsonl")
+    args = build_parser().parse_args(["batch", str(tmp_path), "--state", state_file])
+    config = build_config(collect_inputs([str(tmp_path)])[0], args)
+    os.makedirs(config["output_dir"])
+
+    state = BatchState(state_file)
+    state.record(config, {"status": "ok", "seconds": 1.0})
+    state.close()
+
+    resumed = BatchState(state_file, resume=True)
+    assert resumed.is_done(config)
+    assert not resumed.is_done(dict(config, quality=2))
+    resumed.close()
+
+    # Without --resume the journal starts over
+    assert not BatchState(state_file).is_done(config)
+
+
+class StatsDaemon:
+    def __init__(self, stats):
+        self.reply = stats
+
+    def stats(self):
+        return self.reply
+
+
+def test_model_cache_totals_add_up_running_daemons():
+    daemons = [StatsDaemon({"hits": 3, "misses": 1, "evictions": 0, "models": []}),
+               StatsDaemon({"hits": 2, "misses": 2, "evictions": 1, "models": []}),
+               StatsDaemon(None)] # not running
+    assert model_cache_totals(daemons) == {"hits": 5, "misses": 3, "evictions": 1}
+
@@ -0,0 +1,157 @@
+import sys
+import time
+import threading
+from multiprocessing import Pipe
+
+import pytest
+
+from src.core.daemon import DaemonClient, DaemonError, OutputRouter, WorkerDaemon
+from src.core.progress import ProgressTracker
+
+
+class RunningProcess:
+    # Stands in for the daemon's Popen while it is served from a thread
+    def __init__(self):
+        self.killed = False
+
+    def poll(self):
+        return 1 if self.killed else None
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self, timeout=None):
+        return 1
+
+
+def in_process_client(separate_audio, monkeypatch):
+    """
+    A DaemonClient talking to a WorkerDaemon on a thread of this process,
+    with separate_audio standing in for the real pipeline.
+    """
+    client_conn, daemon_conn = Pipe()
+    daemon = WorkerDaemon(daemon_conn)
+    daemon.separate_audio = separate_audio
+    daemon.router = OutputRouter(sys.__stderr__)
+    monkeypatch.setattr(sys, "stdout", daemon.router)
+    threading.Thread(target=daemon.receive, daemon=True).start()
+
+    client = DaemonClient()
+    client.process = RunningProcess()
+    client.conn = client_conn
+    threading.Thread(target=client._read_messages, args=(client.conn, client.jobs, client.replies),
+                     daemon=True).start()
+    return client
+
+
+def config(name):
+    return {"input_file": name, "output_dir": name, "stem_count": 4, "quality": 1,
+            "export_zip": False, "keep_original": False}
+
+
+def test_messages_go_to_their_job(monkeypatch):
+    release_first = threading.Event()
+
+    def separate_audio(input_file, *args, on_separated=None, on_progress=None, **kwargs):
+        print(f"separating {input_file}")
+        on_progress({"stage": "separating", "fraction": 0.5})
+        on_separated()
+        if input_file == "first":
+            # Still encoding while the second job separates
+            release_first.wait(10)
+        print(f"encoded {input_file}")
+
+    client = in_process_client(separate_audio, monkeypatch)
+    events = {"first": [], "second": []}
+
+    def run(name):
+        client.run_job(config(name), on_line=lambda line: events[name].append(line),
+                       on_progress=lambda event: events[name].append(event["fraction"]),
+                       on_separated=lambda: events[name].append("separated"))
+        events[name].append("done")
+
+    first = threading.Thread(target=run, args=("first",))
+    first.start()
+    run("second")
+    release_first.set()
+    first.join(10)
+
+    for name in ("first", "second"):
+        assert events[name] == [f"separating {name}", 0.5, "separated", f"encoded {name}", "done"]
+
+
+def test_errors_reach_the_client(monkeypatch):
+    def separate_audio(input_file, *args, on_separated=None, **kwargs):
+        if input_file == "broken":
+            raise ValueError("no audio stream")
+        on_separated()
+
+    client = in_process_client(separate_audio, monkeypatch)
+    with pytest.raises(DaemonError, match="no audio stream"):
+        client.run_job(config("broken"))
+    # The daemon carries on with the next job
+    client.run_job(config("fine"))
+
+
+def test_cancel_leaves_the_other_job_running(monkeypatch):
+    release_first = threading.Event()
+    stopped = threading.Event()
+
+    def separate_audio(input_file, *args, on_separated=None, on_progress=None, cancel=None, **kwargs):
+        if input_file == "first":
+            # Encoding while the second job separates
+            on_separated()
+            release_first.wait(10)
+            return
+        progress = ProgressTracker(on_progress, cancel=cancel)
+        progress.stage("separating")
+        try:
+            while True:
+                progress.update(0.5, force=True)
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    client = in_process_client(separate_audio, monkeypatch)
+    results = {}
+    def run(name, **callbacks):
+        try:
+            client.run_job(config(name), **callbacks)
+            results[name] = "done"
+        except DaemonError as e:
+            results[name] = str(e)
+
+    first = threading.Thread(target=run, args=("first",))
+    first.start()
+    started, separating = [], threading.Event()
+    second = threading.Thread(target=run, args=("second",),
+                              kwargs={"on_started": started.append, "on_progress": lambda event: separating.set()})
+    second.start()
+    assert separating.wait(10)
+
+    client.cancel(started[0])
+    second.join(10)
+    assert results["second"] == "Cancelled"
+    assert stopped.wait(10)
+    # The daemon wasn't killed and the first job finishes
+    release_first.set()
+    first.join(10)
+    assert results["first"] == "done"
+    assert not client.process.killed
+
+
+def test_killed_daemon_is_restarted(tmp_path):
+    client = DaemonClient(threads=1, cpu_only=True)
+    try:
+        client.warm_up()
+        first = client.process.pid
+        assert client.stats() is not None
+
+        client.kill()
+        assert not client.is_alive()
+        # The next job starts a fresh daemon, whose error comes back to us
+        with pytest.raises(DaemonError):
+            client.run_job(config(str(tmp_path / "missing.wav")))
+        assert client.is_alive() and client.process.pid != first
+    finally:
+        client.stop()
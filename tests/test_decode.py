@@ -0,0 +1,96 @@
+import sys
+import os
+
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from create_dummy_audio import write_mix
+from src.core import decode
+from src.core.audio_io import load_audio, mmap_float_wav
+from src.core.decode import DecodeCache
+
+
+def test_native_input_is_decoded_once(tmp_path):
+    source = write_mix(str(tmp_path / "in.flac"), 1, kind="noise", subtype="PCM_24")
+    data, _ = sf.read(source, dtype="float32")
+    cache = DecodeCache(str(tmp_path / "decoded"))
+
+    decoded = cache.get(source)
+    info = sf.info(decoded)
+    assert (info.subtype, info.frames, info.channels) == ("FLOAT", 44100, 2)
+    assert mmap_float_wav(decoded, info) is not None
+    wav, sr = load_audio(decoded)
+    assert np.abs(wav.t().numpy() - data).max() < 1e-5
+
+    mtime = os.path.getmtime(decoded)
+    time.sleep(0.01)
+    assert cache.get(source) == decoded
+    assert os.path.getmtime(decoded) >= mtime
+
+
+def test_float_wav_is_used_in_place(tmp_path):
+    source = str(tmp_path / "in.wav")
+    sf.write(source, np.zeros((100, 2), dtype=np.float32), 44100, subtype="FLOAT")
+    assert DecodeCache(str(tmp_path / "decoded")).get(source) == source
+
+
+def test_ffmpeg_pipe(tmp_path, monkeypatch):
+    # Stand-in ffmpeg: the "input" already holds raw float32 stereo, written out in odd-sized chunks
+    data = np.random.default_rng(1).uniform(-0.5, 0.5, (10001, 2)).astype("<f4")
+    source = tmp_path / "in.m4a"
+    source.write_bytes(data.tobytes())
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import sys\n"
+                      "raw = open(sys.argv[sys.argv.index('-i') + 1], 'rb').read()\n"
+                      "for i in range(0, len(raw), 999):\n"
+                      "    sys.stdout.buffer.write(raw[i:i + 999])\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(decode.shutil, "which", lambda name: str(script) if name == "ffmpeg" else None)
+
+    decoded = DecodeCache(str(tmp_path / "decoded")).get(str(source))
+    out, sr = sf.read(decoded, dtype="float32")
+    assert sr == decode.FALLBACK_RATE
+    assert np.array_equal(out, data)
+
+
+def test_undecodable_input_without_ffmpeg(tmp_path, monkeypatch):
+    source = tmp_path / "in.m4a"
+    source.write_bytes(b"not audio")
+    monkeypatch.setattr(decode.shutil, "which", lambda name: None)
+    cache = DecodeCache(str(tmp_path / "decoded"))
+    with pytest.raises(RuntimeError, match="ffmpeg"):
+        cache.get(str(source))
+    assert cache.files() == []
+
+
+def test_trim_removes_least_recently_used(tmp_path):
+    cache = DecodeCache(str(tmp_path), budget_mb=0)
+    for index, name in enumerate(("old.wav", "new.wav")):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (index, index))
+    assert cache.trim(budget=1000) == 1
+    assert os.listdir(tmp_path) == ["new.wav"]
+
+
+def test_leased_decodes_survive_trim(tmp_path, monkeypatch):
+    source = str(tmp_path / "in.flac")
+    sf.write(source, np.zeros((1000, 2), dtype=np.float32), 44100)
+    cache = DecodeCache(str(tmp_path / "decoded"))
+    with cache.lease(source) as decoded:
+        assert cache.trim(budget=0) == 0
+        assert os.path.exists(decoded)
+        # A lease left behind by a process that died doesn't count
+        monkeypatch.setattr(decode, "pid_alive", lambda pid: False)
+        assert cache.trim(budget=0) == 1
+        monkeypatch.undo()
+    assert not [name for name in os.listdir(cache.root) if name.endswith(".lease")]
+
+    with cache.lease(source) as decoded:
+        pass
+    assert cache.trim(budget=0) == 1
+
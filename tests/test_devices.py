@@ -0,0 +1,141 @@
+import pytest
+import torch
+
+from src.core import engine as engine_module, tuning
+from src.core.devices import DeviceManager, detect_devices
+from src.core.engine import DemucsEngine, FALLBACK_SEGMENT
+from src.core.scheduler import JobScheduler, build_slots
+
+TWO_GPUS = [{"name": "RTX 3090", "total_mb": 24000}, {"name": "RTX 3060", "total_mb": 12000}]
+
+
+def test_inventories():
+    cpu_only = detect_devices([], cores=16, threads_per_job=4)
+    assert [(d.id, d.slots, d.threads) for d in cpu_only] == [("cpu", 4, 4)]
+
+    gpus = detect_devices(TWO_GPUS, cores=16, threads_per_job=4)
+    assert [(d.id, d.slots, d.threads) for d in gpus] == [("cuda:0", 1, 8), ("cuda:1", 1, 8)]
+
+    mixed = detect_devices(TWO_GPUS, cores=16, threads_per_job=4, cpu_jobs=2)
+    assert [d.id for d in mixed] == ["cuda:0", "cuda:1", "cpu"]
+    assert mixed[-1].slots == 2
+
+
+def test_least_loaded_device_first():
+    scheduler = JobScheduler(build_slots(inventory=TWO_GPUS, cores=16, threads_per_job=4, cpu_jobs=1))
+    picked = [scheduler.acquire() for _ in range(4)]
+    devices = [scheduler.device_of[daemon].id for daemon in picked[:3]]
+    # GPUs before the CPU, the larger GPU first
+    assert devices == ["cuda:0", "cuda:1", "cpu"]
+    assert picked[3] is None and not scheduler.has_free_slot()
+    assert picked[2].cpu_only and picked[1].gpu == 1
+
+    scheduler.release(picked[1])
+    scheduler.release(picked[1]) # twice is harmless
+    assert scheduler.device_of[scheduler.acquire()].id == "cuda:1"
+
+
+def test_jobs_only_share_a_gpu_when_memory_allows():
+    inventory = [{"name": "small", "total_mb": 4000}, {"name": "big", "total_mb": 16000}]
+    devices = DeviceManager(detect_devices(inventory, cores=8, jobs_per_gpu=3))
+    small, big = devices.devices
+    for _ in range(6):
+        device = devices.pick()
+        if device is None:
+            break
+        devices.start(device)
+    # 16 GB has room for three 3 GB jobs, 4 GB for one
+    assert (small.running, big.running) == (1, 3)
+
+    devices.finish(small)
+    assert devices.pick() is small
+
+
+def test_slots_split_the_memory_they_share(monkeypatch):
+    scheduler = JobScheduler(build_slots(inventory=TWO_GPUS, cores=16, threads_per_job=4, cpu_jobs=2))
+    shares = sorted((scheduler.device_of[daemon].id, daemon.memory_share) for daemon in scheduler.daemons)
+    # Each GPU is its own, the CPU slots share the RAM with every other job
+    assert shares == [("cpu", 4), ("cpu", 4), ("cuda:0", 1), ("cuda:1", 1)]
+
+    monkeypatch.setattr(tuning, "available_memory_mb", lambda device: 10000)
+    assert tuning.slot_budget_mb("cpu", 4) == 10000 * tuning.HEADROOM / 4
+
+
+class FakeModel:
+    sources = ["drums", "bass", "other", "vocals"]
+    samplerate = 44100
+
+
+def test_out_of_memory_falls_back_to_cpu(monkeypatch):
+    calls = []
+
+    def fake_apply(model, mix, device=None, segment=None, **kwargs):
+        calls.append((str(device), segment))
+        if str(device).startswith("cuda"):
+            raise torch.cuda.OutOfMemoryError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        return torch.zeros(1, len(model.sources), *mix.shape[1:])
+
+    monkeypatch.setattr(engine_module, "apply_model", fake_apply)
+    monkeypatch.setattr(engine_module, "load_demucs_model", lambda name, device: FakeModel())
+    engine = DemucsEngine("htdemucs", device="cuda", progress=False)
+    stems = engine.separate(torch.randn(2, 1000))
+
+    assert list(stems) == FakeModel.sources
+    assert calls == [("cuda", None), ("cpu", FALLBACK_SEGMENT)]
+    # Later windows of the same job go straight to the CPU
+    engine.separate(torch.randn(2, 1000))
+    assert calls[-1] == ("cpu", FALLBACK_SEGMENT)
+
+
+def test_out_of_memory_on_smallest_cpu_run_is_raised(monkeypatch):
+    def fake_apply(*args, **kwargs):
+        raise RuntimeError("DefaultCPUAllocator: can't allocate memory")
+
+    monkeypatch.setattr(engine_module, "apply_model", fake_apply)
+    monkeypatch.setattr(engine_module, "load_demucs_model", lambda name, device: FakeModel())
+    engine = DemucsEngine("htdemucs", device="cpu", progress=False)
+    with pytest.raises(RuntimeError):
+        engine.separate(torch.randn(2, 1000))
+    assert engine.segment == FALLBACK_SEGMENT
+
+
+def test_parallel_segments_split_the_threads(monkeypatch):
+    seen = []
+
+    def fake_apply(model, mix, num_workers=0, **kwargs):
+        seen.append((num_workers, torch.get_num_threads()))
+        return torch.zeros(1, len(model.sources), *mix.shape[1:])
+
+    monkeypatch.setattr(engine_module, "apply_model", fake_apply)
+    monkeypatch.setattr(engine_module, "load_demucs_model", lambda name, device: FakeModel())
+    threads = torch.get_num_threads()
+    torch.set_num_threads(4)
+    try:
+        engine = DemucsEngine("htdemucs", device="cpu", progress=False, workers=2)
+        engine.separate(torch.randn(2, 1000))
+        assert seen == [(2, 2)]
+        assert torch.get_num_threads() == 4
+    finally:
+        torch.set_num_threads(threads)
+
+
+def test_out_of_memory_fallback_with_padded_segments(monkeypatch):
+    calls = []
+
+    class PaddingModel(FakeModel):
+        segment = 7.8
+        use_train_segment = True
+
+    def fake_apply(model, mix, device=None, segment=None, **kwargs):
+        calls.append((str(device), segment))
+        if str(device).startswith("cuda"):
+            raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+        return torch.zeros(1, len(model.sources), *mix.shape[1:])
+
+    monkeypatch.setattr(engine_module, "apply_model", fake_apply)
+    monkeypatch.setattr(engine_module, "load_demucs_model", lambda name, device: PaddingModel())
+    engine = DemucsEngine("htdemucs", device="cuda", progress=False)
+    engine.separate(torch.randn(2, 1000))
+    # No segment was set; the model's own is kept, it can't be shortened
+    assert calls == [("cuda", None), ("cpu", 7.8)]
+
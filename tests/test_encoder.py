@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.core.encoder import EncoderPool, format_for, transcode
+
+SR = 44100
+
+
+def tone(seconds=1.0):
+    t = np.arange(int(SR * seconds)) / SR
+    return np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 660 * t)]).astype(np.float32) * 0.5
+
+
+def test_pool_encodes_every_format(tmp_path):
+    pool = EncoderPool(2)
+    paths = {fmt: str(tmp_path / f"stem.{fmt}") for fmt in ("wav", "mp3", "flac", "opus")}
+    pool.wait_all([pool.encode(tone(), path, SR) for path in paths.values()])
+    pool.shutdown()
+
+    for fmt, path in paths.items():
+        info = sf.info(path)
+        assert info.channels == 2
+        # libopus has no 44.1 kHz mode
+        assert info.samplerate == (48000 if fmt == "opus" else SR)
+        assert abs(info.duration - 1.0) < 0.1
+
+    data, _ = sf.read(paths["flac"], dtype="float32")
+    assert np.allclose(data.T, tone(), atol=1e-4)
+
+
+def test_transcode_replaces_source(tmp_path):
+    source = str(tmp_path / "vocals.wav")
+    sf.write(source, tone().T, SR)
+    target = transcode(source, str(tmp_path / "vocals.flac"), remove_source=True)
+    assert not os.path.exists(source)
+    assert sf.info(target).frames == SR
+
+
+def test_format_for():
+    assert format_for() == "wav"
+    assert format_for(export_mp3=True) == "mp3"
+    assert format_for("flac", export_mp3=True) == "flac"
+    with pytest.raises(ValueError):
+        format_for("aac")
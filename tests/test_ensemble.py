@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.core.ensemble import blend
+
+SR = 44100
+
+
+def noise(frames, seed):
+    return (np.random.default_rng(seed).standard_normal((frames, 2)) * 0.1).astype(np.float32)
+
+
+def test_weighted_average_of_files_and_arrays(tmp_path):
+    a, b = noise(30000, 0), noise(25000, 1)
+    path = str(tmp_path / "a.wav")
+    sf.write(path, a, SR, subtype="FLOAT")
+
+    out = str(tmp_path / "out.wav")
+    blend([path, (b, SR)], out, weights=[3, 1], blocksize=4096, subtype="FLOAT")
+    data, sr = sf.read(out, dtype="float32")
+    assert sr == SR and data.shape == (25000, 2)
+    assert np.allclose(data, 0.75 * a[:25000] + 0.25 * b, atol=1e-6)
+
+
+@pytest.mark.parametrize("mode", ["avg_spec", "max_spec", "min_spec"])
+def test_spectral_modes_are_block_size_independent(mode):
+    inputs = [(noise(50000, seed), SR) for seed in range(3)]
+    small, _ = blend(inputs, mode=mode, blocksize=2048)
+    large, _ = blend(inputs, mode=mode, blocksize=1 << 20)
+    assert np.allclose(small, large, atol=1e-6)
+
+
+def test_spectral_reconstruction():
+    x = noise(50000, 0)
+    same, _ = blend([(x, SR), (x, SR)], mode="avg_spec", blocksize=4096)
+    assert np.allclose(same, x, atol=1e-5)
+    loudest, _ = blend([(x, SR), (np.zeros_like(x), SR)], mode="max_spec")
+    assert np.allclose(loudest, x, atol=1e-5)
+    quietest, _ = blend([(x, SR), (np.zeros_like(x), SR)], mode="min_spec")
+    assert np.allclose(quietest, 0, atol=1e-5)
+
+
+def test_rejects_mismatched_rates():
+    with pytest.raises(ValueError):
+        blend([(noise(1000, 0), SR), (noise(1000, 1), 48000)])
@@ -0,0 +1,54 @@
+import numpy as np
+import soundfile as sf
+
+from src.core.inversion import PolyphaseResampler, invert
+
+
+def tone(frames, rate, freq=1000.0):
+    t = np.arange(frames) / rate
+    return (0.5 * np.sin(2 * np.pi * freq * t))[:, None].repeat(2, axis=1).astype(np.float32)
+
+
+def resample(data, in_rate, out_rate, blocksize):
+    resampler = PolyphaseResampler(in_rate, out_rate, data.shape[1])
+    out = []
+    for start in range(0, len(data), blocksize):
+        out.append(resampler.process(data[start:start + blocksize], final=start + blocksize >= len(data)))
+    return np.concatenate(out)
+
+
+def test_resampler_is_accurate_and_block_independent():
+    x = tone(48000, 48000)
+    small = resample(x, 48000, 44100, 1000)
+    large = resample(x, 48000, 44100, 1 << 16)
+    assert small.shape == (44100, 2)
+    assert np.array_equal(small, large)
+    assert np.abs(small - tone(44100, 44100))[200:-200].max() < 1e-4
+
+
+def test_invert_resamples_and_aligns(tmp_path):
+    rate = 44100
+    rng = np.random.default_rng(0)
+    music = (rng.standard_normal((rate * 8, 2)) * 0.05).astype(np.float32)
+    # Smoothed noise: band-limited and, unlike a pure tone, not periodic
+    vocals = np.convolve(rng.standard_normal(rate * 8), np.hanning(16), mode="same")
+    vocals = (0.1 * vocals)[:, None].repeat(2, axis=1).astype(np.float32)
+    original = str(tmp_path / "original.wav")
+    sf.write(original, music + vocals, rate, subtype="FLOAT")
+
+    # Stem at 48 kHz, 50 samples late
+    stem = np.concatenate([np.zeros((50, 2), np.float32), resample(vocals, rate, 48000, 1 << 16)])
+    stem_path = str(tmp_path / "stem.wav")
+    sf.write(stem_path, stem, 48000, subtype="FLOAT")
+
+    out = str(tmp_path / "inverted.wav")
+    lag = invert(original, stem_path, out, blocksize=8192)
+    assert lag == 50
+    inverted, sr = sf.read(out)
+    assert sr == rate and len(inverted) == len(music)
+    assert np.abs(inverted - music)[1000:-1000].max() < 1e-3
+
+    # The same stem from memory gives the same result
+    in_memory = str(tmp_path / "inverted_in_memory.wav")
+    assert invert(original, (stem, 48000), in_memory, blocksize=8192) == 50
+    assert np.array_equal(sf.read(in_memory)[0], inverted)
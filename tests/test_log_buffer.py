@@ -0,0 +1,50 @@
+import os
+import logging
+import threading
+
+from src.utils.log_buffer import LogBuffer
+
+
+def test_lines_are_split_and_bounded():
+    buffer = LogBuffer(max_lines=100)
+    buffer.write("first ")
+    buffer.write("line\n 10%|##\r 20%|###\r")
+    buffer.write("tail without newline")
+    assert buffer.drain() == ["first line", " 10%|##", " 20%|###"]
+    assert buffer.drain() == []
+
+    def spam():
+        for i in range(10000):
+            buffer.write(f"{i}\n")
+
+    threads = [threading.Thread(target=spam) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Never more than max_lines kept, however much was written
+    assert len(buffer.snapshot()) == 100
+    assert len(buffer.drain()) == 0
+
+
+def test_handler_and_rotating_file(tmp_path):
+    path = str(tmp_path / "stemlab.log")
+    buffer = LogBuffer(max_lines=10, path=path, max_bytes=2000, backups=2)
+    log = logging.getLogger("test_log_buffer")
+    log.propagate = False
+    handler = buffer.handler(logging.Formatter("%(levelname)s %(message)s"))
+    log.addHandler(handler)
+    try:
+        log.warning("two\nlines")
+        assert buffer.drain() == ["WARNING two", "lines"]
+        for i in range(500):
+            buffer.write(f"line {i}\n")
+    finally:
+        log.removeHandler(handler)
+        buffer.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert files == ["stemlab.log", "stemlab.log.1", "stemlab.log.2"]
+    assert all(os.path.getsize(tmp_path / name) <= 2000 for name in files)
+    with open(path, encoding="utf-8") as f:
+        assert f.read().splitlines()[-1] == "line 499"
@@ -0,0 +1,54 @@
+from src.core.model_cache import ModelCache, MB
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+
+def make_cache(budget_mb):
+    return ModelCache(ram_budget_mb=budget_mb, vram_budget_mb=budget_mb)
+
+
+def get(cache, name, device="cpu", mb=40):
+    return cache.get(name, device, lambda: FakeModel(name), size_fn=lambda m: mb * MB)
+
+
+def test_hit_returns_same_instance():
+    cache = make_cache(100)
+    first = get(cache, "htdemucs")
+    assert get(cache, "htdemucs") is first
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_lru_eviction_by_budget():
+    cache = make_cache(100)
+    get(cache, "htdemucs")
+    get(cache, "htdemucs_6s")
+    get(cache, "htdemucs")  # htdemucs is now most recently used
+    get(cache, "Kim_Vocal_2.onnx")
+
+    names = [m["name"] for m in cache.stats()["models"]]
+    assert names == ["htdemucs", "Kim_Vocal_2.onnx"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_devices_have_separate_keys_and_budgets():
+    cache = make_cache(50)
+    cpu_model = get(cache, "htdemucs", "cpu")
+    cuda_model = get(cache, "htdemucs", "cuda:0")
+    assert cpu_model is not cuda_model
+    assert cache.stats()["evictions"] == 0
+
+
+def test_each_gpu_has_its_own_budget():
+    cache = make_cache(100)
+    get(cache, "htdemucs", "cuda:0", mb=80)
+    get(cache, "htdemucs", "cuda:1", mb=80)
+    assert cache.stats()["evictions"] == 0
+    # "cuda" is the first GPU
+    get(cache, "htdemucs_6s", "cuda", mb=80)
+    assert [(m["name"], m["device"]) for m in cache.stats()["models"]] == [("htdemucs", "cuda:1"),
+                                                                          ("htdemucs_6s", "cuda")]
+
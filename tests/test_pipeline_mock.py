@@ -0,0 +1,148 @@
+import sys
+import os
+
+import zipfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks import mock_backend
+from create_dummy_audio import write_mix
+from src.core import splitter
+from src.core.decode import decode_cache
+from src.core.encoder import encoder_pool
+from src.core.result_cache import result_cache
+from src.core.trace import TRACE_FILE, read_trace
+
+
+@pytest.fixture
+def mock_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "root", str(tmp_path / "cache"))
+    monkeypatch.setattr(decode_cache, "root", str(tmp_path / "decoded"))
+    mock_backend.install(separator=False)
+    yield
+    mock_backend.uninstall()
+
+
+@pytest.mark.parametrize("mode,stem_count,outputs", [
+    ("standard", 4, ["bass", "drums", "other", "vocals"]),
+    ("instrumental", 2, ["no_vocals"]),
+    ("rhythm", 4, ["melody", "rhythm", "vocals"]),
+])
+def test_modes_with_mock_model(tmp_path, mock_models, mode, stem_count, outputs):
+    source = write_mix(str(tmp_path / "mix.wav"), 12)
+    output_dir = tmp_path / "stems"
+    splitter.separate_audio(source, str(output_dir), stem_count, 1, False, False, mode=mode, cache=False)
+
+    written = sorted(name[:-4] for name in os.listdir(output_dir) if name.endswith(".wav"))
+    assert written == outputs
+    trace = read_trace(str(output_dir / TRACE_FILE))
+    assert {"decode", "load", "inference", "encode"} <= set(trace["stages"])
+    if mode == "standard":
+        # The mock splits the spectrum, so the stems add up to the mix
+        mix, _ = sf.read(source, dtype="float32")
+        total = sum(sf.read(str(output_dir / f"{name}.wav"), dtype="float32")[0] for name in outputs)
+        assert np.abs(total - mix).max() < 1e-2
+
+
+def test_zip_export_with_mock_model(tmp_path, mock_models):
+    source = write_mix(str(tmp_path / "mix.wav"), 12)
+    output_dir = tmp_path / "stems"
+    splitter.separate_audio(source, str(output_dir), 4, 1, True, True, export_format="flac", cache=False)
+
+    with zipfile.ZipFile(f"{output_dir}.zip") as archive:
+        names = sorted(archive.namelist())
+        assert names == ["bass.flac", "drums.flac", "original.flac", "other.flac", "vocals.flac"]
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+        assert archive.read("vocals.flac") == (output_dir / "vocals.flac").read_bytes()
+
+
+def test_silence_is_skipped_with_mock_model(tmp_path, mock_models):
+    source = write_mix(str(tmp_path / "mix.wav"), 12, silence=15)
+    output_dir = tmp_path / "stems"
+    splitter.separate_audio(source, str(output_dir), 4, 1, False, False, cache=False)
+
+    trace = read_trace(str(output_dir / TRACE_FILE))
+    assert 0.5 < trace["stats"]["silence_skipped"] < 0.8
+    mix, sr = sf.read(source, dtype="float32")
+    stems = [sf.read(str(output_dir / f"{name}.wav"), dtype="float32")[0] for name in ("bass", "drums", "other", "vocals")]
+    assert all(not stem[:10 * sr].any() and not stem[-10 * sr:].any() for stem in stems)
+    assert np.abs(sum(stems) - mix).max() < 1e-2
+
+
+@pytest.mark.parametrize("first,then", [("standard", "instrumental"), ("instrumental", "standard")])
+def test_sources_are_cached_for_other_modes(tmp_path, mock_models, first, then):
+    source = write_mix(str(tmp_path / "mix.wav"), 12)
+    stem_count = {"standard": 4, "instrumental": 2}
+    splitter.separate_audio(source, str(tmp_path / first), stem_count[first], 1, False, False, mode=first)
+    # Sources are stored in the background, after the job returned
+    encoder_pool.shutdown()
+
+    entries = [(folder, meta) for _, folder, meta in result_cache.entries() if "scales" in meta]
+    assert len(entries) == 1
+    if first == "standard":
+        # Every output is one source: the cached sources are the same files
+        folder, meta = entries[0]
+        for name, file in meta["files"].items():
+            assert os.path.samefile(os.path.join(folder, file), tmp_path / first / f"{name}.wav")
+
+    # The other mode is mixed from them without a model pass
+    output_dir = tmp_path / then
+    splitter.separate_audio(source, str(output_dir), stem_count[then], 1, False, False, mode=then)
+    assert "inference" not in read_trace(str(output_dir / TRACE_FILE))["stages"]
+    # Both runs' outputs come from the same sources (Demucs' random shift makes a new run differ)
+    def accompaniment(folder):
+        return sum(sf.read(str(folder / name), dtype="float32")[0] for name in os.listdir(folder)
+                   if name.endswith(".wav") and name != "vocals.wav")
+    assert np.abs(accompaniment(output_dir) - accompaniment(tmp_path / first)).max() < 1e-3
+
+
+@pytest.fixture
+def mock_separator(monkeypatch):
+    # The mock audio-separator, only for this test
+    for name in ("audio_separator", "audio_separator.separator", "src.core.advanced_audio"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    mock_backend.install_separator()
+    from src.core import advanced_audio
+    monkeypatch.setattr(splitter, "AdvancedAudioProcessor", advanced_audio.AdvancedAudioProcessor)
+
+
+@pytest.mark.parametrize("dereverb", [False, True])
+def test_vocals_only_with_mock_models(tmp_path, mock_models, mock_separator, monkeypatch, dereverb):
+    source = write_mix(str(tmp_path / "mix.wav"), 12)
+    output_dir = tmp_path / "stems"
+    intermediates = []
+    close = splitter.AdvancedAudioProcessor.close
+    def record(processor):
+        intermediates.extend(os.listdir(processor.work_dir))
+        close(processor)
+    monkeypatch.setattr(splitter.AdvancedAudioProcessor, "close", record)
+
+    splitter.separate_audio(source, str(output_dir), 2, 1, False, False, mode="vocals_only", dereverb=dereverb,
+                            invert=True, cache=False)
+
+    # Intermediates never reach the stems folder
+    assert sorted(os.listdir(output_dir)) == sorted([TRACE_FILE, "instrumental_inverted.wav", "vocals.wav",
+                                                     "vocals_ultra_clean.wav"])
+    # MDX outputs are named after the track, not the decoded copy
+    assert "mix_(Vocals)_Kim_Vocal_2.wav" in intermediates
+
+
+def test_failed_job_settles_the_vocal_model(tmp_path, mock_models, mock_separator, monkeypatch):
+    source = write_mix(str(tmp_path / "mix.wav"), 12)
+    futures = []
+    start = splitter.AdvancedAudioProcessor.start_vocal_model
+    def started(processor, *args, **kwargs):
+        futures.append(start(processor, *args, **kwargs))
+        return futures[-1]
+    monkeypatch.setattr(splitter.AdvancedAudioProcessor, "start_vocal_model", started)
+    def broken(*args, **kwargs):
+        raise RuntimeError("CUDA error: device-side assert triggered")
+    monkeypatch.setattr(splitter, "run_separation", broken)
+
+    with pytest.raises(RuntimeError, match="CUDA error"):
+        splitter.separate_audio(source, str(tmp_path / "stems"), 2, 1, False, False, mode="vocals_only", cache=False)
+    # Demucs failed while MDX ran: the job still waited for it
+    assert len(futures) == 1 and futures[0].done()
+
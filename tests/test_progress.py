@@ -0,0 +1,71 @@
+import time
+import threading
+
+from src.core.progress import LatestValue, ProgressTracker, demucs_callback, STAGES
+
+
+def test_tracker_rate_limits_and_maps_stages():
+    events = []
+    tracker = ProgressTracker(events.append, duration=60.0, max_rate=20)
+    tracker.stage("separating")
+    started = time.perf_counter()
+    steps = 200000
+    for i in range(steps):
+        tracker.update(i / steps)
+    tracker.update(1.0)
+    elapsed = time.perf_counter() - started
+
+    # Stage start, at most 20/s in between, and the final update
+    assert len(events) <= 2 + elapsed * 20 + 1
+    assert events[0]["stage"] == "separating"
+    assert events[0]["fraction"] == STAGES["separating"][0]
+    assert events[-1]["fraction"] == STAGES["separating"][1]
+    fractions = [event["fraction"] for event in events]
+    assert fractions == sorted(fractions)
+    assert all("eta" in event and "rate" in event for event in events[1:-1])
+
+
+def test_demucs_callback_covers_shifts_and_bags():
+    seen = []
+    tracker = ProgressTracker(lambda event: None)
+    tracker.stage("separating")
+    tracker.update = lambda fraction, force=False: seen.append(fraction)
+    callback = demucs_callback(tracker, length=100, shifts=2)
+    for model in range(2):
+        for shift in range(2):
+            for offset in (0, 50):
+                for state in ("start", "end"):
+                    callback({"models": 2, "model_idx_in_bag": model, "shift_idx": shift,
+                              "segment_offset": offset, "state": state})
+    assert len(seen) == 16 // 2
+    assert seen == sorted(seen) and seen[-1] < 1.0
+
+
+def test_latest_value_bounds_polled_event_rate():
+    # Four jobs reporting as fast as they can into LatestValue mailboxes, polled at 10 Hz
+    workers = [LatestValue() for _ in range(4)]
+    stop = threading.Event()
+    produced = [0] * len(workers)
+
+    def produce(index):
+        while not stop.is_set():
+            workers[index].put({"stage": "separating", "fraction": produced[index]})
+            produced[index] += 1
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+
+    handled = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < 1.0:
+        time.sleep(0.1)
+        handled += sum(1 for worker in workers if worker.take() is not None)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # At most one event per mailbox per poll, however many were put
+    assert handled / elapsed <= len(workers) * 10 + 1
+    assert sum(produced) > handled * 10
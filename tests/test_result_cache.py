@@ -0,0 +1,48 @@
+import os
+
+from src.core.result_cache import ResultCache, content_hash, result_key
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_key_depends_on_content_and_options(tmp_path):
+    a = write(tmp_path / "one" / "a.wav", b"same audio")
+    b = write(tmp_path / "two" / "b.wav", b"same audio")
+    assert content_hash(a) == content_hash(b)
+    key = result_key(content_hash(a), model="htdemucs", shifts=1, overlap=0.25, stem_count=4, mode="standard")
+    assert key == result_key(content_hash(b), model="htdemucs", shifts=1, overlap=0.25, stem_count=4, mode="standard")
+    assert key != result_key(content_hash(b), model="htdemucs", shifts=2, overlap=0.25, stem_count=4, mode="standard")
+
+
+def test_store_and_restore(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    vocals = write(tmp_path / "out" / "vocals.wav", b"v" * 100)
+    cache.store("ab" * 20, {"vocals": vocals})
+
+    assert cache.restore("cd" * 20, str(tmp_path / "miss")) is None
+    restored = cache.restore("ab" * 20, str(tmp_path / "again"))
+    assert list(restored) == ["vocals"]
+    with open(restored["vocals"], "rb") as f:
+        assert f.read() == b"v" * 100
+    assert cache.stats()["entries"] == 1
+
+
+def test_trim_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    keys = ["aa" * 20, "bb" * 20, "cc" * 20]
+    for i, key in enumerate(keys):
+        path = write(tmp_path / f"out{i}" / "vocals.wav", b"x" * 1000)
+        cache.store(key, {"vocals": path})
+        meta = os.path.join(cache.entry_dir(key), "meta.json")
+        os.utime(meta, (1000 + i, 1000 + i))
+
+    # Touch the oldest one, the middle one is now least recently used
+    cache.lookup(keys[0])
+    assert cache.trim(2000) == 1
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) and cache.lookup(keys[2])
@@ -0,0 +1,34 @@
+import torch
+
+from src.core.silence import PADDING, active_regions, skipped_samples
+
+SR = 44100
+
+
+def tone(seconds):
+    t = torch.arange(int(seconds * SR)) / SR
+    return 0.5 * torch.sin(2 * torch.pi * 440 * t).repeat(2, 1)
+
+
+def silence(seconds):
+    return torch.zeros(2, int(seconds * SR))
+
+
+def test_intro_gap_and_outro_are_skipped_with_padding():
+    wav = torch.cat([silence(10), tone(5), silence(20), tone(5), silence(10)], dim=1)
+    regions = active_regions(wav, SR)
+    assert len(regions) == 2
+    (a, b), (c, d) = regions
+    assert abs(a - (10 - PADDING) * SR) < 0.1 * SR and abs(b - (15 + PADDING) * SR) < 0.1 * SR
+    assert abs(c - (35 - PADDING) * SR) < 0.1 * SR and abs(d - (40 + PADDING) * SR) < 0.1 * SR
+    assert 0.6 < skipped_samples(regions, wav.shape[-1]) / wav.shape[-1] < 0.8
+
+
+def test_short_gaps_and_quiet_audio_are_kept():
+    wav = torch.cat([tone(5), silence(2), tone(5) * 0.01], dim=1)
+    assert active_regions(wav, SR) == [(0, wav.shape[-1])]
+
+
+def test_all_silent_input_has_no_regions():
+    assert active_regions(silence(30), SR) == []
+    assert skipped_samples([], 100) == 100
@@ -0,0 +1,44 @@
+import pytest
+
+from src.core.stage_graph import Stage, StageGraph
+
+
+def chain(calls):
+    def stage(name, result):
+        def run(*args):
+            calls.append(name)
+            return result(*args)
+        return run
+    return StageGraph([
+        Stage("mdx", stage("mdx", lambda path: path + ":mdx"), ["input"], ["mdx_vocals"]),
+        Stage("ensemble", stage("ensemble", lambda a, b: a + "+" + b), ["demucs_vocals", "mdx_vocals"], ["ensemble"]),
+        Stage("dereverb", stage("dereverb", lambda v: v + ":dry"), ["ensemble"], ["dry"]),
+        Stage("deecho", stage("deecho", lambda v: v + ":clean"), ["dry"], ["clean"]),
+    ])
+
+
+def test_unneeded_stages_are_pruned():
+    calls = []
+    artifacts, timings = chain(calls).run(["ensemble"], {"input": "song", "demucs_vocals": "demucs"})
+    assert calls == ["mdx", "ensemble"]
+    assert artifacts["ensemble"] == "demucs+song:mdx"
+    assert set(timings) == {"mdx", "ensemble"}
+
+
+def test_full_chain_and_missing_inputs():
+    calls = []
+    artifacts, _ = chain(calls).run(["clean"], {"input": "song", "demucs_vocals": "demucs"})
+    assert calls == ["mdx", "ensemble", "dereverb", "deecho"]
+    assert artifacts["clean"] == "demucs+song:mdx:dry:clean"
+
+    # A stage producing nothing skips everything downstream of it
+    graph = chain([])
+    graph.stages[0].run = lambda path: None
+    artifacts, timings = graph.run(["clean"], {"input": "song", "demucs_vocals": "demucs"})
+    assert artifacts["clean"] is None
+    assert list(timings) == ["mdx"]
+
+
+def test_unknown_target():
+    with pytest.raises(KeyError):
+        chain([]).plan(["karaoke"])
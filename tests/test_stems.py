@@ -0,0 +1,29 @@
+import numpy as np
+
+from src.core.stems import plan_outputs, materialize
+
+SOURCES = ["drums", "bass", "other", "vocals"]
+
+
+def test_modes_only_plan_kept_outputs():
+    assert plan_outputs("vocals_only", 2, SOURCES) == {"vocals": ["vocals"]}
+    assert plan_outputs("instrumental", 2, SOURCES) == {"no_vocals": ["drums", "bass", "other"]}
+    assert list(plan_outputs("standard", 2, SOURCES)) == ["vocals", "no_vocals"]
+    assert list(plan_outputs("standard", 4, SOURCES)) == SOURCES
+
+
+def test_materialize_sums_sources():
+    stems = {name: np.full((2, 4), i + 1.0) for i, name in enumerate(SOURCES)}
+    outputs = dict(materialize(plan_outputs("standard", 2, SOURCES), stems))
+    assert outputs["vocals"] is stems["vocals"]
+    assert np.all(outputs["no_vocals"] == 6.0)
+    # Mixing must not modify the model output in place
+    assert np.all(stems["drums"] == 1.0)
+
+
+def test_rhythm_groups_drums_and_bass():
+    assert plan_outputs("rhythm", 4, SOURCES) == {
+        "vocals": ["vocals"], "rhythm": ["drums", "bass"], "melody": ["other"]
+    }
+    six = SOURCES + ["guitar", "piano"]
+    assert plan_outputs("rhythm", 6, six)["melody"] == ["other", "guitar", "piano"]
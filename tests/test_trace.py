@@ -0,0 +1,62 @@
+import os
+
+import threading
+
+from src.core.stage_graph import Stage, StageGraph
+from src.core.trace import JobTrace, chrome_trace, read_trace
+
+
+def test_spans_aggregate_per_stage(tmp_path):
+    trace = JobTrace("song.wav", audio_seconds=10.0)
+    with trace.span("decode", 10.0):
+        pass
+    encode = trace.wrap("encode", lambda x: x * 2, 5.0, file="vocals.wav")
+    threads = [threading.Thread(target=encode, args=(1,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stages = trace.stages()
+    assert list(stages) == ["decode", "encode"]
+    assert stages["encode"]["count"] == 2
+    assert stages["encode"]["audio_seconds"] == 10.0
+    assert stages["decode"]["rtf"] == round(stages["decode"]["wall"] / 10.0, 4)
+
+    path = tmp_path / "trace.json"
+    trace.write(str(path))
+    written = read_trace(str(path))
+    assert written["job"] == "song.wav"
+    assert [span["name"] for span in written["spans"]] == ["decode", "encode", "encode"]
+    assert written["spans"][1]["args"] == {"file": "vocals.wav"}
+
+
+def test_failed_stage_is_still_recorded():
+    trace = JobTrace()
+    try:
+        with trace.span("inference"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert trace.stages()["inference"]["count"] == 1
+
+
+def test_stage_graph_records_spans():
+    trace = JobTrace()
+    graph = StageGraph([Stage("double", lambda x: x * 2, ["x"], ["y"])])
+    artifacts, _ = graph.run(["y"], {"x": 2}, trace)
+    assert artifacts["y"] == 4
+    assert list(trace.stages()) == ["double"]
+
+
+def test_chrome_trace_has_one_event_per_span():
+    trace = JobTrace("a.wav", audio_seconds=1.0)
+    with trace.span("inference", 1.0):
+        pass
+    events = chrome_trace([trace.to_dict(), trace.to_dict()])["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert len(spans) == 2
+    assert spans[0]["name"] == "inference" and spans[0]["cat"] == "a.wav"
+    assert spans[0]["pid"] == os.getpid() and spans[0]["dur"] >= 0
+    assert "rtf" in spans[0]["args"]
+    assert [event["name"] for event in events if event["ph"] == "M"] == ["process_name"]
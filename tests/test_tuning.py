@@ -0,0 +1,36 @@
+from src.core.tuning import MIN_SEGMENT, MAX_CPU_WORKERS, plan_settings
+
+# htdemucs: 7.8s segments, 4 stereo sources at 44.1 kHz, ~170 MB of weights
+MODEL = dict(weights_mb=170, model_segment=7.8, base_overlap=0.25, samplerate=44100, channels=2, sources=4)
+
+
+def test_large_budget_keeps_model_settings():
+    settings = plan_settings(32000, duration=240, threads=8, **MODEL)
+    assert settings.segment == 7.8
+    assert settings.overlap == 0.25
+    assert settings.window is None
+    assert 1 < settings.workers <= MAX_CPU_WORKERS
+
+
+def test_small_budget_shrinks_segment_and_streams():
+    settings = plan_settings(2000, duration=3 * 3600, threads=8, **MODEL)
+    assert MIN_SEGMENT <= settings.segment < 7.8
+    # Seams kept about as long in seconds: a larger fraction of the shorter segment
+    assert 0.25 < settings.overlap <= 0.5
+    assert settings.workers == 1
+    assert settings.window is not None and settings.window < 3 * 3600
+
+
+def test_fixed_segment_models_keep_their_segment():
+    settings = plan_settings(2000, duration=60, fixed_segment=True, **MODEL)
+    assert settings.segment == 7.8 and settings.overlap == 0.25
+
+
+def test_gpu_runs_one_segment_at_a_time():
+    settings = plan_settings(24000, duration=240, device="cuda:0", threads=16, **MODEL)
+    assert settings.workers == 1
+
+
+def test_unknown_duration_runs_in_memory():
+    settings = plan_settings(2000, duration=None, **MODEL)
+    assert settings.window is None